@@ -0,0 +1,139 @@
+import time
+import threading
+from typing import Tuple
+
+
+class ArrivalScheduler:
+    """Планировщик запросов с постоянной интенсивностью (open-loop).
+    Моменты отправки запросов расписаны заранее с шагом 1 / rate и не зависят от того,
+    как быстро были получены ответы на предыдущие запросы. Если все потоки заняты ожиданием ответов,
+    запросы начинают отставать от расписания - это отставание и есть backlog.
+
+    """
+    def __init__(self, rate: float):
+        self._rate = rate
+        self._interval = 1.0 / rate
+        self._lock = threading.Lock()
+        self._start_time: float = 0.0
+        self._next_time: float = 0.0
+        self._last_time: float = 0.0
+        self._issued = 0
+        self._late = 0
+        self._max_lag = 0.0
+        self._backlog = 0
+        self._max_backlog = 0
+
+    def reserve(self) -> float:
+        """Резервирование следующего момента отправки по расписанию.
+
+        :return: сколько секунд нужно подождать до отправки (отрицательное значение - запрос уже опаздывает).
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not self._start_time:
+                self._start_time = now
+                self._next_time = now
+            delay = self._next_time - now
+            self._next_time += self._interval
+            self._last_time = max(now, self._next_time - self._interval)
+            self._issued += 1
+            # количество запросов, которые по расписанию уже должны были быть отправлены
+            self._backlog = int(-delay / self._interval) if delay < 0 else 0
+            self._max_backlog = max(self._max_backlog, self._backlog)
+            if delay < 0:
+                self._late += 1
+                self._max_lag = max(self._max_lag, -delay)
+
+        return delay
+
+    def acquire(self) -> None:
+        """Ожидание момента отправки следующего запроса по расписанию.
+
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def get_summary(self) -> dict:
+        """Получение итогов работы планировщика.
+
+        :return: словарь вида:
+                {
+                    "target_rate": 10.0,
+                    "achieved_rate": 9.8,
+                    "issued": 100,
+                    "late": 3,
+                    "max_lag": 0.25,
+                    "backlog": 0,
+                    "max_backlog": 2
+                }
+                late - количество запросов, отправленных позже расписания;
+                max_lag - максимальное отставание от расписания в секундах;
+                backlog - количество запросов, просроченных по расписанию на момент последней отправки;
+                max_backlog - максимальное значение backlog за время работы.
+        """
+        with self._lock:
+            # интенсивность считается между первой и последней фактической отправкой
+            elapsed = self._last_time - self._start_time
+            return {
+                "target_rate": self._rate,
+                "achieved_rate": (self._issued - 1) / elapsed if elapsed > 0 else 0.0,
+                "issued": self._issued,
+                "late": self._late,
+                "max_lag": self._max_lag,
+                "backlog": self._backlog,
+                "max_backlog": self._max_backlog
+            }
+
+
+# общие для всех потоков процесса планировщики: (id тест кейса, имя теста, ws метод или "*") -> ArrivalScheduler
+_schedulers: dict = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_arrival_scheduler(test_case: int, test_name: str, method: str, rate_settings) -> ArrivalScheduler:
+    """Получение общего планировщика для ws метода теста.
+    Планировщики разных тест кейсов не пересекаются, даже если в них выполняется один и тот же тест.
+
+    :param test_case: id тест кейса в конфигурации запуска (см. TestCase, настройка ws.rate_test_case);
+    :param test_name: имя теста;
+    :param method: имя ws метода;
+    :param rate_settings: целевая интенсивность запросов: число (запросов в секунду на весь тест) или словарь вида
+                          {"ws метод": rps, "*": rps}, где "*" - интенсивность для остальных методов.
+
+    :return: объект планировщика или None, если для метода интенсивность не задана.
+    """
+    if not rate_settings:
+        return None
+    if isinstance(rate_settings, dict):
+        key = method if method in rate_settings else "*"
+        rate = rate_settings.get(key)
+    else:
+        key = "*"
+        rate = rate_settings
+    if not rate:
+        return None
+
+    with _schedulers_lock:
+        scheduler = _schedulers.get((test_case, test_name, key))
+        if scheduler is None:
+            scheduler = ArrivalScheduler(rate)
+            _schedulers[(test_case, test_name, key)] = scheduler
+
+    return scheduler
+
+
+def pop_arrival_summaries(test_case: int, test_name: str) -> Tuple[Tuple[str, dict], ...]:
+    """Получение итогов планировщиков теста с их удалением.
+    Вызывается по завершении теста, чтобы следующий запуск теста начинал расписание заново.
+
+    :param test_case: id тест кейса в конфигурации запуска;
+    :param test_name: имя теста.
+
+    :return: кортеж пар (ws метод или "*", итоги планировщика).
+    """
+    with _schedulers_lock:
+        keys = [key for key in _schedulers if key[:2] == (test_case, test_name)]
+        schedulers = [(key[2], _schedulers.pop(key)) for key in keys]
+
+    return tuple((method, scheduler.get_summary()) for method, scheduler in schedulers)
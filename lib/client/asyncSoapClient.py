@@ -0,0 +1,178 @@
+import time
+import json
+import asyncio
+import threading
+from typing import Callable, List
+
+try:
+    import httpx
+except ImportError:
+    # httpx нужен только для тестов с executor = "asyncio" (см. AsyncSoapClient)
+    httpx = None
+
+from zeep import AsyncClient
+from zeep.transports import AsyncTransport
+from zeep.exceptions import TransportError
+
+from requests.exceptions import ConnectionError
+
+from lib.log_and_statistic.statistic import Statistic
+
+from lib.client import arrival
+from lib.client.retry import Retry
+from lib.client.soapClient import SoapClient
+from lib.client.transport import get_wsdl_document, get_session
+
+
+# zeep клиенты, общие для всех AsyncSoapClient одного event loop: (url, event loop) -> AsyncClient.
+# WSDL разбирается один раз, а все сессии используют один пул соединений httpx.
+_shared_clients: dict = {}
+_shared_clients_lock = threading.Lock()
+
+
+async def close_shared_clients() -> None:
+    """Закрытие общих zeep клиентов текущего event loop.
+    Вызывается перед завершением event loop.
+
+    """
+    loop = asyncio.get_running_loop()
+    with _shared_clients_lock:
+        keys = [key for key in _shared_clients if key[1] is loop]
+        clients = [_shared_clients.pop(key) for key in keys]
+    for client in clients:
+        await client.transport.aclose()
+
+
+class AsyncSoapClient(SoapClient):
+    """Асинхронный клиент для отправки/приема сообщений по протоколу SOAP.
+    Используется в тестах-корутинах при запуске теста в режиме executor = "asyncio".
+    Объект должен создаваться внутри работающего event loop. Все объекты одного event loop
+    используют общий zeep клиент и общий пул соединений (размер задается настройкой ws.max_connections).
+    Требует пакет httpx; без него модуль импортируется, но создание клиента - критическая ошибка.
+
+    """
+    _connection_errors = (ConnectionError, httpx.TransportError) if httpx is not None else (ConnectionError,)
+    _fast_path_supported = False
+
+    def __init__(self, ip: str, port: int, config: dict, statistic: Statistic):
+        if httpx is None:
+            statistic.append_error("Для запуска тестов с executor = asyncio требуется пакет httpx!", "EXECUTOR", True)
+        self._max_connections: int = config['ws'].get('max_connections', 100)
+        SoapClient.__init__(self, ip, port, config, statistic)
+        # ограничение одновременных вызовов submit (вместо пула потоков SoapClient)
+        self._batch_semaphore = asyncio.Semaphore(self._batch_workers)
+
+    def _create_client(self) -> AsyncClient:
+        """Получение общего для текущего event loop асинхронного zeep клиента.
+        WSDL загружается через общую для процесса сессию сервера (см. get_session).
+
+        :return: объект асинхронного zeep клиента.
+        """
+        key = (self._url, asyncio.get_running_loop())
+        with _shared_clients_lock:
+            client = _shared_clients.get(key)
+            if client is None:
+                limits = httpx.Limits(max_connections=self._max_connections,
+                                      max_keepalive_connections=self._max_connections)
+                transport = AsyncTransport(client=httpx.AsyncClient(limits=limits, timeout=None))
+                client = AsyncClient(get_wsdl_document(self._url, self._statistic,
+                                                       get_session(self._url, self._pool_size), self._timeout,
+                                                       self._wsdl_cache), transport=transport)
+                _shared_clients[key] = client
+
+        return client
+
+    def submit(self, function: Callable, *args, **kwargs) -> asyncio.Future:
+        """Запуск независимого асинхронного вызова в текущем event loop (аналог SoapClient.submit).
+        Одновременно выполняется не более ws.batch_workers вызовов клиента.
+
+        :param function: корутинная функция;
+        :param args: позиционные аргументы функции;
+        :param kwargs: именованные аргументы функции.
+
+        :return: Future с результатом функции.
+        """
+        async def call():
+            async with self._batch_semaphore:
+                return await function(*args, **kwargs)
+
+        return asyncio.ensure_future(call())
+
+    async def call_method2_batch(self, calls: List[tuple]) -> List[dict]:
+        """Одновременное выполнение нескольких независимых вызовов call_method2 (см. submit).
+
+        :param calls: список аргументов вызовов вида (method, params, sysparams, expected_user_codes).
+
+        :return: список ответов в порядке вызовов.
+        """
+        return list(await asyncio.gather(*[self.submit(self.call_method2, *call) for call in calls]))
+
+    async def call_method2(self, method: str, params: dict, sysparams: dict, expected_user_codes: list) -> dict:
+        """Асинхронный метод отправки сообщения и приема ответа по протоколу SOAP.
+        Проверки ответа, повторные попытки, повторная авторизация и статистика такие же,
+        как в SoapClient.call_method2.
+
+        :param method: имя ws метода;
+        :param params: параметры метода;
+        :param sysparams: системные параметры;
+        :param expected_user_codes: ожидаемые значения user_code.
+
+        :return: словарь, полученный из json ответа.
+        """
+        self._log_call(method, params, sysparams, expected_user_codes)
+
+        retry = self._retry_policy.start(self._url)
+        try:
+            return await self._call_method2(retry, method, params, sysparams, expected_user_codes)
+        finally:
+            retry.release()
+
+    async def _call_method2(self, retry: Retry, method: str, params: dict, sysparams: dict,
+                            expected_user_codes: list) -> dict:
+        """Асинхронные попытки вызова CallMethod2 по политике ws.retry (см. SoapClient._call_method2).
+
+        :param retry: серия попыток;
+        :param method: имя ws метода;
+        :param params: параметры метода;
+        :param sysparams: системные параметры;
+        :param expected_user_codes: ожидаемые значения user_code.
+
+        :return: словарь, полученный из json ответа.
+        """
+        renewed = False
+        while True:
+            delay = self._get_attempt_delay(retry)
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self._get_attempt_delay(retry)
+            try:
+                arrival_scheduler = arrival.get_arrival_scheduler(self._rate_test_case, self._statistic.get_test_name(),
+                                                                  method, self._rate_settings)
+                if arrival_scheduler is None:
+                    await asyncio.sleep(self._request_ws_pause)
+                else:
+                    await asyncio.sleep(max(arrival_scheduler.reserve(), 0))
+
+                self._print_request_info(method, params)
+
+                sysparams['timeout'] = self._timeout
+                start_time = time.time()
+                if self._client is None:
+                    response, size, delay = self._replay_response(method, params)
+                    await asyncio.sleep(delay)
+                else:
+                    response: str = await self._client.service.CallMethod2(method, json.dumps(params),
+                                                                           json.dumps(sysparams))
+                    # общий клиент не хранит http заголовки конкретного ответа, поэтому размер считается по ответу
+                    size = str(len(response.encode()))
+
+                # повторная авторизация выполняется синхронным клиентом брокера, поэтому вне event loop
+                if not renewed and await asyncio.get_running_loop().run_in_executor(
+                        None, self._renew_token, method, response, sysparams):
+                    renewed = True
+                    retry.success()
+                    continue
+                return self._complete_call(method, params, response, size, start_time, retry, expected_user_codes)
+            except self._connection_errors + (TransportError, json.JSONDecodeError) as e:
+                self._register_failure(method, e)
+            await asyncio.sleep(self._get_retry_delay(retry))
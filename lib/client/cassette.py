@@ -0,0 +1,268 @@
+import os
+import glob
+import gzip
+import json
+import time
+import zlib
+import datetime
+import threading
+from collections import deque
+from typing import Optional, Tuple
+
+
+# кассеты процесса: путь к файлам кассеты -> Cassette
+_cassettes: dict = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(config: dict, name: str, run_start: datetime.datetime) -> Optional["Cassette"]:
+    """Получение общей для процесса кассеты записи/воспроизведения трафика теста.
+
+    Настройки берутся из блока "cassette" настроек теста:
+        "mode" - "record" - запись, "replay" - воспроизведение (по умолчанию "" - кассета не используется);
+        "dir" - папка кассет (по умолчанию ./cassettes);
+        "timing" - "original" - ответы при воспроизведении выдаются с записанными задержками,
+                   "fast" - без задержек (по умолчанию "original").
+
+    :param config: настройки теста;
+    :param name: имя кассеты (имя теста);
+    :param run_start: время запуска приложения (см. Log.get_start_time), задает версию записи кассеты.
+
+    :return: объект кассеты или None, если кассета не используется.
+    """
+    settings: dict = config.get('cassette', {})
+    mode: str = settings.get('mode', "")
+    if not mode:
+        return None
+    assert mode in ("record", "replay"), "[0015] Недопустимый режим кассеты '" + mode + "'. Доступны: record, replay"
+
+    path = os.path.join(settings.get('dir', "./cassettes"), name)
+    with _cassettes_lock:
+        cassette = _cassettes.get(path)
+        if cassette is None:
+            cassette = Cassette(path, mode, settings.get('timing', "original"), run_start.strftime("%Y%m%d%H%M%S%f"))
+            _cassettes[path] = cassette
+
+    return cassette
+
+
+class Cassette:
+    """Кассета запросов/ответов SOAP и ZMQ.
+    При записи каждый процесс пишет свой файл <path>.<version>.<pid>.jsonl.gz: одна json строка на событие, каждая
+    строка сразу сжимается и сбрасывается на диск (рабочие процессы завершаются без закрытия файлов).
+    Версия - время запуска приложения, общее для всех процессов запуска: при начале записи файлы предыдущих
+    записей кассеты удаляются, а при воспроизведении читаются все файлы последней версии:
+        SOAP - ответы выдаются в порядке записи по имени ws метода и параметрам вызова, а если ответа на такие
+               параметры не осталось - по имени ws метода;
+        ZMQ - каждый новый клиент получает следующий записанный поток (stream) сообщений; после отправки
+              очередного запроса клиенту выдаются ответы, записанные после соответствующего запроса, при этом
+              messageId записанного запроса заменяется на messageId нового.
+
+    """
+    def __init__(self, path: str, mode: str, timing: str, version: str):
+        self._path = path
+        self._mode = mode
+        self._original_timing: bool = timing == "original"
+        self._lock = threading.Lock()
+        self._streams = 0
+
+        self._file = None
+        # ответы SOAP по (методу, параметрам) и по методам, потоки ZMQ при воспроизведении
+        self._soap: dict = {}
+        self._soap_methods: dict = {}
+        self._zmq: list = []
+        if mode == "record":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            for file_version, file_path in self._get_files():
+                if file_version < version:
+                    os.remove(file_path)
+            self._file = gzip.open(path + "." + version + "." + str(os.getpid()) + ".jsonl.gz", "wb")
+        else:
+            self._load()
+
+    def is_replay(self) -> bool:
+        return self._mode == "replay"
+
+    def record_soap(self, method: str, params: dict, response: str, size: str, duration: float) -> None:
+        """Запись ответа ws метода.
+
+        :param method: имя ws метода;
+        :param params: параметры метода;
+        :param response: ответ (json строка);
+        :param size: размер ответа в байтах;
+        :param duration: время ответа в секундах.
+        """
+        self.write({"kind": "soap", "method": method, "params": _get_params_key(params), "response": response,
+                    "size": size, "duration": duration})
+
+    def replay_soap(self, method: str, params: dict) -> Optional[Tuple[str, str, float]]:
+        """Получение следующего записанного ответа ws метода на те же параметры, а если таких ответов не осталось -
+        следующего записанного ответа метода.
+        Задержка не выполняется здесь, чтобы кассету можно было использовать и в потоках, и в корутинах.
+
+        :param method: имя ws метода;
+        :param params: параметры метода.
+
+        :return: ответ, его размер и задержка перед выдачей ответа в секундах (записанное время ответа
+                 при timing = original, иначе 0) или None, если ответы метода в кассете закончились.
+        """
+        with self._lock:
+            event = _pop_event(self._soap.get((method, _get_params_key(params))))
+            if event is None:
+                event = _pop_event(self._soap_methods.get(method))
+            if event is None:
+                return None
+            event['replayed'] = True
+
+        return event['response'], event['size'], event['duration'] if self._original_timing else 0.0
+
+    def open_zmq_stream(self) -> "ZmqStream":
+        """Создание потока сообщений ZMQ для нового клиента.
+
+        :return: объект потока.
+        """
+        with self._lock:
+            if self._mode == "record":
+                stream = ZmqStream(self, self._streams, [])
+            else:
+                events = self._zmq[self._streams] if self._streams < len(self._zmq) else []
+                stream = ZmqStream(self, self._streams, events)
+            self._streams += 1
+
+        return stream
+
+    def is_original_timing(self) -> bool:
+        return self._original_timing
+
+    def write(self, event: dict) -> None:
+        """Запись события в файл кассеты процесса.
+
+        :param event: событие (json объект).
+        """
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._file.write(line)
+            self._file.flush(zlib.Z_SYNC_FLUSH)
+
+    def _get_files(self) -> list:
+        """Получение файлов кассеты.
+
+        :return: отсортированный список (версия, путь к файлу); у файлов без версии версия - пустая строка.
+        """
+        files = []
+        for file_path in sorted(glob.glob(self._path + ".*.jsonl.gz")):
+            parts = file_path[len(self._path) + 1:-len(".jsonl.gz")].split(".")
+            files.append((parts[0] if len(parts) > 1 else "", file_path))
+
+        return files
+
+    def _load(self) -> None:
+        """Загрузка файлов последней версии кассеты.
+        Файлы, запись которых была прервана, читаются до последнего сброшенного события.
+
+        """
+        files = self._get_files()
+        last_version = max([file_version for file_version, _ in files], default="")
+        streams: dict = {}
+        for file_version, file_path in files:
+            if file_version != last_version:
+                continue
+            with gzip.open(file_path, "rb") as file:
+                try:
+                    for line in file:
+                        event = json.loads(line.decode("utf-8"))
+                        if event['kind'] == "soap":
+                            self._soap.setdefault((event['method'], event.get('params')), deque()).append(event)
+                            self._soap_methods.setdefault(event['method'], deque()).append(event)
+                        else:
+                            streams.setdefault((file_path, event['stream']), []).append(event)
+                except EOFError:
+                    pass
+        self._zmq = [streams[key] for key in sorted(streams)]
+
+
+class ZmqStream:
+    """Поток сообщений одного ZmqClient в кассете (см. Cassette.open_zmq_stream).
+
+    """
+    def __init__(self, cassette: Cassette, stream_id: int, events: list):
+        self._cassette = cassette
+        self._stream_id = stream_id
+        self._events = events
+        self._position = 0
+        self._start_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, message: str) -> None:
+        """Запись сообщения.
+
+        :param kind: "send" - запрос клиента, "recv" - сообщение сервера;
+        :param message: текст сообщения.
+        """
+        self._cassette.write({"kind": "zmq_" + kind, "stream": self._stream_id,
+                              "time": time.monotonic() - self._start_time, "message": message})
+
+    def replay_send(self, message: str) -> list:
+        """Сопоставление отправленного запроса со следующим записанным и получение ответов на него.
+
+        :param message: текст отправленного запроса.
+
+        :return: список (задержка в секундах относительно запроса, текст ответа) - ответы, записанные после
+                 соответствующего запроса и до следующего запроса.
+        """
+        message_id = _get_message_id(message)
+        with self._lock:
+            while self._position < len(self._events) and self._events[self._position]['kind'] != "zmq_send":
+                self._position += 1
+            if self._position >= len(self._events):
+                return []
+            request = self._events[self._position]
+            self._position += 1
+            recorded_id = _get_message_id(request['message'])
+            responses = []
+            while self._position < len(self._events) and self._events[self._position]['kind'] == "zmq_recv":
+                event = self._events[self._position]
+                response = event['message']
+                if recorded_id and message_id:
+                    response = response.replace(recorded_id, message_id)
+                delay = event['time'] - request['time'] if self._cassette.is_original_timing() else 0.0
+                responses.append((max(delay, 0.0), response))
+                self._position += 1
+
+        return responses
+
+
+def _get_message_id(message: str) -> str:
+    start = message.find("<messageId>")
+    end = message.find("</messageId>")
+    if start < 0 or end < 0:
+        return ""
+
+    return message[start + len("<messageId>"):end]
+
+
+def _get_params_key(params: dict) -> str:
+    """Получение канонического представления параметров вызова для сопоставления с записанными вызовами.
+
+    :param params: параметры метода.
+
+    :return: json строка с отсортированными ключами.
+    """
+    return json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+
+def _pop_event(events: Optional[deque]) -> Optional[dict]:
+    """Извлечение следующего еще не воспроизведенного события из очереди.
+    Один ответ находится в двух очередях (по параметрам и по методу), поэтому события, уже воспроизведенные
+    через другую очередь, пропускаются.
+
+    :param events: очередь событий или None.
+
+    :return: событие или None, если очередь пуста.
+    """
+    while events:
+        event = events.popleft()
+        if not event.get('replayed'):
+            return event
+
+    return None
@@ -0,0 +1,191 @@
+import time
+import random
+import threading
+
+
+class CircuitBreaker:
+    """Автоматический выключатель запросов к одному адресу (circuit breaker).
+    После threshold неудачных попыток подряд выключатель размыкается, и на время reset_timeout запросы к адресу
+    не отправляются. Затем пропускается одна пробная попытка: при успехе выключатель замыкается,
+    при неудаче снова размыкается на reset_timeout. Общий для всех потоков процесса (см. get_circuit_breaker).
+
+    """
+    def __init__(self, threshold: int, reset_timeout: float):
+        self._threshold = threshold
+        self._reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe = False
+
+    def acquire(self) -> float:
+        """Запрос разрешения на попытку.
+
+        :return: 0 - попытку можно выполнять, иначе - через сколько секунд запросить разрешение снова.
+        """
+        if self._threshold <= 0:
+            return 0.0
+        with self._lock:
+            if self._failures < self._threshold:
+                return 0.0
+            remaining = self._opened_at + self._reset_timeout - time.monotonic()
+            if remaining > 0:
+                return remaining
+            if self._probe:
+                # пробная попытка уже выполняется другим потоком
+                return min(self._reset_timeout, 1.0)
+            self._probe = True
+            return 0.0
+
+    def success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probe or self._failures == self._threshold:
+                self._opened_at = time.monotonic()
+            self._probe = False
+
+
+# выключатели процесса: адрес -> CircuitBreaker
+_circuit_breakers: dict = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint: str, threshold: int, reset_timeout: float) -> CircuitBreaker:
+    """Получение общего для процесса выключателя адреса.
+
+    :param endpoint: адрес (url) сервиса;
+    :param threshold: количество неудачных попыток подряд, после которого выключатель размыкается (0 - отключен);
+    :param reset_timeout: время в секундах, на которое размыкается выключатель.
+
+    :return: объект выключателя.
+    """
+    with _circuit_breakers_lock:
+        circuit_breaker = _circuit_breakers.get(endpoint)
+        if circuit_breaker is None:
+            circuit_breaker = CircuitBreaker(threshold, reset_timeout)
+            _circuit_breakers[endpoint] = circuit_breaker
+
+    return circuit_breaker
+
+
+class RetryPolicy:
+    """Политика повторных попыток при недоступности сервиса.
+    Пауза перед n-й повторной попыткой: min(max_delay, base_delay * multiplier ^ (n - 1)), уменьшенная на случайную
+    долю до jitter, чтобы потоки не повторяли запросы одновременно. Попытки прекращаются после max_attempts попыток
+    или по истечении deadline секунд с первой попытки. Для адреса сервиса используется общий выключатель
+    (см. CircuitBreaker).
+
+    Настройки берутся из словаря retry настроек клиента (например, ws.retry):
+        "max_attempts" - максимальное количество попыток (по умолчанию 10, 0 - без ограничения);
+        "deadline" - максимальное время всех попыток в секундах (по умолчанию 300, 0 - без ограничения);
+        "base_delay" - пауза перед первой повторной попыткой в секундах (по умолчанию 1);
+        "max_delay" - максимальная пауза в секундах (по умолчанию 30);
+        "multiplier" - множитель паузы (по умолчанию 2);
+        "jitter" - максимальная случайная доля, на которую уменьшается пауза, от 0 до 1 (по умолчанию 0.5);
+        "breaker_threshold" - количество неудач подряд для размыкания выключателя (по умолчанию 5, 0 - отключен);
+        "breaker_reset" - время размыкания выключателя в секундах (по умолчанию 10).
+    """
+    def __init__(self, settings: dict):
+        self._max_attempts: int = settings.get('max_attempts', 10)
+        self._deadline: float = settings.get('deadline', 300)
+        self._base_delay: float = settings.get('base_delay', 1)
+        self._max_delay: float = settings.get('max_delay', 30)
+        self._multiplier: float = settings.get('multiplier', 2)
+        self._jitter: float = settings.get('jitter', 0.5)
+        self._breaker_threshold: int = settings.get('breaker_threshold', 5)
+        self._breaker_reset: float = settings.get('breaker_reset', 10)
+
+    def start(self, endpoint: str) -> "Retry":
+        """Начало серии попыток одного вызова.
+
+        :param endpoint: адрес (url) сервиса.
+
+        :return: объект серии попыток.
+        """
+        return Retry(self, get_circuit_breaker(endpoint, self._breaker_threshold, self._breaker_reset))
+
+    def get_max_attempts(self) -> int:
+        return self._max_attempts
+
+    def get_deadline(self) -> float:
+        return self._deadline
+
+    def get_delay(self, retry_number: int) -> float:
+        """Получение паузы перед повторной попыткой.
+
+        :param retry_number: номер повторной попытки (с 1).
+
+        :return: пауза в секундах.
+        """
+        delay = min(self._max_delay, self._base_delay * self._multiplier ** (retry_number - 1))
+        return delay * (1 - self._jitter * random.random())
+
+
+class Retry:
+    """Серия попыток одного вызова (см. RetryPolicy.start).
+    Методы возвращают паузы, а не ждут сами, поэтому серия используется и в потоках, и в корутинах.
+    Исход каждой разрешенной попытки должен быть зарегистрирован (success/failure), иначе пробная попытка
+    выключателя не завершится: поэтому серия завершается вызовом release в finally.
+
+    """
+    def __init__(self, policy: RetryPolicy, circuit_breaker: CircuitBreaker):
+        self._policy = policy
+        self._circuit_breaker = circuit_breaker
+        self._attempt = 0
+        # попытка разрешена, но ее исход еще не зарегистрирован
+        self._in_progress = False
+        self._deadline = time.monotonic() + policy.get_deadline() if policy.get_deadline() else 0.0
+
+    def get_attempt(self) -> int:
+        """Метод-геттер номера текущей попытки.
+
+        :return: номер попытки (с 1), 0 - ни одной попытки еще не было.
+        """
+        return self._attempt
+
+    def acquire(self):
+        """Запрос разрешения на очередную попытку у выключателя адреса.
+
+        :return: 0 - попытку можно выполнять, None - время попыток истекло,
+                 иначе - через сколько секунд запросить разрешение снова.
+        """
+        delay = self._circuit_breaker.acquire()
+        if delay <= 0:
+            self._attempt += 1
+            self._in_progress = True
+            return 0.0
+        if self._deadline and time.monotonic() + delay > self._deadline:
+            return None
+        return delay
+
+    def success(self) -> None:
+        self._in_progress = False
+        self._circuit_breaker.success()
+
+    def failure(self):
+        """Регистрация неудачной попытки.
+
+        :return: пауза перед следующей попыткой в секундах или None, если попытки исчерпаны.
+        """
+        self._in_progress = False
+        self._circuit_breaker.failure()
+        if self._policy.get_max_attempts() and self._attempt >= self._policy.get_max_attempts():
+            return None
+        delay = self._policy.get_delay(self._attempt)
+        if self._deadline and time.monotonic() + delay > self._deadline:
+            return None
+        return delay
+
+    def release(self) -> None:
+        """Завершение серии: попытка, исход которой не зарегистрирован (вызов прерван необработанным
+        исключением), считается неудачной, чтобы выключатель не остался в состоянии пробной попытки.
+
+        """
+        if self._in_progress:
+            self._in_progress = False
+            self._circuit_breaker.failure()
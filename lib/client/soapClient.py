@@ -1,21 +1,44 @@
 import time
 import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+from lxml import etree
 
 from zeep import Client
-from zeep.plugins import HistoryPlugin
 from zeep.exceptions import TransportError
 
 from requests.exceptions import ConnectionError
 
 from lib.log_and_statistic.statistic import Statistic
 
+from lib.client import arrival
+from lib.client.cassette import get_cassette
+from lib.client.retry import RetryPolicy, Retry
+from lib.client.transport import get_wsdl_document, get_session, CallMethod2FastPath, MeasuringTransport, \
+    ThreadLocalHistoryPlugin
+
 from scripts.common import tools
 
 
+# общие для процесса zeep клиенты: (url, ws.wsdl_cache, ws.debug_history) -> (Client, MeasuringTransport, history)
+# Клиент, транспорт и история не хранят состояния конкретного теста (показатели обмена и история отдельные
+# для каждого потока), поэтому клиенты тестов всех тест кейсов рабочего процесса используют один прогретый клиент.
+_shared_clients: dict = {}
+# общие для процесса быстрые пути CallMethod2: url -> CallMethod2FastPath
+_shared_fast_paths: dict = {}
+_shared_lock = threading.Lock()
+
+
 class SoapClient:
     """Класс для отправки/приема сообщений по протоколу SOAP
 
     """
+    # исключения, означающие недоступность сервиса
+    _connection_errors = (ConnectionError,)
+    # поддерживается ли быстрый путь CallMethod2 (см. lib.client.transport.CallMethod2FastPath)
+    _fast_path_supported = True
 
     def __init__(self, ip: str, port: int, config: dict, statistic: Statistic):
         self._statistic = statistic
@@ -23,20 +46,92 @@ class SoapClient:
 
         self._ip = ip
         self._port = port
-        self._history = HistoryPlugin()
+        # история конвертов zeep хранит последние запрос и ответ каждого потока, поэтому включается только
+        # для отладки настройкой ws.debug_history (конверты выводятся в лог уровня DEBUG)
+        self._debug_history: bool = config['ws'].get('debug_history', False)
+        self._history = None
+        self._transport = None
         self._url = 'http://' + self._ip + ':' + str(self._port) + '/axis2/services/Iv7Server/?wsdl'
-        while True:
-            try:
-                self._client = Client(self._url, plugins=[self._history])
-                break
-            except ConnectionError:
-                self._statistic.append_error("Сервис не доступен на " + self._url, "WS_ПОДКЛЮЧЕНИЕ")
-                self._logger.error("Unable connect to " + self._url)
-                time.sleep(5)
+        # постоянный кэш WSDL/XSD, см. lib.client.transport.get_wsdl_document
+        self._wsdl_cache: bool = config['ws'].get('wsdl_cache', True)
+        self._timeout: int = config['ws']['timeout']
+        # ограниченный пул потоков для одновременных запросов (см. submit), создается при первом использовании
+        self._batch_workers: int = config['ws'].get('batch_workers', 4)
+        # размер общего пула http соединений процесса: ws.pool_size, а если он не задан - количество потоков теста
+        # (ws.threads) с запасом на одновременные запросы submit. Соединения открываются по мере надобности,
+        # поэтому запас ничего не стоит, а пул не приходится увеличивать при первом вызове submit (см. get_session)
+        self._pool_size: int = config['ws'].get('pool_size', 0) or \
+            config['ws'].get('threads', 1) * self._batch_workers
+        # повторные попытки при недоступности сервиса, см. lib.client.retry.RetryPolicy
+        self._retry_policy = RetryPolicy(config['ws'].get('retry', {}))
+        # значения user_code, которыми сервер отвергает токен авторизации (см. _renew_token)
+        self._auth_failure_codes: list = config['ws'].get('token', {}).get('auth_failure_codes', [])
+        # запись/воспроизведение трафика (см. lib.client.cassette.get_cassette), при воспроизведении сервер не нужен
+        self._cassette = get_cassette(config, statistic.get_test_name(), statistic.get_log().get_start_time())
+        self._client = None
+        retry = self._retry_policy.start(self._url)
+        try:
+            while self._cassette is None or not self._cassette.is_replay():
+                # попытки получения WSDL считаются отдельно от попыток вызовов ws методов
+                self._wait_attempt(retry, "WSDL")
+                try:
+                    self._client = self._create_client()
+                    retry.success()
+                    break
+                except self._connection_errors:
+                    self._statistic.append_error("Сервис не доступен на " + self._url, "WS_ПОДКЛЮЧЕНИЕ")
+                    self._logger.error("Unable connect to " + self._url)
+                    time.sleep(self._get_retry_delay(retry))
+        finally:
+            retry.release()
+
+        # быстрый путь CallMethod2 без сериализации zeep, включается настройкой ws.fast_path
+        self._fast_path = None
+        if config['ws'].get('fast_path', False) and self._fast_path_supported and self._client is not None:
+            with _shared_lock:
+                self._fast_path = _shared_fast_paths.get(self._url)
+                if self._fast_path is None:
+                    self._fast_path = CallMethod2FastPath(self._client, get_session(self._url, self._pool_size))
+                    _shared_fast_paths[self._url] = self._fast_path
 
         self._request_ws_pause: float = config['ws']['pause']
-        self._timeout: int = config['ws']['timeout']
         self._expected_response_time: float = config['ws']['expected_response_time']
+        # целевая интенсивность запросов (open-loop режим), см. lib.client.arrival.get_arrival_scheduler
+        self._rate_settings = config['ws'].get('rate')
+        self._rate_test_case: int = config['ws'].get('rate_test_case', 0)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _create_client(self):
+        """Получение общего для процесса zeep клиента сервиса (создается при первом обращении).
+        WSDL разбирается один раз на процесс и берется из постоянного кэша (см. get_wsdl_document),
+        запросы отправляются через общую для процесса сессию с пулом keep-alive соединений (см. get_session).
+
+        :return: объект zeep клиента.
+        """
+        # вызывается каждым клиентом, а не только при создании общего zeep клиента: тест с большим количеством
+        # потоков, запущенный в том же процессе позже, увеличивает пул общей сессии
+        session = get_session(self._url, self._pool_size)
+        key = (self._url, self._wsdl_cache, self._debug_history)
+        with _shared_lock:
+            shared_client = _shared_clients.get(key)
+        if shared_client is None:
+            transport = MeasuringTransport(session=session)
+            history = ThreadLocalHistoryPlugin() if self._debug_history else None
+            client = Client(get_wsdl_document(self._url, self._statistic, session, self._timeout, self._wsdl_cache),
+                            transport=transport, plugins=[history] if history is not None else [])
+            with _shared_lock:
+                shared_client = _shared_clients.setdefault(key, (client, transport, history))
+        client, self._transport, self._history = shared_client
+
+        return client
+
+    def get_statistic(self) -> Statistic:
+        """Метод-геттер объекта статистики клиента.
+
+        :return: объект класса Statistic.
+        """
+        return self._statistic
 
     def get_request_pause(self) -> float:
         """Получение значения паузы между ws запросами
@@ -54,7 +149,37 @@ class SoapClient:
 
     def call_method2(self, method: str, params: dict, sysparams: dict, expected_user_codes: list) -> dict:
         """Метод отправки сообщения и приема ответа по протоколу SOAP.
+        Если для метода задана целевая интенсивность (ws.rate), запрос отправляется по расписанию
+        общего для теста планировщика вместо паузы ws.pause.
+        При недоступности сервиса запрос повторяется по политике ws.retry (см. RetryPolicy).
+        При ws.fast_path = true запрос отправляется быстрым путем (см. CallMethod2FastPath), проверки ответа
+        и статистика не меняются.
+        Если сервер отверг токен брокера авторизации, вызов один раз повторяется с новым токеном (см. _renew_token).
+        В режиме записи кассеты (cassette.mode = record) ответы записываются в кассету, в режиме воспроизведения
+        (replay) запрос на сервер не отправляется, а ответ берется из кассеты.
+
+        :param method: имя ws метода;
+        :param params: параметры метода;
+        :param sysparams: системные параметры;
+        :param expected_user_codes: ожидаемые значения user_code.
+
+        :return: словарь, полученный из json ответа.
+        """
+        self._log_call(method, params, sysparams, expected_user_codes)
+
+        retry = self._retry_policy.start(self._url)
+        try:
+            return self._call_method2(retry, method, params, sysparams, expected_user_codes)
+        finally:
+            # попытка, прерванная необработанным исключением (Fault, таймаут чтения, критическая ошибка),
+            # считается неудачной, иначе пробная попытка выключателя не завершилась бы
+            retry.release()
 
+    def _call_method2(self, retry: Retry, method: str, params: dict, sysparams: dict,
+                      expected_user_codes: list) -> dict:
+        """Попытки вызова CallMethod2 по политике ws.retry (см. call_method2).
+
+        :param retry: серия попыток;
         :param method: имя ws метода;
         :param params: параметры метода;
         :param sysparams: системные параметры;
@@ -62,89 +187,301 @@ class SoapClient:
 
         :return: словарь, полученный из json ответа.
         """
+        renewed = False
+        while True:
+            self._wait_attempt(retry)
+            try:
+                arrival_scheduler = arrival.get_arrival_scheduler(self._rate_test_case, self._statistic.get_test_name(),
+                                                                  method, self._rate_settings)
+                if arrival_scheduler is None:
+                    time.sleep(self._request_ws_pause)
+                else:
+                    arrival_scheduler.acquire()
+
+                self._print_request_info(method, params)
+
+                sysparams['timeout'] = self._timeout
+                start_time = time.time()
+                if self._client is None:
+                    response, size, delay = self._replay_response(method, params)
+                    time.sleep(delay)
+                elif self._fast_path is None:
+                    response: str = self._client.service.CallMethod2(method, json.dumps(params), json.dumps(sysparams))
+                    size = str(self._transport.get_last_exchange()['received'])
+                    if self._history is not None:
+                        self._log_history()
+                else:
+                    response, response_size = self._fast_path.call(method, json.dumps(params), json.dumps(sysparams))
+                    size: str = str(response_size)
+
+                if not renewed and self._renew_token(method, response, sysparams):
+                    renewed = True
+                    retry.success()
+                    continue
+                return self._complete_call(method, params, response, size, start_time, retry, expected_user_codes)
+            except self._connection_errors + (TransportError, json.JSONDecodeError) as e:
+                self._register_failure(method, e)
+            time.sleep(self._get_retry_delay(retry))
+
+    def submit(self, function: Callable, *args, **kwargs) -> Future:
+        """Отправка независимого вызова на выполнение в пуле потоков клиента.
+        Используется, чтобы выполнять несколько независимых запросов одновременно, например:
+            frame = ws_client.submit(ws_analytics.faceva_get_frame, ws_client, token, camera, time_, statistic)
+            image = ws_client.submit(ws_analytics.faceva_get_event_image, ws_client, token, event, time_, statistic)
+            frame.result(), image.result()
+        Одновременно выполняется не более ws.batch_workers вызовов (по умолчанию 4), остальные ждут в очереди.
+        Запросы идут через общий пул соединений процесса (см. get_session), размер которого заранее учитывает
+        пул потоков. Критическая ошибка в вызове (SystemExit) пробрасывается из Future.result().
+
+        :param function: вызываемая функция (например, функция из scripts/ws, принимающая этот клиент);
+        :param args: позиционные аргументы функции;
+        :param kwargs: именованные аргументы функции.
+
+        :return: Future с результатом функции.
+        """
+        return self._get_executor().submit(function, *args, **kwargs)
+
+    def call_method2_batch(self, calls: List[tuple]) -> List[dict]:
+        """Одновременное выполнение нескольких независимых вызовов call_method2 (см. submit).
+
+        :param calls: список аргументов вызовов вида (method, params, sysparams, expected_user_codes).
+
+        :return: список ответов в порядке вызовов.
+        """
+        futures = [self.submit(self.call_method2, *call) for call in calls]
+
+        return [future.result() for future in futures]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._batch_workers,
+                                                    thread_name_prefix="SoapClient")
+
+        return self._executor
+
+    def _log_call(self, method: str, params: dict, sysparams: dict, expected_user_codes: list) -> None:
+        """Вывод в лог вызова call_method2 (общий для синхронного и асинхронного клиентов).
+
+        :param method: имя ws метода;
+        :param params: параметры метода;
+        :param sysparams: системные параметры;
+        :param expected_user_codes: ожидаемые значения user_code.
+        """
         self._logger.info("was called (method: str, params: dict, sysparams: dict, expected_user_code: int)")
         self._logger.debug("with params(" + method + ", " + str(params) + ", " + str(sysparams) + ", " +
                            str(expected_user_codes))
 
+    def _print_request_info(self, method: str, params: dict) -> None:
+        """Вывод в статистику информации об отправляемом запросе.
+
+        :param method: имя ws метода;
+        :param params: параметры метода.
+        """
+        self._statistic.append_info("\n    Отправка: POST\n" +
+                                    "    URL: " + self._url + "\n" +
+                                    "    WS метод: " + method + "\n" +
+                                    "    Параметры: " + str(params), "WS_ЗАПРОС")
+
+    def _complete_call(self, method: str, params: dict, response: str, size: str, start_time: float, retry: Retry,
+                       expected_user_codes: list) -> dict:
+        """Обработка полученного ответа (общая для синхронного и асинхронного клиентов):
+        запись в кассету, статистика времени ответа, завершение серии попыток и проверка ответа.
+
+        :param method: имя ws метода;
+        :param params: параметры метода;
+        :param response: json строка ответа;
+        :param size: размер ответа в байтах;
+        :param start_time: момент отправки запроса;
+        :param retry: серия попыток;
+        :param expected_user_codes: ожидаемые значения user_code.
+
+        :return: словарь, полученный из json ответа.
+        """
+        response_time = time.time() - start_time
+        if self._cassette is not None and self._client is not None:
+            self._cassette.record_soap(method, params, response, size, response_time)
+
+        self._logger.info("response received")
+        self._logger.debug("response: " + str(response))
+
+        self._print_response_info(method, size, response_time)
+
+        retry.success()
+        return self._check_response(method, response, expected_user_codes)
+
+    def _renew_token(self, method: str, response: str, sysparams: dict) -> bool:
+        """Повторная авторизация, если сервер отверг токен вызова (user_code из ws.token.auth_failure_codes).
+        Токен в sysparams заменяется новым токеном брокера (см. token_broker.renew_token).
+
+        :param method: имя ws метода;
+        :param response: json строка ответа;
+        :param sysparams: системные параметры вызова.
+
+        :return: True - токен заменен и вызов нужно повторить, иначе False.
+        """
+        if not self._auth_failure_codes or not sysparams.get('token'):
+            return False
         try:
-            time.sleep(self._request_ws_pause)
-
-            self._statistic.append_info("\n    Отправка: POST\n" +
-                                        "    URL: " + self._url + "\n" +
-                                        "    WS метод: " + method + "\n" +
-                                        "    Параметры: " + str(params), "WS_ЗАПРОС")
-
-            sysparams['timeout'] = self._timeout
-            start_time = time.time()
-            response: str = self._client.service.CallMethod2(method, json.dumps(params), json.dumps(sysparams))
-            response_time = round((time.time() - start_time) * 1000)
-
-            self._logger.info("response received")
-            self._logger.debug("response: " + str(response))
-
-            headers: dict = self._history.last_received['http_headers']
-            size: str = headers['Content-Length']
-            self._print_response_info(method, size, response_time)
-
-            response: dict = json.loads(response)
-            if tools.check_keys_exist(response, ['user_code'], 'response', False, self._statistic) is False:
-                tools.check_keys_exist(response, ['code'], 'response', True, self._statistic)
-            tools.check_keys_exist(response, ['result'], 'response', True, self._statistic)
-            tools.check_types(["response['result']"], [response["result"]], [list], self._statistic)
-
-            user_code_msg = ""
-            equal_user_codes = False
-            if 'user_code' in response:
-                for expected_user_code in expected_user_codes:
-                    if response["user_code"] == expected_user_code:
-                        equal_user_codes = True
-                        break
-                user_code_msg = "Значение 'user-code': " + str(response["user_code"]) + "! "
-            else:
-                equal_user_codes = True
-            # иногда user_code может быть равен 0 (якобы все хорошо),
-            # но есть ключ code, который может быть НЕ равен 0.
-            code_msg = ""
-            if 'code' in response:
-                for expected_user_code in expected_user_codes:
-                    if response['code'] == expected_user_code and equal_user_codes:
-                        return response
-                code_msg = "Значение 'code': " + str(response["code"]) + "! "
-            elif equal_user_codes:
-                return response
-            self._logger.error("response: " + str(response))
-
-            if 'user_msg' in response:
-                self._statistic.append_error(user_code_msg + code_msg + "Требуется " + str(expected_user_codes) +
-                                             ". 'user_msg': " + response["user_msg"], "WS_ОТВЕТ: " + method, True)
-            if response['result'] and 'user_msg' in response['result'][0]:
-                self._statistic.append_error(user_code_msg + code_msg + "Требуется " + str(expected_user_codes) +
-                                             ". 'user_msg': " + response['result'][0]["user_msg"], "WS_ОТВЕТ: " +
-                                             method, True)
-            self._statistic.append_error(user_code_msg + code_msg + "Требуется " + str(expected_user_codes) + ".",
-                                         "WS_ОТВЕТ: " + method, True)
-        except ConnectionError:
-            self._statistic.append_error("Сервис не доступен на " + self._url, "WS_ПОДКЛЮЧЕНИЕ")
-            self._logger.error("Unable connect to " + self._url)
-            time.sleep(5)
-            return self.call_method2(method, params, sysparams, expected_user_codes)
-        except TransportError as e:
-            self._statistic.append_error("Код статуса: " + str(e.status_code), "WS_ПОДКЛЮЧЕНИЕ")
-            self._logger.error("Status code is " + str(e.status_code))
-            time.sleep(5)
-            return self.call_method2(method, params, sysparams, expected_user_codes)
+            response_dict = json.loads(response)
         except json.JSONDecodeError:
+            return False
+        if not isinstance(response_dict, dict) or response_dict.get('user_code') not in self._auth_failure_codes:
+            return False
+
+        # брокер сам использует SoapClient, поэтому импортируется только при повторной авторизации
+        from lib.client import token_broker
+        token = token_broker.renew_token(sysparams['token'], self._statistic)
+        if not token:
+            return False
+        self._logger.warning("token is rejected, login again")
+        self._statistic.append_warn("Сервер отверг токен авторизации, токен получен заново", "WS_ОТВЕТ: " + method)
+        sysparams['token'] = token
+        return True
+
+    def _register_failure(self, method: str, error: Exception) -> None:
+        """Регистрация неудачной попытки вызова в статистике (общая для синхронного и асинхронного клиентов).
+        Некорректный json ответа - критическая ошибка.
+
+        :param method: имя ws метода;
+        :param error: исключение попытки (недоступность сервиса, код статуса http или ошибка разбора json).
+        """
+        if isinstance(error, json.JSONDecodeError):
             self._statistic.append_error("Некорректный формат JSON!", "WS_ОТВЕТ", True)
+        self._statistic.append_latency_error("WS: " + method)
+        if isinstance(error, TransportError):
+            self._statistic.append_error("Код статуса: " + str(error.status_code), "WS_ПОДКЛЮЧЕНИЕ")
+            self._logger.error("Status code is " + str(error.status_code))
+        else:
+            self._statistic.append_error("Сервис не доступен на " + self._url, "WS_ПОДКЛЮЧЕНИЕ")
+            self._logger.error("Unable connect to " + self._url)
+
+    def _replay_response(self, method: str, params: dict) -> Tuple[str, str, float]:
+        """Получение записанного ответа ws метода из кассеты (см. Cassette.replay_soap).
+        Если ответы метода в кассете закончились, тест завершается с критической ошибкой.
+
+        :param method: имя ws метода;
+        :param params: параметры метода.
+
+        :return: ответ, его размер и задержка перед выдачей ответа в секундах.
+        """
+        replay = self._cassette.replay_soap(method, params)
+        if replay is None:
+            self._statistic.append_error("В кассете нет ответа на " + method, "WS_КАССЕТА", True)
+
+        return replay
+
+    def _wait_attempt(self, retry: Retry, counter: str = "WS") -> None:
+        """Ожидание разрешения на очередную попытку (см. Retry.acquire).
+        Если время попыток истекло, тест завершается с критической ошибкой.
+
+        :param retry: серия попыток;
+        :param counter: префикс счетчиков попыток в статистике.
+        """
+        delay = self._get_attempt_delay(retry, counter)
+        while delay > 0:
+            time.sleep(delay)
+            delay = self._get_attempt_delay(retry, counter)
+
+    def _get_attempt_delay(self, retry: Retry, counter: str = "WS") -> float:
+        """Запрос разрешения на очередную попытку с подсчетом первых и повторных попыток в статистике
+        (счетчики "<counter>: попытки" и "<counter>: повторные попытки").
+
+        :param retry: серия попыток;
+        :param counter: префикс счетчиков попыток в статистике.
+
+        :return: 0 - попытку можно выполнять, иначе - через сколько секунд запросить разрешение снова.
+        """
+        delay = retry.acquire()
+        if delay is None:
+            self._statistic.append_error("Истекло время попыток подключения к " + self._url, "WS_ПОДКЛЮЧЕНИЕ", True)
+        if delay == 0:
+            self._statistic.append_counter(counter + (": повторные попытки" if retry.get_attempt() > 1 else
+                                                      ": попытки"))
+        return delay
+
+    def _get_retry_delay(self, retry: Retry) -> float:
+        """Регистрация неудачной попытки и получение паузы перед следующей.
+        Если попытки исчерпаны, тест завершается с критической ошибкой.
+
+        :param retry: серия попыток.
+
+        :return: пауза в секундах.
+        """
+        delay = retry.failure()
+        if delay is None:
+            self._statistic.append_error("Исчерпаны попытки (" + str(retry.get_attempt()) + ") подключения к " +
+                                         self._url, "WS_ПОДКЛЮЧЕНИЕ", True)
+        return delay
+
+    def _check_response(self, method: str, response: str, expected_user_codes: list) -> dict:
+        """Разбор json ответа CallMethod2 и проверка user_code/code на соответствие ожидаемым значениям.
+
+        :param method: имя ws метода;
+        :param response: json строка ответа;
+        :param expected_user_codes: ожидаемые значения user_code.
+
+        :return: словарь, полученный из json ответа.
+        """
+        response: dict = json.loads(response)
+        if tools.check_keys_exist(response, ['user_code'], 'response', False, self._statistic) is False:
+            tools.check_keys_exist(response, ['code'], 'response', True, self._statistic)
+        tools.check_keys_exist(response, ['result'], 'response', True, self._statistic)
+        tools.check_types(["response['result']"], [response["result"]], [list], self._statistic)
+
+        user_code_msg = ""
+        equal_user_codes = False
+        if 'user_code' in response:
+            for expected_user_code in expected_user_codes:
+                if response["user_code"] == expected_user_code:
+                    equal_user_codes = True
+                    break
+            user_code_msg = "Значение 'user-code': " + str(response["user_code"]) + "! "
+        else:
+            equal_user_codes = True
+        # иногда user_code может быть равен 0 (якобы все хорошо),
+        # но есть ключ code, который может быть НЕ равен 0.
+        code_msg = ""
+        if 'code' in response:
+            for expected_user_code in expected_user_codes:
+                if response['code'] == expected_user_code and equal_user_codes:
+                    return response
+            code_msg = "Значение 'code': " + str(response["code"]) + "! "
+        elif equal_user_codes:
+            return response
+        self._logger.error("response: " + str(response))
+
+        if 'user_msg' in response:
+            self._statistic.append_error(user_code_msg + code_msg + "Требуется " + str(expected_user_codes) +
+                                         ". 'user_msg': " + response["user_msg"], "WS_ОТВЕТ: " + method, True)
+        if response['result'] and 'user_msg' in response['result'][0]:
+            self._statistic.append_error(user_code_msg + code_msg + "Требуется " + str(expected_user_codes) +
+                                         ". 'user_msg': " + response['result'][0]["user_msg"], "WS_ОТВЕТ: " +
+                                         method, True)
+        self._statistic.append_error(user_code_msg + code_msg + "Требуется " + str(expected_user_codes) + ".",
+                                     "WS_ОТВЕТ: " + method, True)
+
+    def _log_history(self) -> None:
+        """Вывод в лог конвертов последнего запроса и ответа текущего потока (режим ws.debug_history).
+
+        """
+        for name, message in (("sent", self._history.last_sent), ("received", self._history.last_received)):
+            if message is not None:
+                self._logger.debug(name + " envelope: " +
+                                   etree.tostring(message['envelope'], encoding="unicode", pretty_print=True))
 
-    def _print_response_info(self, method: str, size: str, response_time: int):
+    def _print_response_info(self, method: str, size: str, response_time: float):
         self._logger.info("Status code is 200")
 
+        # в гистограмму записывается точное время, до миллисекунд оно округляется только для вывода
+        response_time_ms = round(response_time * 1000)
         self._statistic.append_info("\n    Статус: 200 ОК\n" +
                                     "    Размер: " + size + " Б\n" +
-                                    "    Время ответа: " + str(response_time) + " мс", "WS_ОТВЕТ: " + method)
+                                    "    Время ответа: " + str(response_time_ms) + " мс", "WS_ОТВЕТ: " + method)
+        self._statistic.append_latency("WS: " + method, response_time)
 
         expected_time_ms = self._expected_response_time * 1000
-        if response_time > expected_time_ms:
+        if response_time_ms > expected_time_ms:
             self._logger.error("Response time more than " + str(expected_time_ms) + "ms")
             self._statistic.append_warn("Время ответа больше " + str(expected_time_ms) + "мс (" +
-                                        str(response_time) + ")", "WS_ОТВЕТ: " + method)
+                                        str(response_time_ms) + ")", "WS_ОТВЕТ: " + method)
@@ -0,0 +1,202 @@
+import time
+import threading
+from typing import Callable
+
+from lib.log_and_statistic.statistic import Statistic
+
+from lib.client.soapClient import SoapClient
+
+
+# имя, под которым статистика авторизации брокера попадает в общую сводку запуска
+STATISTIC_NAME = "Авторизация"
+
+# токены процесса: "ip:port:login" -> {"token": "...", "refresh_at": 0.0, "expires": 0.0}
+_tokens: dict = {}
+# блокировки ключей: авторизацию по одному ключу выполняет только один поток процесса
+_key_locks: dict = {}
+# данные авторизации ключей для повторной авторизации (см. renew_token):
+# "ip:port:login" -> (server_login, ip, port, login, password, config)
+_credentials: dict = {}
+# ключи выданных токенов: токен -> "ip:port:login"
+_token_keys: dict = {}
+# клиенты брокера: (ip, port, настройки клиента, см. _get_client) -> SoapClient со статистикой STATISTIC_NAME
+_clients: dict = {}
+_lock = threading.Lock()
+
+# общие для рабочих процессов токены (см. init_shared): словарь и блокировка multiprocessing.Manager
+_shared: dict = {
+    "tokens": None,
+    "lock": None
+}
+
+
+def init_shared(shared_tokens, shared_lock) -> None:
+    """Включение общего для рабочих процессов хранилища токенов.
+    Вызывается при старте рабочего процесса, если включена настройка runner.share_tokens (см. WorkerPool).
+
+    :param shared_tokens: словарь multiprocessing.Manager;
+    :param shared_lock: блокировка multiprocessing.Manager.
+    """
+    _shared['tokens'] = shared_tokens
+    _shared['lock'] = shared_lock
+
+
+def get_token(server_login: Callable[[SoapClient, str, str, Statistic], str], ip: str, port: int, login: str,
+              password: str, config: dict, statistic: Statistic) -> str:
+    """Получение действующего токена пользователя, общего для всех потоков процесса.
+    Авторизация выполняется один раз на ключ (ip, port, login) и повторяется заранее - за refresh_before секунд
+    до истечения срока действия токена ttl. Пока токен еще действует, его обновляет один поток, а остальные
+    продолжают получать текущий токен без ожидания. Если включена настройка runner.share_tokens, токен берется
+    из общего хранилища рабочих процессов и авторизация выполняется одним процессом.
+    Авторизация выполняется отдельным клиентом, поэтому ее время и ошибки попадают в статистику
+    STATISTIC_NAME, а не в статистику теста.
+
+    Настройки берутся из блока ws.token настроек теста:
+        "ttl" - срок действия токена в секундах (по умолчанию 300);
+        "refresh_before" - за сколько секунд до истечения срока токен обновляется (по умолчанию 30);
+        "auth_failure_codes" - значения user_code, которыми сервер отвергает токен: получив такой ответ,
+                               SoapClient один раз повторяет вызов с новым токеном (см. renew_token,
+                               по умолчанию [] - не повторяет).
+
+    :param server_login: функция авторизации (например, scripts.ws.users.server_login);
+    :param ip: ip сервера;
+    :param port: ws порт сервера;
+    :param login: логин пользователя;
+    :param password: пароль пользователя;
+    :param config: настройки теста;
+    :param statistic: объект класса Statistic теста.
+
+    :return: токен.
+    """
+    key = ip + ":" + str(port) + ":" + login
+    entry = _tokens.get(key)
+    if entry is not None and time.time() < entry['refresh_at']:
+        return entry['token']
+
+    with _lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    if entry is not None and time.time() < entry['expires']:
+        if not key_lock.acquire(blocking=False):
+            # токен уже обновляется другим потоком
+            return entry['token']
+    else:
+        key_lock.acquire()
+    try:
+        entry = _tokens.get(key)
+        if entry is None or time.time() >= entry['refresh_at']:
+            entry = _refresh_token(server_login, key, ip, port, login, password, config, statistic)
+            with _lock:
+                _tokens[key] = entry
+                _credentials[key] = (server_login, ip, port, login, password, config)
+                _token_keys[entry['token']] = key
+    finally:
+        key_lock.release()
+
+    return entry['token']
+
+
+def invalidate_token(ip: str, port: int, login: str, token: str) -> None:
+    """Сброс токена, отвергнутого сервером (например, после перезапуска сервера).
+    Следующий get_token выполнит авторизацию заново.
+
+    :param ip: ip сервера;
+    :param port: ws порт сервера;
+    :param login: логин пользователя;
+    :param token: отвергнутый токен.
+    """
+    key = ip + ":" + str(port) + ":" + login
+    with _lock:
+        entry = _tokens.get(key)
+        if entry is not None and entry['token'] == token:
+            del _tokens[key]
+    if _shared['tokens'] is not None:
+        with _shared['lock']:
+            shared_entry = _shared['tokens'].get(key)
+            if shared_entry is not None and shared_entry['token'] == token:
+                del _shared['tokens'][key]
+
+
+def renew_token(token: str, statistic: Statistic) -> str:
+    """Повторная авторизация вместо токена, отвергнутого сервером (см. SoapClient.call_method2).
+    Токен сбрасывается (см. invalidate_token), и новый токен получается через get_token с теми же данными
+    авторизации; если токен уже обновил другой поток, повторной авторизации не будет.
+
+    :param token: отвергнутый токен;
+    :param statistic: объект класса Statistic теста.
+
+    :return: новый токен или пустая строка, если токен выдан не брокером.
+    """
+    with _lock:
+        key = _token_keys.get(token)
+        credentials = _credentials.get(key)
+    if credentials is None:
+        return ""
+    server_login, ip, port, login, password, config = credentials
+    invalidate_token(ip, port, login, token)
+    _get_client(ip, port, config, statistic).get_statistic().append_counter("Токены: повторные авторизации")
+
+    return get_token(server_login, ip, port, login, password, config, statistic)
+
+
+def _refresh_token(server_login: Callable, key: str, ip: str, port: int, login: str, password: str, config: dict,
+                   statistic: Statistic) -> dict:
+    """Получение нового токена: из общего хранилища рабочих процессов или авторизацией.
+
+    :return: запись токена вида {"token": "...", "refresh_at": 0.0, "expires": 0.0}.
+    """
+    if _shared['tokens'] is None:
+        return _login(server_login, ip, port, login, password, config, statistic)
+
+    with _shared['lock']:
+        entry = _shared['tokens'].get(key)
+        if entry is None or time.time() >= entry['refresh_at']:
+            entry = _login(server_login, ip, port, login, password, config, statistic)
+            _shared['tokens'][key] = entry
+        else:
+            _get_client(ip, port, config, statistic).get_statistic().append_counter("Токены: из общего хранилища")
+
+    return dict(entry)
+
+
+def _login(server_login: Callable, ip: str, port: int, login: str, password: str, config: dict,
+           statistic: Statistic) -> dict:
+    """Авторизация клиентом брокера с замером времени.
+
+    :return: запись токена.
+    """
+    settings: dict = config['ws'].get('token', {})
+    ttl: float = settings.get('ttl', 300)
+    refresh_before: float = settings.get('refresh_before', 30)
+
+    client = _get_client(ip, port, config, statistic)
+    client_statistic = client.get_statistic()
+    start_time = time.time()
+    token: str = server_login(client, login, password, client_statistic)
+    client_statistic.append_latency("Получение токена", time.time() - start_time)
+    client_statistic.append_counter("Токены: авторизации")
+
+    return {
+        "token": token,
+        "refresh_at": start_time + max(ttl - refresh_before, 0),
+        "expires": start_time + ttl
+    }
+
+
+def _get_client(ip: str, port: int, config: dict, statistic: Statistic) -> SoapClient:
+    """Получение клиента брокера для сервера.
+    Клиенты различаются настройками, от которых зависит работа клиента (ws.timeout, ws.fast_path, режим и папка
+    кассеты), поэтому тесты с разными настройками не используют клиент, созданный с настройками первого теста.
+
+    :return: объект клиента.
+    """
+    cassette: dict = config.get('cassette', {})
+    key = (ip, port, config['ws']['timeout'], config['ws'].get('fast_path', False), cassette.get('mode', ""),
+           cassette.get('dir', ""))
+    with _lock:
+        client = _clients.get(key)
+    if client is None:
+        client = SoapClient(ip, port, config, Statistic(STATISTIC_NAME, 0, config, statistic.get_log()))
+        with _lock:
+            client = _clients.setdefault(key, client)
+
+    return client
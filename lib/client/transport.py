@@ -0,0 +1,323 @@
+import time
+import hashlib
+import threading
+from collections import deque
+from typing import Tuple
+from urllib.parse import urlparse
+from xml.sax.saxutils import escape
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from lxml import etree
+
+from zeep import Client
+from zeep.cache import SqliteCache
+from zeep.plugins import HistoryPlugin
+from zeep.transports import Transport
+from zeep.wsdl import Document
+
+from lib.log_and_statistic.statistic import Statistic
+
+
+# постоянный кэш WSDL/XSD сервисов, общий для всех процессов и запусков (рядом с runner.db)
+_WSDL_CACHE_PATH = "./databases/wsdl_cache.db"
+
+# разобранные WSDL документы процесса: url -> zeep Document
+_documents: dict = {}
+_documents_lock = threading.Lock()
+
+# общие http сессии процесса: адрес сервера -> {"session": requests.Session, "adapter": HTTPAdapter, "pool_size": 10}
+_sessions: dict = {}
+# счетчики соединений и запросов адаптеров, закрытых при увеличении пула (см. get_connection_statistic)
+_retired_counters: dict = {"opened": 0, "requests": 0}
+_sessions_lock = threading.Lock()
+
+# размер части ответа, читаемой за один раз быстрым путем CallMethod2
+_CHUNK_SIZE = 16384
+
+
+def get_wsdl_document(url: str, statistic: Statistic, session: requests.Session, timeout: float,
+                      persistent_cache: bool = True) -> Document:
+    """Получение разобранного WSDL документа сервиса.
+    В пределах процесса WSDL разбирается один раз, все клиенты процесса используют один документ.
+    При первом разборе в процессе WSDL и XSD берутся из постоянного кэша (_WSDL_CACHE_PATH);
+    кэш сервиса сбрасывается, если md5 WSDL на сервере изменился (см. _check_wsdl_cache).
+    Время получения документа добавляется в статистику (см. Statistic.append_latency) с указанием источника:
+    "загрузка" - без кэша, "диск" - из постоянного кэша, "память" - документ уже разобран в процессе.
+    WSDL и XSD загружаются через общую сессию сервера (см. get_session) с таймаутом ws.timeout.
+
+    :param url: url WSDL сервиса;
+    :param statistic: объект класса Statistic;
+    :param session: общая http сессия сервера;
+    :param timeout: таймаут загрузки WSDL и XSD в секундах;
+    :param persistent_cache: флаг использования постоянного кэша.
+
+    :return: WSDL документ.
+    """
+    start_time = time.time()
+    with _documents_lock:
+        document: Document = _documents.get(url)
+        source = "память"
+        if document is None:
+            cache = None
+            source = "загрузка"
+            if persistent_cache:
+                cache = SqliteCache(path=_WSDL_CACHE_PATH, timeout=None)
+                if _check_wsdl_cache(url, cache, session, timeout):
+                    source = "диск"
+            document = Document(url, Transport(cache=cache, timeout=timeout, session=session))
+            _documents[url] = document
+    load_time = time.time() - start_time
+
+    if source != "память":
+        statistic.append_info("WSDL " + url + " получен за " + str(round(load_time * 1000)) + " мс (" + source + ")",
+                              "WSDL")
+    statistic.append_latency("WSDL (" + source + ")", load_time)
+
+    return document
+
+
+def _check_wsdl_cache(url: str, cache: SqliteCache, session: requests.Session, timeout: float) -> bool:
+    """Проверка актуальности постоянного кэша WSDL сервиса.
+    WSDL скачивается с сервера (без разбора) и сравнивается по md5 с закэшированным. Если WSDL изменился,
+    из кэша удаляются все документы сервера (WSDL и импортируемые XSD), а в кэш записывается новый WSDL.
+
+    :param url: url WSDL сервиса;
+    :param cache: постоянный кэш;
+    :param session: общая http сессия сервера;
+    :param timeout: таймаут запроса в секундах.
+
+    :return: True - кэш актуален, False - кэш сброшен или WSDL не закэширован.
+    """
+    response = session.get(url, timeout=timeout)
+    if response.status_code != 200:
+        return False
+    cached = cache.get(url)
+    if cached is not None and hashlib.md5(bytes(cached)).digest() == hashlib.md5(response.content).digest():
+        return True
+
+    server = urlparse(url)
+    with cache.db_connection() as connection:
+        connection.execute("DELETE FROM request WHERE url LIKE ?", [server.scheme + "://" + server.netloc + "/%"])
+        connection.commit()
+    cache.add(url, response.content)
+
+    return False
+
+
+def get_session(url: str, pool_size: int) -> requests.Session:
+    """Получение общей для процесса http сессии сервера с пулом keep-alive соединений.
+    Все клиенты процесса, работающие с одним сервером, используют одну сессию. Размер пула соединений
+    должен быть не меньше количества одновременно работающих потоков теста, иначе лишние соединения закрываются
+    после каждого запроса. Если клиенту нужен пул больше текущего, в сессию устанавливается новый адаптер
+    большего размера, а старый адаптер закрывается: его свободные соединения закрываются сразу, занятые -
+    после завершения запроса. Счетчики закрытого адаптера сохраняются для get_connection_statistic.
+
+    :param url: url сервиса;
+    :param pool_size: требуемый размер пула соединений.
+
+    :return: сессия requests.
+    """
+    server = urlparse(url)
+    prefix = server.scheme + "://" + server.netloc + "/"
+    with _sessions_lock:
+        session_info = _sessions.get(prefix)
+        if session_info is None:
+            session_info = {"session": requests.Session(), "adapter": None, "pool_size": 0}
+            _sessions[prefix] = session_info
+        if session_info['pool_size'] < pool_size:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session_info['session'].mount(prefix, adapter)
+            session_info['pool_size'] = pool_size
+            if session_info['adapter'] is not None:
+                counters = _get_adapter_counters(session_info['adapter'])
+                _retired_counters['opened'] += counters['opened']
+                _retired_counters['requests'] += counters['requests']
+                session_info['adapter'].close()
+            session_info['adapter'] = adapter
+
+    return session_info['session']
+
+
+def get_connection_statistic() -> dict:
+    """Получение статистики http соединений общих сессий процесса с момента его старта.
+
+    :return: словарь вида:
+            {
+                "opened": 10,
+                "requests": 1000,
+                "reused": 990
+            }
+            opened - количество открытых соединений, reused - количество запросов по уже открытым соединениям.
+    """
+    with _sessions_lock:
+        opened = _retired_counters['opened']
+        requests_count = _retired_counters['requests']
+        for session_info in _sessions.values():
+            counters = _get_adapter_counters(session_info['adapter'])
+            opened += counters['opened']
+            requests_count += counters['requests']
+
+    return {
+        "opened": opened,
+        "requests": requests_count,
+        "reused": max(requests_count - opened, 0)
+    }
+
+
+def _get_adapter_counters(adapter: HTTPAdapter) -> dict:
+    """Получение количества открытых соединений и отправленных запросов пулов адаптера.
+
+    :param adapter: адаптер сессии.
+
+    :return: словарь вида {"opened": 10, "requests": 1000}.
+    """
+    counters = {"opened": 0, "requests": 0}
+    for pool_key in adapter.poolmanager.pools.keys():
+        pool = adapter.poolmanager.pools.get(pool_key)
+        if pool is not None:
+            counters['opened'] += pool.num_connections
+            counters['requests'] += pool.num_requests
+
+    return counters
+
+
+class MeasuringTransport(Transport):
+    """Транспорт zeep, запоминающий для каждого потока размеры и время последнего обмена.
+    В отличие от HistoryPlugin не хранит конверты запроса и ответа, поэтому подходит для рабочего режима
+    с большими ответами и большим количеством потоков.
+
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._local = threading.local()
+
+    def post(self, address: str, message, headers: dict) -> requests.Response:
+        start_time = time.time()
+        response: requests.Response = super().post(address, message, headers)
+        self._local.last_exchange = {
+            "sent": len(message),
+            "received": len(response.content),
+            "duration": time.time() - start_time
+        }
+
+        return response
+
+    def get_last_exchange(self) -> dict:
+        """Получение показателей последнего обмена текущего потока.
+
+        :return: словарь вида:
+                {
+                    "sent": 512,
+                    "received": 1048576,
+                    "duration": 0.05
+                }
+                sent/received - размер запроса/ответа в байтах, duration - время обмена в секундах;
+                пустой словарь, если поток еще не отправлял запросов.
+        """
+        return getattr(self._local, "last_exchange", {})
+
+
+class ThreadLocalHistoryPlugin(HistoryPlugin):
+    """История запросов zeep, отдельная для каждого потока (только для отладки, см. настройку ws.debug_history).
+    Позволяет одному клиенту выполнять запросы из нескольких потоков (см. SoapClient.submit):
+    last_received возвращает ответ на последний запрос текущего потока.
+
+    """
+    def __init__(self, maxlen: int = 1):
+        self._maxlen = maxlen
+        self._local = threading.local()
+
+    @property
+    def _buffer(self) -> deque:
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = deque([], self._maxlen)
+            self._local.buffer = buffer
+
+        return buffer
+
+
+class CallMethod2FastPath:
+    """Быстрый путь вызова CallMethod2 без сериализации/десериализации zeep.
+    SOAP конверт строится zeep один раз (с метками вместо аргументов) и превращается в шаблон из байтовых частей,
+    при вызове в шаблон подставляются экранированные имя метода и json строки. Из ответа потоковым pull-парсером
+    lxml извлекается только текст элемента return, разбор останавливается на нем без XSD десериализации.
+    Ответы с кодом, отличным от 200, и ответы без элемента return обрабатываются zeep, поэтому исключения
+    (TransportError, Fault) те же, что и при обычном вызове.
+    Запрос подготавливается один раз и отправляется напрямую через адаптер сессии (пул keep-alive соединений):
+    без слияния настроек сессии и переменных окружения (прокси, сертификаты) при каждом вызове.
+
+    """
+    _MARKS = (b"@@METHOD@@", b"@@PARAMS@@", b"@@SYSPARAMS@@")
+    _OPERATION = "CallMethod2"
+
+    def __init__(self, client: Client, session: requests.Session):
+        self._client = client
+        self._session = session
+
+        binding = client.service._binding
+        self._operation = binding.get(self._OPERATION)
+        self._address: str = client.service._binding_options['address']
+        # _create возвращает и конверт, и http заголовки (SOAPAction/Content-Type) для версии SOAP привязки
+        envelope, self._headers = binding._create(self._OPERATION, [mark.decode() for mark in self._MARKS], {},
+                                                  client=client)
+        template: bytes = etree.tostring(envelope, xml_declaration=True, encoding="utf-8")
+        self._template_parts = []
+        for mark in self._MARKS:
+            part, template = template.split(mark, 1)
+            self._template_parts.append(part)
+        self._template_parts.append(template)
+
+        self._request: requests.PreparedRequest = requests.Request("POST", self._address,
+                                                                   headers=self._headers).prepare()
+
+    def call(self, method: str, params: str, sysparams: str) -> Tuple[str, int]:
+        """Вызов CallMethod2.
+
+        :param method: имя ws метода;
+        :param params: параметры метода в виде json строки;
+        :param sysparams: системные параметры в виде json строки.
+
+        :return: строка ответа (json) и размер ответа в байтах.
+        """
+        parts = self._template_parts
+        body = b"".join((parts[0], escape(method).encode("utf-8"), parts[1], escape(params).encode("utf-8"),
+                         parts[2], escape(sysparams).encode("utf-8"), parts[3]))
+        request = self._request.copy()
+        request.prepare_body(body, None)
+        # адаптер берется при каждом вызове: при увеличении пула get_session устанавливает в сессию новый адаптер
+        response = self._session.get_adapter(self._address).send(request, stream=True)
+        if response.status_code != 200:
+            return self._process_reply(response), len(response.content)
+
+        parser = etree.XMLPullParser(events=("end",), tag="{*}return")
+        chunks = []
+        result = None
+        try:
+            for chunk in response.iter_content(_CHUNK_SIZE):
+                chunks.append(chunk)
+                if result is None:
+                    parser.feed(chunk)
+                    for _, element in parser.read_events():
+                        result = element.text or ""
+                        break
+        except etree.XMLSyntaxError:
+            result = None
+        content = b"".join(chunks)
+        if result is None:
+            # поток ответа уже прочитан, zeep получает ответ с сохраненным содержимым
+            response._content = content
+            return self._process_reply(response), len(content)
+
+        return result, len(content)
+
+    def _process_reply(self, response: requests.Response) -> str:
+        """Обработка ответа средствами zeep (ошибки, SOAP Fault, нестандартные ответы).
+
+        :param response: http ответ.
+
+        :return: строка ответа.
+        """
+        return self._client.service._binding.process_reply(self._client, self._operation, response)
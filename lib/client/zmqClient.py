@@ -1,12 +1,14 @@
 import zmq
-import time
 import threading
-from typing import List
+from concurrent.futures import Future, TimeoutError
+from typing import List, Optional
 import xml.etree.ElementTree as Tree
 
 from lib.log_and_statistic import log
 from lib.log_and_statistic.statistic import Statistic
 
+from lib.client.cassette import get_cassette
+
 
 def search_response_index_by_message_id(xml_responses: list, message_id: str, statistic: Statistic) -> int:
     """Поиск в списке xml у которого значение тега messageId совпадает с message_id.
@@ -16,7 +18,7 @@ def search_response_index_by_message_id(xml_responses: list, message_id: str, st
     :param statistic: объект класса Statistic
     :return: 1) индекс в списке; 2) -1 в случае отсутствия совпадения
     """
-    logger = log.get_logger("scripts/xml/zmq")
+    logger = statistic.get_log().get_logger("scripts/xml/zmq")
     logger.info("was called (list_xml_responses, message_id)")
     logger.debug("(" + str(xml_responses) + ", " + str(message_id) + ")")
 
@@ -36,6 +38,15 @@ class ZmqClient:
     """Класс-клиент для отправки-приема сообщений по протоколу zmq.
 
         Реализован механизм многопоточной передачи-приема по одному сокету.
+        Транспорт выбирается настройкой zmq.transport:
+            "pair" (по умолчанию) - сокет PAIR;
+            "dealer" - сокет DEALER (сервер - ROUTER).
+        Сокетом владеет только поток приема: потоки теста передают запросы ему через inproc PUSH/PULL без общей
+        блокировки, поэтому одновременно может выполняться много запросов, а разбор больших ответов
+        не задерживает отправку.
+        Ответы на запросы, отправленные через request, поток приема передает ожидающему потоку через Future
+        по значению тега messageId (карта _pending), без перебора списка ответов. Сообщения, которых никто
+        не ожидает (события сервера, опоздавшие ответы), попадают в список ответов _list_responses.
     """
     def __init__(self, config: dict, statistic: Statistic):
         self._sid = config['zmq']['sid']
@@ -43,31 +54,45 @@ class ZmqClient:
         self._port = config['server']['zmq_port']
         self._statistic = statistic
 
+        # запись/воспроизведение сообщений (см. lib.client.cassette.get_cassette), при воспроизведении
+        # подключения к серверу нет, а ответы на запросы берутся из кассеты
+        cassette = get_cassette(config, statistic.get_test_name(), statistic.get_log().get_start_time())
+        self._cassette_stream = cassette.open_zmq_stream() if cassette is not None else None
+        self._replay: bool = cassette is not None and cassette.is_replay()
+
+        self._transport: str = config['zmq'].get('transport', "pair")
+        assert self._transport in ("pair", "dealer"), "[0017] Недопустимый транспорт zmq '" + self._transport + \
+                                                      "'. Доступны: pair, dealer"
+
         self._context = zmq.Context()
-        self._socket = self._context.socket(zmq.PAIR)
-        self._socket.connect("tcp://" + self._ip + ":" + str(self._port))
+        self._socket = self._context.socket(zmq.DEALER if self._transport == "dealer" else zmq.PAIR)
+        if not self._replay:
+            self._socket.connect("tcp://" + self._ip + ":" + str(self._port))
+        # очередь запросов к потоку приема (PULL) и PUSH сокеты потоков теста
+        self._queue_endpoint = "inproc://zmq_client_" + str(id(self))
+        self._queue_socket = self._context.socket(zmq.PULL)
+        self._queue_socket.bind(self._queue_endpoint)
+        self._push_sockets = []
+        self._local = threading.local()
         self._list_responses = []
+        # ожидаемые ответы: messageId запроса -> Future с деревом xml ответа
+        self._pending: dict = {}
         self._handler_thread = None
-        # блокировка для раннего уничтожения объекта потока
-        # если вызвали send_request, а поток хочет завершится, то завершения не произойдет
-        self._handler_thread_destroy_lock = threading.Lock()
-        self._destroy_handler_thread_flag = False
-        # блокировка для одновременного доступа к памяти - листу __list_responses__ и сокету
+        # управляющий сокет потока приема: сообщение в него завершает поток без ожидания (см. stop)
+        self._control_endpoint = "inproc://zmq_client_control_" + str(id(self))
+        self._control_socket = self._context.socket(zmq.PAIR)
+        self._control_socket.bind(self._control_endpoint)
+        self._closed = False
+        # блокировка для одновременного доступа к памяти - листу __list_responses__, ожидаемым ответам и PUSH сокетам
         self._thread_memory_lock = threading.Lock()
         # механизм для ожидания сообщения вызывающими потоками
         self._signal_event = threading.Event()
         self._signal_event.clear()
-        self._logger = log.get_logger("client/zmqClient")
+        self._logger = statistic.get_log().get_logger("client/zmqClient")
 
     def get_signal_event(self) -> threading.Event:
         return self._signal_event
 
-    def get_handler_thread_destroy_lock(self) -> threading.Lock:
-        return self._handler_thread_destroy_lock
-
-    def get_destroy_hadler_thread_flag(self) -> bool:
-        return self._destroy_handler_thread_flag
-
     def get_thread_memory_lock(self) -> threading.Lock:
         return self._thread_memory_lock
 
@@ -90,13 +115,12 @@ class ZmqClient:
         """
         self._thread_memory_lock.acquire()
 
-        index_delete = 0
-        search_response_index_by_message_id(self._list_responses, message_id, self._statistic)
+        index_delete = search_response_index_by_message_id(self._list_responses, message_id, self._statistic)
         if index_delete != -1:
             self._list_responses.pop(index_delete)
-            self._thread_memory_lock.release()
             if not self._list_responses:
                 self._signal_event.clear()
+            self._thread_memory_lock.release()
             return 0
         else:
             self._thread_memory_lock.release()
@@ -111,58 +135,165 @@ class ZmqClient:
             self._handler_thread = self.SocketThread(self, self._logger)
             self._handler_thread.start()
         else:
-            if self._handler_thread.isAlive() is False:
+            if self._handler_thread.is_alive() is False:
                 self._handler_thread.start()
 
         return 0
 
     def stop_handler_thread(self):
-        """Метод останавливает отдельный поток приема сообщений по сокету.
+        """Метод останавливает отдельный поток приема сообщений по сокету (см. stop).
 
         :return: 0 - успех; 1 - ошибка
         """
-        self._handler_thread_destroy_lock.acquire()
-        self._destroy_handler_thread_flag = True
-        self._handler_thread_destroy_lock.release()
+        return 0 if self.stop() else 1
 
-        time.sleep(0.5)
+    def stop(self, timeout: float = 5.0) -> bool:
+        """Остановка потока приема и закрытие всех сокетов и контекста клиента.
+        Поток получает команду остановки через управляющий inproc сокет, поэтому метод возвращается сразу после
+        завершения потока, без фиксированного ожидания. Повторный вызов ничего не делает.
+        После остановки клиент не может отправлять запросы; ожидание ответов, не полученных к этому моменту,
+        завершится по таймауту.
 
-        self._handler_thread_destroy_lock.acquire()
-        if self._destroy_handler_thread_flag is False:
-            self._handler_thread_destroy_lock.release()
-            return 0
-        else:
-            return 1
+        :param timeout: максимальное время ожидания завершения потока в секундах.
+
+        :return: True - поток завершен (или не запускался), False - поток не завершился за timeout.
+        """
+        if self._closed:
+            return True
+        if self._handler_thread is not None and self._handler_thread.is_alive():
+            stop_socket = self._context.socket(zmq.PAIR)
+            stop_socket.connect(self._control_endpoint)
+            stop_socket.send(b"stop")
+            stop_socket.close(linger=0)
+            self._handler_thread.join(timeout)
+            if self._handler_thread.is_alive():
+                self._logger.error("handler thread wasn't stopped in " + str(timeout) + " s")
+                return False
+
+        with self._thread_memory_lock:
+            # после этого новые PUSH сокеты не создаются (см. _get_push_socket), иначе term ждал бы их закрытия
+            self._closed = True
+            push_sockets = list(self._push_sockets)
+            self._push_sockets.clear()
+        for socket in [self._socket, self._queue_socket, self._control_socket] + push_sockets:
+            socket.close(linger=0)
+        self._context.term()
+
+        return True
+
+    def request(self, xml_tree, message_id: str) -> Future:
+        """Отправка запроса с ожиданием ответа с тем же messageId.
+        Future регистрируется до отправки, поэтому ответ не теряется, даже если придет раньше вызова wait_response.
+        Повторная отправка запроса с тем же messageId (send_request) использует уже зарегистрированный Future.
+
+        :param xml_tree: сформированное дерево xml;
+        :param message_id: значение тега messageId запроса.
+
+        :return: Future, результат которого - дерево xml ответа.
+        """
+        future = Future()
+        with self._thread_memory_lock:
+            self._pending[message_id] = future
+        self.send_request(xml_tree)
+
+        return future
+
+    def wait_response(self, message_id: str, future: Future, timeout: float) -> Optional[Tree.Element]:
+        """Ожидание ответа на запрос, отправленный через request.
+        Истечение ожидания учитывается в счетчике "ZMQ: истекло ожидание ответа", при этом Future остается
+        зарегистрированным для повторной отправки запроса (снимается через cancel_response).
+
+        :param message_id: значение тега messageId запроса;
+        :param future: Future, полученный от request;
+        :param timeout: максимальное время ожидания в секундах.
+
+        :return: дерево xml ответа или None, если ответ не получен за timeout.
+        """
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            self._statistic.append_counter("ZMQ: истекло ожидание ответа")
+            self._logger.error("response with messageId " + message_id + " wasn't received in " + str(timeout) + " s")
+            return None
+
+    def cancel_response(self, message_id: str) -> None:
+        """Отказ от ожидания ответа: ответ с этим messageId, если придет, попадет в список ответов.
+
+        :param message_id: значение тега messageId запроса.
+        """
+        with self._thread_memory_lock:
+            future = self._pending.pop(message_id, None)
+        if future is not None:
+            future.cancel()
 
     def send_request(self, xml_tree):
         """Отправка нового сообщения по сокету.
 
         Если поток приема ответа не создан, то он создается и запускается.
         Если поток уже создан, но не активен, то он запускается.
+        При воспроизведении кассеты запрос не отправляется, а записанные ответы на него добавляются в список ответов.
         :param xml_tree: сформированное дерево xml
         :return: 1
         """
         # проверка на возможность приема сообщения
         if self._handler_thread is None:
             log.raise_error("Handler thread isn't exist!", self._logger)
-        if self._handler_thread.isAlive() is False:
+        if self._handler_thread.is_alive() is False:
             log.raise_error("Handler thread isn't run!", self._logger)
 
         request_msg = '<?xml version="1.0" encoding="UTF-8"?>' + Tree.tostring(xml_tree).decode()
 
         self._logger.info("was called func send_request(request_msg)")
         self._logger.debug("send_request(" + str(request_msg) + ")")
-        # установка блокировки для объекта сокета
-        self._thread_memory_lock.acquire()
+        if self._replay:
+            for delay, response in self._cassette_stream.replay_send(request_msg):
+                threading.Timer(delay, self._append_response, (response,)).start()
+            return 1
+        if self._cassette_stream is not None:
+            self._cassette_stream.record("send", request_msg)
+        # запрос отправит в сокет поток приема
+        self._get_push_socket().send_string(request_msg)
+
+        return 1
 
-        self._logger.info("acquired __thread_memory_lock__")
-        self._logger.debug("current msg is " + str(request_msg))
-        self._socket.send_string(request_msg)
+    def _get_push_socket(self) -> zmq.Socket:
+        """Получение PUSH сокета текущего потока для передачи запросов потоку приема.
+        Сокеты zmq нельзя использовать из нескольких потоков, поэтому у каждого потока теста свой сокет.
+        После остановки клиента (см. stop) сокет не выдается: вызывается исключение.
 
+        :return: сокет.
+        """
+        with self._thread_memory_lock:
+            if self._closed:
+                log.raise_error("ZmqClient is closed!", self._logger)
+            push_socket = getattr(self._local, "push_socket", None)
+            if push_socket is None:
+                push_socket = self._context.socket(zmq.PUSH)
+                push_socket.connect(self._queue_endpoint)
+                self._local.push_socket = push_socket
+                self._push_sockets.append(push_socket)
+
+        return push_socket
+
+    def _append_response(self, str_response: str) -> None:
+        """Передача ответа ожидающему его потоку (см. request) или добавление в список ответов с оповещением
+        ожидающих потоков, если ответ никто не ожидает.
+
+        :param str_response: текст ответа.
+        """
+        xml_response = Tree.fromstring(str_response)
+        tag_message_id = xml_response.find(".//messageId")
+        self._thread_memory_lock.acquire()
+        future = self._pending.pop(tag_message_id.text, None) if tag_message_id is not None else None
+        if future is None:
+            self._list_responses.append(xml_response)
+            self._signal_event.set()
         self._thread_memory_lock.release()
-        self._logger.info("release __thread_memory_lock__")
 
-        return 1
+        if future is None:
+            self._statistic.append_counter("ZMQ: сообщения без ожидающего запроса")
+        else:
+            future.set_result(xml_response)
 
     class SocketThread(threading.Thread):
         """ Класс для реализации многопоточного приема по одному сокету.
@@ -173,7 +304,9 @@ class ZmqClient:
             self._logger = logger
 
             self._poller = zmq.Poller()
+            self._poller.register(self._zmqClient._control_socket, zmq.POLLIN)
             self._poller.register(self._zmqClient._socket, zmq.POLLIN)
+            self._poller.register(self._zmqClient._queue_socket, zmq.POLLIN)
 
         def run(self):
             """Механизм приема сообщений.
@@ -181,25 +314,32 @@ class ZmqClient:
             :return:
             """
             while True:
-                # условие остановки потока
-                self._zmqClient.get_handler_thread_destroy_lock().acquire()
-                if self._zmqClient._destroy_handler_thread_flag is True:
-                    self._zmqClient._destroy_handler_thread_flag = False
-                    self._zmqClient.get_handler_thread_destroy_lock().release()
-                    return
-                self._zmqClient.get_handler_thread_destroy_lock().release()
-
-                # ожидание ответа по сокету
+                # ожидание ответа по сокету, запросов потоков теста или команды остановки (см. ZmqClient.stop)
                 sockets = dict(self._poller.poll())
+                if self._zmqClient._control_socket in sockets:
+                    self._zmqClient._control_socket.recv()
+                    return
+                if self._zmqClient._queue_socket in sockets:
+                    # отправка всех накопившихся запросов потоков теста
+                    self._send_queued_requests()
                 if self._zmqClient._socket in sockets:
-                    self._zmqClient._thread_memory_lock.acquire()
-                    str_response = self._zmqClient._socket.recv()
+                    if self._zmqClient._transport == "dealer":
+                        # последний кадр - сообщение (сервер ROUTER может добавить пустой кадр-разделитель)
+                        str_response = self._zmqClient._socket.recv_multipart()[-1]
+                    else:
+                        str_response = self._zmqClient._socket.recv()
                     self._logger.debug("str_response: " + str_response.decode())
-                    xml_response = Tree.fromstring(str_response)
-                    self._zmqClient._list_responses.append(xml_response)
-                    self._zmqClient.get_signal_event().set()
-                    self._zmqClient.get_thread_memory_lock().release()
-
-
+                    if self._zmqClient._cassette_stream is not None:
+                        self._zmqClient._cassette_stream.record("recv", str_response.decode())
+                    self._zmqClient._append_response(str_response.decode())
 
+        def _send_queued_requests(self) -> None:
+            """Передача запросов из очереди потоков теста в сокет сервера.
 
+            """
+            while True:
+                try:
+                    request_msg = self._zmqClient._queue_socket.recv(zmq.NOBLOCK)
+                except zmq.Again:
+                    return
+                self._zmqClient._socket.send(request_msg)
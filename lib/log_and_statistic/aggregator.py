@@ -0,0 +1,341 @@
+import copy
+import json
+import time
+import threading
+import multiprocessing
+from typing import List
+
+from lib.log_and_statistic.histogram import create_histogram, record, merge_histogram, get_report
+
+
+# минимальный интервал между отправками накопленных событий процесса в секундах
+_FLUSH_INTERVAL = 1.0
+
+# состояние отправителя событий процесса: очередь, накопленная с последней отправки сводка, время отправки
+# и идентификатор выполняемой задачи (тест кейса) пула, к которой относятся события (см. set_task).
+# Заполняется в рабочих процессах (см. init_publisher), в остальных процессах события не собираются.
+_publisher: dict = {
+    "queue": None,
+    "delta": None,
+    "last_flush": 0.0,
+    "task_id": None
+}
+_publisher_lock = threading.Lock()
+
+
+def create_summary() -> dict:
+    """Создание пустой сводки статистики.
+
+    :return: словарь вида:
+            {
+                "tests": {
+                    "directories_comparator": {
+                        "errors": {"WS_ОТВЕТ": 1},
+                        "warns": {"WS_ОТВЕТ: FaceVA:GetFaces": 2},
+                        "successes": 10,
+                        "counters": {"WS: попытки": 10, "WS: повторные попытки": 1},
+                        "latency": {
+                            "WS: FaceVA:GetFaces": {"count": 10, "sum": 1.5, "max": 0.3, "errors": 0, "buckets": {...},
+                                                    "threads": {"1": {"count": 5, ...}, "2": {"count": 5, ...}}}
+                        }
+                    },
+                    ...
+                }
+            }
+            errors/warns - количество ошибок/предупреждений по типам, counters - счетчики событий,
+            latency - гистограммы времени операций (см. lib.log_and_statistic.histogram.create_histogram),
+            общие для теста и по номерам потоков.
+    """
+    return {"tests": {}}
+
+
+def _get_test_summary(summary: dict, test_name: str) -> dict:
+    test_summary = summary['tests'].get(test_name)
+    if test_summary is None:
+        test_summary = {"errors": {}, "warns": {}, "successes": 0, "counters": {}, "latency": {}}
+        summary['tests'][test_name] = test_summary
+
+    return test_summary
+
+
+def _get_latency(test_summary: dict, name: str) -> dict:
+    latency = test_summary['latency'].get(name)
+    if latency is None:
+        latency = create_histogram()
+        latency['threads'] = {}
+        test_summary['latency'][name] = latency
+
+    return latency
+
+
+def _append_event(summary: dict, kind: str, test_name: str, key: str, value: float, thread_id: int = 0) -> None:
+    """Добавление события в сводку.
+
+    :param summary: сводка статистики (см. create_summary);
+    :param kind: вид события: "error", "warn", "success", "counter", "latency" или "latency_error";
+    :param test_name: имя теста;
+    :param key: тип ошибки/предупреждения/проверки, имя счетчика или имя измеряемой операции для "latency*";
+    :param value: количество событий или время операции в секундах для "latency";
+    :param thread_id: номер потока теста (для "latency*").
+    """
+    test_summary = _get_test_summary(summary, test_name)
+    if kind == "error":
+        test_summary['errors'][key] = test_summary['errors'].get(key, 0) + value
+    elif kind == "warn":
+        test_summary['warns'][key] = test_summary['warns'].get(key, 0) + value
+    elif kind == "success":
+        test_summary['successes'] += value
+    elif kind == "counter":
+        test_summary['counters'][key] = test_summary['counters'].get(key, 0) + value
+    elif kind in ("latency", "latency_error"):
+        latency = _get_latency(test_summary, key)
+        thread_latency = latency['threads'].get(str(thread_id))
+        if thread_latency is None:
+            thread_latency = create_histogram()
+            latency['threads'][str(thread_id)] = thread_latency
+        for histogram in (latency, thread_latency):
+            if kind == "latency":
+                record(histogram, value)
+            else:
+                histogram['errors'] += value
+
+
+def merge_summary(target: dict, source: dict) -> None:
+    """Добавление сводки source в сводку target.
+
+    :param target: сводка, в которую добавляются значения;
+    :param source: добавляемая сводка.
+    """
+    for test_name, source_test in source['tests'].items():
+        target_test = _get_test_summary(target, test_name)
+        for kind in ("errors", "warns", "counters"):
+            for type_, count in source_test[kind].items():
+                target_test[kind][type_] = target_test[kind].get(type_, 0) + count
+        target_test['successes'] += source_test['successes']
+        for name, source_latency in source_test['latency'].items():
+            latency = _get_latency(target_test, name)
+            merge_histogram(latency, source_latency)
+            for thread_id, source_thread_latency in source_latency['threads'].items():
+                merge_histogram(latency['threads'].setdefault(thread_id, create_histogram()), source_thread_latency)
+
+
+def _get_latency_reports(test_summary: dict, with_threads: bool) -> dict:
+    """Получение показателей гистограмм времени теста (см. lib.log_and_statistic.histogram.get_report).
+    Кроме операций, в отчет добавляется общая гистограмма всех ws методов теста ("WS: все методы").
+
+    :param test_summary: сводка теста;
+    :param with_threads: добавлять ли в отчет показатели по потокам ("threads").
+
+    :return: словарь: имя операции -> показатели.
+    """
+    reports = {}
+    all_methods = create_histogram()
+    for name, latency in test_summary['latency'].items():
+        reports[name] = get_report(latency)
+        if with_threads:
+            reports[name]['threads'] = {thread_id: get_report(thread_latency)
+                                        for thread_id, thread_latency in sorted(latency['threads'].items())}
+        if name.startswith("WS: "):
+            merge_histogram(all_methods, latency)
+    if all_methods['count'] or all_methods['errors']:
+        reports["WS: все методы"] = get_report(all_methods)
+
+    return reports
+
+
+def format_summary(summary: dict) -> List[str]:
+    """Представление сводки в виде строк для вывода в консоль.
+
+    :param summary: сводка статистики.
+
+    :return: список строк, по одной на тест.
+    """
+    lines = []
+    for test_name, test_summary in summary['tests'].items():
+        line = "Тест " + test_name + ": успешных проверок " + str(test_summary['successes']) + \
+               ", ошибок " + str(sum(test_summary['errors'].values())) + \
+               ", предупреждений " + str(sum(test_summary['warns'].values()))
+        for kind, title in (("errors", "Ошибки"), ("warns", "Предупреждения")):
+            if test_summary[kind]:
+                line += "\n    " + title + ": " + ", ".join(["[" + type_ + "]: " + str(count)
+                                                            for type_, count in test_summary[kind].items()])
+        if test_summary['counters']:
+            line += "\n    " + ", ".join([name + ": " + str(count) for name, count in test_summary['counters'].items()])
+        for name, report in _get_latency_reports(test_summary, False).items():
+            line += "\n    " + name + ": запросов " + str(report['count']) + ", ошибок " + str(report['errors']) + \
+                    " (" + str(round(report['error_rate'] * 100, 2)) + "%), время ср./макс. " + \
+                    str(round(report['avg'] * 1000)) + "/" + str(round(report['max'] * 1000)) + " мс, " + \
+                    ", ".join([key + " " + str(round(value * 1000, 1)) for key, value in report.items()
+                               if key.startswith("p")]) + " мс"
+        lines.append(line)
+
+    return lines
+
+
+def write_summary(summary: dict, path: str) -> None:
+    """Запись сводки в json файл для машинной обработки.
+    Вместо гистограмм в файл записываются их показатели (количество, доля ошибок, среднее, максимум и процентили
+    в секундах) - общие для теста и по потокам.
+
+    :param summary: сводка статистики;
+    :param path: путь к файлу.
+    """
+    report = {"tests": {}}
+    for test_name, test_summary in summary['tests'].items():
+        report['tests'][test_name] = {
+            "successes": test_summary['successes'],
+            "errors": test_summary['errors'],
+            "warns": test_summary['warns'],
+            "counters": test_summary['counters'],
+            "latency": _get_latency_reports(test_summary, True)
+        }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=4)
+
+
+def init_publisher(event_queue) -> None:
+    """Включение отправки событий статистики текущего процесса в очередь event_queue.
+    Вызывается при старте рабочего процесса.
+
+    :param event_queue: очередь StatisticAggregator.
+    """
+    with _publisher_lock:
+        _publisher['queue'] = event_queue
+        _publisher['delta'] = create_summary()
+        _publisher['last_flush'] = time.monotonic()
+
+
+def publish(kind: str, test_name: str, key: str, value: float = 1, thread_id: int = 0) -> None:
+    """Добавление события статистики процесса (см. _append_event).
+    События не отправляются по одному: они накапливаются в сводке процесса, которая отправляется
+    в очередь не чаще _FLUSH_INTERVAL и по окончании каждого тест кейса (см. flush_events).
+
+    """
+    if _publisher['queue'] is None:
+        return
+    with _publisher_lock:
+        _append_event(_publisher['delta'], kind, test_name, key, value, thread_id)
+        if time.monotonic() - _publisher['last_flush'] < _FLUSH_INTERVAL:
+            return
+        delta = _publisher['delta']
+        _publisher['delta'] = create_summary()
+        _publisher['last_flush'] = time.monotonic()
+        task_id = _publisher['task_id']
+    _publisher['queue'].put((task_id, delta))
+
+
+def flush_events() -> None:
+    """Отправка накопленных событий процесса в очередь.
+
+    """
+    if _publisher['queue'] is None:
+        return
+    with _publisher_lock:
+        delta = _publisher['delta']
+        _publisher['delta'] = create_summary()
+        _publisher['last_flush'] = time.monotonic()
+        task_id = _publisher['task_id']
+    if delta['tests']:
+        _publisher['queue'].put((task_id, delta))
+
+
+def set_task(task_id) -> None:
+    """Установка задачи пула, к которой относятся следующие события процесса (см. StatisticAggregator.commit_task).
+    Накопленные события предыдущей задачи перед этим отправляются.
+
+    :param task_id: идентификатор задачи пула или None - события вне тест кейсов.
+    """
+    if _publisher['queue'] is None:
+        return
+    flush_events()
+    with _publisher_lock:
+        _publisher['task_id'] = task_id
+
+
+class StatisticAggregator:
+    """Сборщик статистики всех рабочих процессов.
+    Рабочие процессы отправляют сводки своих событий (см. publish) в очередь get_queue(),
+    служебный поток сборщика объединяет их в общую сводку запуска по всем тест кейсам и итерациям.
+    Кроме общей сводки ведется сводка завершенных тест кейсов (см. commit_task, get_committed_summary):
+    события тест кейса попадают в нее только после его подтверждения, поэтому ее можно сохранять
+    в контрольной точке, не захватывая события еще выполняющихся тест кейсов.
+
+    """
+    def __init__(self):
+        self._queue = multiprocessing.Queue()
+        self._lock = threading.Lock()
+        self._summary = create_summary()
+        self._committed_summary = create_summary()
+        # сводки неподтвержденных тест кейсов: идентификатор задачи пула -> сводка
+        self._task_summaries: dict = {}
+        self._committed_tasks: set = set()
+        self._thread = threading.Thread(target=self._collect, daemon=True)
+
+    def get_queue(self):
+        """Метод-геттер очереди событий для передачи в рабочие процессы.
+
+        :return: очередь событий.
+        """
+        return self._queue
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Остановка сборщика после обработки всех уже отправленных событий.
+        Вызывается после завершения рабочих процессов.
+
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def merge(self, summary: dict) -> None:
+        """Добавление сводки, полученной не через очередь (например, от агента распределенного запуска
+        или из контрольной точки прерванного запуска). Сводка сразу считается подтвержденной.
+
+        :param summary: сводка статистики.
+        """
+        with self._lock:
+            merge_summary(self._summary, summary)
+            merge_summary(self._committed_summary, summary)
+
+    def commit_task(self, task_id) -> None:
+        """Подтверждение завершенного тест кейса: его события добавляются в сводку завершенных тест кейсов,
+        в том числе события, которые придут позже.
+
+        :param task_id: идентификатор задачи пула тест кейса.
+        """
+        with self._lock:
+            self._committed_tasks.add(task_id)
+            task_summary = self._task_summaries.pop(task_id, None)
+            if task_summary is not None:
+                merge_summary(self._committed_summary, task_summary)
+
+    def get_committed_summary(self) -> dict:
+        """Получение сводки завершенных (подтвержденных) тест кейсов и событий вне тест кейсов.
+
+        :return: копия сводки (см. create_summary).
+        """
+        with self._lock:
+            return copy.deepcopy(self._committed_summary)
+
+    def get_summary(self) -> dict:
+        """Получение текущей общей сводки.
+
+        :return: копия сводки (см. create_summary).
+        """
+        with self._lock:
+            return copy.deepcopy(self._summary)
+
+    def _collect(self) -> None:
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            task_id, delta = message
+            with self._lock:
+                merge_summary(self._summary, delta)
+                if task_id is None or task_id in self._committed_tasks:
+                    merge_summary(self._committed_summary, delta)
+                else:
+                    merge_summary(self._task_summaries.setdefault(task_id, create_summary()), delta)
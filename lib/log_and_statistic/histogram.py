@@ -0,0 +1,125 @@
+import math
+
+
+# относительная точность гистограммы: границы соседних интервалов отличаются на 1%
+_PRECISION = 0.01
+_LOG_BASE = math.log(1 + _PRECISION)
+# минимальное различимое значение в секундах (1 мкс), меньшие значения попадают в нулевой интервал
+_MIN_VALUE = 0.000001
+
+# процентили, выводимые в отчетах
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def create_histogram() -> dict:
+    """Создание пустой гистограммы времени (в стиле HDR Histogram).
+    Значения хранятся не списком, а количеством попаданий в интервалы с логарифмическими границами, поэтому
+    размер гистограммы не зависит от количества замеров, а гистограммы потоков и процессов складываются без потери
+    точности (см. merge_histogram). Процентили вычисляются с относительной погрешностью не более _PRECISION.
+
+    :return: словарь вида:
+            {
+                "count": 10,
+                "sum": 1.5,
+                "max": 0.3,
+                "errors": 1,
+                "buckets": {512: 3, 530: 7}
+            }
+            count/sum/max - количество, сумма и максимум замеров в секундах, errors - количество неуспешных операций
+            (без замеров), buckets - номер интервала -> количество замеров.
+    """
+    return {"count": 0, "sum": 0.0, "max": 0.0, "errors": 0, "buckets": {}}
+
+
+def _get_bucket(value: float) -> int:
+    if value < _MIN_VALUE:
+        return 0
+    return int(math.log(value / _MIN_VALUE) / _LOG_BASE) + 1
+
+
+def _get_bucket_limit(bucket: int) -> float:
+    if bucket == 0:
+        return _MIN_VALUE
+    return _MIN_VALUE * math.exp(bucket * _LOG_BASE)
+
+
+def record(histogram: dict, value: float) -> None:
+    """Добавление замера в гистограмму.
+
+    :param histogram: гистограмма (см. create_histogram);
+    :param value: время в секундах.
+    """
+    bucket = _get_bucket(value)
+    histogram['buckets'][bucket] = histogram['buckets'].get(bucket, 0) + 1
+    histogram['count'] += 1
+    histogram['sum'] += value
+    histogram['max'] = max(histogram['max'], value)
+
+
+def merge_histogram(target: dict, source: dict) -> None:
+    """Добавление гистограммы source в гистограмму target.
+
+    :param target: гистограмма, в которую добавляются значения;
+    :param source: добавляемая гистограмма.
+    """
+    target['count'] += source['count']
+    target['sum'] += source['sum']
+    target['max'] = max(target['max'], source['max'])
+    target['errors'] += source['errors']
+    # после передачи в json (распределенный запуск) номера интервалов становятся строками
+    for bucket, count in source['buckets'].items():
+        bucket = int(bucket)
+        target['buckets'][bucket] = target['buckets'].get(bucket, 0) + count
+
+
+def get_percentile(histogram: dict, percentile: float) -> float:
+    """Получение процентиля времени.
+
+    :param histogram: гистограмма;
+    :param percentile: процентиль (от 0 до 100).
+
+    :return: время в секундах (верхняя граница интервала, но не больше максимума), 0 - если замеров нет.
+    """
+    if histogram['count'] == 0:
+        return 0.0
+    rank = max(math.ceil(histogram['count'] * percentile / 100), 1)
+    passed = 0
+    for bucket in sorted(histogram['buckets']):
+        passed += histogram['buckets'][bucket]
+        if passed >= rank:
+            return min(_get_bucket_limit(bucket), histogram['max'])
+
+    return histogram['max']
+
+
+def get_report(histogram: dict) -> dict:
+    """Получение показателей гистограммы для отчета.
+
+    :param histogram: гистограмма.
+
+    :return: словарь вида:
+            {
+                "count": 10,
+                "errors": 1,
+                "error_rate": 0.0909,
+                "avg": 0.15,
+                "max": 0.3,
+                "p50": 0.12,
+                "p90": 0.25,
+                "p99": 0.3,
+                "p99.9": 0.3
+            }
+            время - в секундах, error_rate - доля неуспешных операций среди всех операций.
+    """
+    total = histogram['count'] + histogram['errors']
+    report = {
+        "count": histogram['count'],
+        "errors": histogram['errors'],
+        "error_rate": histogram['errors'] / total if total else 0.0,
+        "avg": histogram['sum'] / histogram['count'] if histogram['count'] else 0.0,
+        "max": histogram['max']
+    }
+    for percentile in PERCENTILES:
+        report["p" + ("%g" % percentile)] = get_percentile(histogram, percentile)
+
+    return report
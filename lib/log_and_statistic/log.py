@@ -9,7 +9,12 @@ from scripts.common import tools
 
 
 class Log:
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, resume: bool = False, directory: str = "./log"):
+        """
+        :param config: общие настройки runner;
+        :param resume: продолжение прерванного запуска - логи пишутся в существующую папку log без ее ротации;
+        :param directory: папка логов (по умолчанию ./log), при ротации переименовывается в <directory>_ВРЕМЯ.
+        """
         print("create_log")
         # установка формата строки лога
         self._formatter = logging.Formatter('%(asctime)s - func %(funcName)s() - keyline=%(lineno)d - '
@@ -17,10 +22,29 @@ class Log:
         self._log_level = config['log']['level']
         self._max_bytes = config['log']['max_bytes']
         self._max_files = config['log']['max_files']
+        self._directory = directory
+        # время запуска приложения, общее для всех рабочих процессов (объект Log передается в них)
+        self._start_time = datetime.datetime.now()
+
+        if resume and os.path.exists(directory):
+            return
+        delete_directory(config['log']['max_dir'], directory)
+        rename_directory(directory)
+        create_root_directories(directory)
 
-        delete_directory(config['log']['max_dir'])
-        rename_directory()
-        create_root_directories()
+    def get_directory(self) -> str:
+        """Метод-геттер папки логов.
+
+        :return: путь к папке логов.
+        """
+        return self._directory
+
+    def get_start_time(self) -> datetime.datetime:
+        """Метод-геттер времени запуска приложения.
+
+        :return: время создания объекта Log в основном процессе.
+        """
+        return self._start_time
 
     def get_logger(self, py_module_name: str) -> logging.Logger:
         """Получение объекта лога для указанного py-модуля
@@ -32,10 +56,10 @@ class Log:
         logger = logging.getLogger(py_module_name)
         if logger.handlers:
             return logger
-        if create_directory(py_module_name) is False:
+        if create_directory(py_module_name, self._directory) is False:
             return logger
-        fh = logging.handlers.RotatingFileHandler("./log/" + py_module_name + "/log.txt", maxBytes=self._max_bytes,
-                                                  backupCount=self._max_files)
+        fh = logging.handlers.RotatingFileHandler(self._directory + "/" + py_module_name + "/log.txt",
+                                                  maxBytes=self._max_bytes, backupCount=self._max_files)
         fh.setFormatter(self._formatter)
         self._set_log_level(logger)
         logger.addHandler(fh)
@@ -62,18 +86,23 @@ class Log:
             logger.setLevel(logging.CRITICAL)
 
 
-def delete_directory(max_dir: int) -> bool:
+def delete_directory(max_dir: int, directory: str = "./log") -> bool:
     """Удаление самой старой директории с логами, если превышен их лимит.
+    Учитываются только директории, полученные ротацией directory (см. rename_directory).
+
+    :param max_dir: максимальное количество директорий с логами;
+    :param directory: папка логов.
 
     :return: либо True (если успешно удалена), либо False (если лимит не превышен)
     """
     print("delete_directory")
-    dirs: List[str] = tools.get_dirs("./")
+    parent, name = os.path.split(os.path.normpath(directory))
+    dirs: List[str] = tools.get_dirs(parent or "./")
     log_dirs: List[str] = []
 
     for dir_ in dirs:
-        if dir_.find("log_") != -1:
-            log_dirs.append(dir_)
+        if dir_.startswith(name + "_") and dir_[len(name) + 1:].replace("_", "").isdigit():
+            log_dirs.append(os.path.join(parent, dir_))
 
     if len(log_dirs) < max_dir:
         return False
@@ -87,42 +116,44 @@ def delete_directory(max_dir: int) -> bool:
     return True
 
 
-def create_root_directories():
-    os.mkdir("./log")
-    os.mkdir("./log/test")
-    os.mkdir("./log/scripts")
-    os.mkdir("./log/scripts/ws")
-    os.mkdir("./log/scripts/web")
-    os.mkdir("./log/scripts/common")
-    os.mkdir("./log/scripts/xml")
-    os.mkdir("./log/client")
-    os.mkdir("./log/log_and_statistic")
+def create_root_directories(directory: str = "./log"):
+    os.makedirs(directory)
+    os.mkdir(directory + "/test")
+    os.mkdir(directory + "/scripts")
+    os.mkdir(directory + "/scripts/ws")
+    os.mkdir(directory + "/scripts/web")
+    os.mkdir(directory + "/scripts/common")
+    os.mkdir(directory + "/scripts/xml")
+    os.mkdir(directory + "/client")
+    os.mkdir(directory + "/log_and_statistic")
 
 
-def create_directory(name: str) -> bool:
+def create_directory(name: str, directory: str = "./log") -> bool:
     print("create_directory")
     """Создание директории логов для конкретного py-модуля.
 
     :param name: имя py-модуля
+    :param directory: папка логов
     :return: либо True (если успешно создана), либо False
     """
-    if os.path.exists("./log/" + name):
+    if os.path.exists(directory + "/" + name):
         return True
     try:
-        os.mkdir("./log/" + name)
+        os.mkdir(directory + "/" + name)
         return True
     except OSError:
         return False
 
 
-def rename_directory() -> None:
+def rename_directory(directory: str = "./log") -> None:
     """Переименовывает папку log в папку вида log_CURRENT-TIME.
 
+    :param directory: папка логов.
     :return: None
     """
-    if os.path.exists("./log"):
+    if os.path.exists(directory):
         current_time = datetime.datetime.now()
-        os.renames("./log", "./log_" + current_time.strftime("%Y%m%d_%H%M%S"))
+        os.renames(directory, os.path.normpath(directory) + "_" + current_time.strftime("%Y%m%d_%H%M%S"))
 
 
 def raise_error(message: str, logger: logging.Logger) -> None:
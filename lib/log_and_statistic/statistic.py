@@ -4,6 +4,7 @@ from typing import List
 from termcolor import colored
 
 from lib.log_and_statistic.log import Log
+from lib.log_and_statistic import aggregator
 
 
 def get_current_time() -> str:
@@ -56,6 +57,27 @@ class Statistic:
         """
         return self._log
 
+    def get_test_name(self) -> str:
+        """Метод-геттер имени теста.
+
+        :return: имя теста.
+        """
+        return self._test_name
+
+    def get_errors_count(self) -> int:
+        """Метод-геттер количества ошибок.
+
+        :return: количество ошибок.
+        """
+        return len(self._errors)
+
+    def get_warns_count(self) -> int:
+        """Метод-геттер количества предупреждений.
+
+        :return: количество предупреждений.
+        """
+        return len(self._warns)
+
     def show_errors_statistic(self) -> None:
         """Вывод краткой статистики по ишибкам.
 
@@ -118,6 +140,7 @@ class Statistic:
         self._error("\n[" + current_time + "][Поток #" + str(self._thread_id) + "][" + type_ + "]\n" + message)
         self._compute_errors_statistic(type_)
         self._compute_error_in_row(type_)
+        aggregator.publish("error", self._test_name, type_)
 
         if self._error_in_row_count >= self._max_errors:
             sys.exit("Превышен лимит ошибок типа [" + type_ + "]!")
@@ -141,6 +164,7 @@ class Statistic:
         })
         self._warn("\n[" + current_time + "][Поток #" + str(self._thread_id) + "][" + type_ + "]\n" + message)
         self._compute_warns_statistic(type_)
+        aggregator.publish("warn", self._test_name, type_)
 
     def append_info(self, message: str, type_: str) -> None:
         """Добавление вспомогательной информации и его типа в список, а также вывод в консоль сообщения о ней.
@@ -168,6 +192,33 @@ class Statistic:
 
         self._error_in_row_type = ""
         self._error_in_row_count = 0
+        aggregator.publish("success", self._test_name, type_)
+
+    def append_latency(self, name: str, latency: float) -> None:
+        """Добавление замера времени операции (например, времени ответа ws метода).
+        Замер не выводится в консоль, он попадает только в общую статистику запуска (см. StatisticAggregator).
+
+        :param name: имя операции;
+        :param latency: время операции в секундах.
+        """
+        aggregator.publish("latency", self._test_name, name, latency, self._thread_id)
+
+    def append_latency_error(self, name: str) -> None:
+        """Добавление неуспешной операции без замера времени (например, ws запроса к недоступному сервису).
+        Учитывается в доле ошибок операции в общей статистике запуска (см. StatisticAggregator).
+
+        :param name: имя операции.
+        """
+        aggregator.publish("latency_error", self._test_name, name, 1, self._thread_id)
+
+    def append_counter(self, name: str, value: int = 1) -> None:
+        """Увеличение счетчика событий (например, количества повторных попыток ws запросов).
+        Счетчик не выводится в консоль, он попадает только в общую статистику запуска (см. StatisticAggregator).
+
+        :param name: имя счетчика;
+        :param value: величина увеличения.
+        """
+        aggregator.publish("counter", self._test_name, name, value)
 
     def create_report(self) -> None:
         """Метод создания отчета.
@@ -177,7 +228,8 @@ class Statistic:
         """
         with open("./report[" + self._test_name + "].txt", "a", encoding="utf-8") as report_file:
             report_file.write("\n==================================================================================="
-                              "=====" + "\n             ТЕСТ " + self._test_name + "[Поток #" + str(self._thread_id) + "]" +
+                              "=====" + "\n             ТЕСТ " + self._test_name + "[Поток #" +
+                              str(self._thread_id) + "]" +
                               "\n================================================================================"
                               "========\n")
 
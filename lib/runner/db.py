@@ -1,6 +1,40 @@
 import json
+import time
+import hashlib
 import sqlite3
 
+from lib.runner.plan import TestPlan, TestCasePlan, RunPlan
+from lib.runner.load_profile import compile_load_profile
+from lib.runner.validation import get_validator
+
+
+# атрибуты конфигурации запуска, от которых зависит ключ плана (см. DataBase.get_run_plan_key)
+_PLAN_KEY_COLUMNS = ["tcrc.idTestCaseConfig", "tcrc.waitFinish", "trc.threadsCount", "trc.waitTime", "trc.executor",
+                     "trc.loadProfile", "tc.idTestConfig", "tc.idTest", "tc.hash"]
+# столбцы, которые добавлены в БД после ее создания: (таблица, столбец, определение)
+_UPGRADE_COLUMNS = [
+    ("TestRunConfiguration", "executor", "varchar(20) NOT NULL DEFAULT 'thread'"),
+    ("TestRunConfiguration", "loadProfile", "varchar NOT NULL DEFAULT ''")
+]
+# таблицы, которые добавлены в БД после ее создания
+_UPGRADE_TABLES = [
+    "CREATE TABLE IF NOT EXISTS Checkpoint\n"
+    "(\n"
+    "  idRunConfig INTEGER NOT NULL,\n"
+    "  planKey varchar(50) NOT NULL,\n"
+    "  iterations INTEGER NOT NULL,\n"
+    "  deadline REAL NOT NULL,\n"
+    "  iteration INTEGER NOT NULL,\n"
+    "  testCaseIndex INTEGER NOT NULL,\n"
+    "  statistic varchar NOT NULL,\n"
+    "  updated REAL NOT NULL,\n"
+    "  CONSTRAINT PK_Checkpoint PRIMARY KEY (idRunConfig),\n"
+    "  CONSTRAINT Relationship_Checkpoint FOREIGN KEY (idRunConfig) REFERENCES RunConfiguration (idRunConfig)\n"
+    ")"
+]
+# версия схемы БД (PRAGMA user_version), в которой уже есть все _UPGRADE_TABLES и _UPGRADE_COLUMNS
+_SCHEMA_VERSION = 1
+
 
 class DataBase:
     """Класс по работе с баззой данных Runner.
@@ -10,6 +44,8 @@ class DataBase:
         self._DB_PATH = "./databases/runner.db"
         self._connection = None
         self._cursor = None
+        # кэш скомпилированных планов запуска по id конфигурации запуска
+        self._run_plans: dict = {}
 
     def connect(self) -> None:
         """Метод соединения с БД.
@@ -17,6 +53,26 @@ class DataBase:
         """
         self._connection = sqlite3.connect(self._DB_PATH)
         self._cursor = self._connection.cursor()
+        self._upgrade_schema()
+
+    def _upgrade_schema(self) -> None:
+        """Метод добавления в БД недостающих таблиц и столбцов (см. _UPGRADE_TABLES и _UPGRADE_COLUMNS).
+        Позволяет работать с базами, созданными до появления новых настроек. Обновление выполняется один раз:
+        после него БД получает версию схемы _SCHEMA_VERSION, и при следующих соединениях БД не изменяется.
+
+        """
+        self._cursor.execute("PRAGMA user_version")
+        if self._cursor.fetchall()[0][0] >= _SCHEMA_VERSION:
+            return
+        for sql_cmd in _UPGRADE_TABLES:
+            self._cursor.execute(sql_cmd)
+        for table, column, definition in _UPGRADE_COLUMNS:
+            self._cursor.execute("PRAGMA table_info(" + table + ")")
+            if column in [table_column[1] for table_column in self._cursor.fetchall()]:
+                continue
+            self._cursor.execute("ALTER TABLE " + table + " ADD COLUMN " + column + " " + definition)
+        self._cursor.execute("PRAGMA user_version = " + str(_SCHEMA_VERSION))
+        self._connection.commit()
 
     def disconnect(self) -> None:
         """Метод отсоединения от БД.
@@ -70,8 +126,8 @@ class DataBase:
                     ...
                 )
         """
-        sql_cmd = "SELECT idTestCaseConfig, idTestCase, waitFinish FROM TestCaseRunConfiguration WHERE idRunConfig = ?" \
-                  " ORDER BY sequenceNumber"
+        sql_cmd = "SELECT idTestCaseConfig, idTestCase, waitFinish FROM TestCaseRunConfiguration " \
+                  "WHERE idRunConfig = ? ORDER BY sequenceNumber"
         self._cursor.execute(sql_cmd, [run_config_id])
         result: tuple = self._cursor.fetchall()
         assert result, "[0001] Не добавлено ни одного тест кейса для указанной конфигурации запуска!"
@@ -197,3 +253,180 @@ class DataBase:
         assert result, "[0007] Модуля с указанным id не существует!"
 
         return result[0][0]
+
+    def get_run_plan_key(self, run_config_id: int) -> str:
+        """Метод получения ключа плана конфигурации запуска.
+        Ключ - md5 от структуры конфигурации запуска (тест кейсы, потоки, паузы, режимы запуска, профили нагрузки)
+        и атрибутов hash конфигураций тестов. Любое изменение конфигурации запуска или входных данных тестов
+        меняет ключ.
+
+        :param run_config_id: id (первичный ключ) конфигурации запуска.
+
+        :return: ключ плана.
+        """
+        sql_cmd = "SELECT " + ", ".join(_PLAN_KEY_COLUMNS) + " " \
+                  "FROM TestCaseRunConfiguration AS tcrc " \
+                  "JOIN TestRunConfiguration AS trc ON trc.idTestCaseConfig = tcrc.idTestCaseConfig " \
+                  "JOIN TestConfiguration AS tc ON tc.idTestConfig = trc.idTestConfig " \
+                  "WHERE tcrc.idRunConfig = ? ORDER BY tcrc.sequenceNumber, trc.sequenceNumber"
+        self._cursor.execute(sql_cmd, [run_config_id])
+
+        return _compute_plan_key(self._cursor.fetchall())
+
+    def get_run_plan(self, run_config_id: int) -> RunPlan:
+        """Метод получения скомпилированного плана конфигурации запуска.
+        План загружается одним запросом (JOIN таблиц RunConfiguration, TestCaseRunConfiguration,
+        TestRunConfiguration, TestConfiguration, Test и Module), входные данные тестов десериализуются один раз.
+        Входные данные каждого теста проверяются по схеме теста (атрибут Test.inputDataSchema, см. get_validator)
+        до запуска каких-либо процессов, как и совместимость режима запуска с профилем нагрузки и ws_rate;
+        при ошибках запуск прерывается со списком всех несоответствий.
+        Построенный план кэшируется и переиспользуется до тех пор, пока не изменится его ключ (см. get_run_plan_key).
+
+        :param run_config_id: id (первичный ключ) конфигурации запуска.
+
+        :return: план конфигурации запуска.
+        """
+        cached_plan: RunPlan = self._run_plans.get(run_config_id)
+        if cached_plan is not None and cached_plan.key == self.get_run_plan_key(run_config_id):
+            return cached_plan
+
+        sql_cmd = "SELECT " + ", ".join(_PLAN_KEY_COLUMNS) + ", tcrc.idTestCase, tc.inputData, t.name, m.name, " \
+                  "t.inputDataSchema, tc.name " \
+                  "FROM RunConfiguration AS rc " \
+                  "JOIN TestCaseRunConfiguration AS tcrc ON tcrc.idRunConfig = rc.idRunConfig " \
+                  "JOIN TestRunConfiguration AS trc ON trc.idTestCaseConfig = tcrc.idTestCaseConfig " \
+                  "JOIN TestConfiguration AS tc ON tc.idTestConfig = trc.idTestConfig " \
+                  "JOIN Test AS t ON t.idTest = tc.idTest " \
+                  "JOIN Module AS m ON m.idModule = t.idModule " \
+                  "WHERE rc.idRunConfig = ? ORDER BY tcrc.sequenceNumber, trc.sequenceNumber"
+        self._cursor.execute(sql_cmd, [run_config_id])
+        result: list = self._cursor.fetchall()
+        assert result, "[0008] Не добавлено ни одного теста в конфигурацию запуска!"
+        # тест кейсы без конфигураций тестов не попадают в результат JOIN
+        self._cursor.execute("SELECT idTestCaseConfig FROM TestCaseRunConfiguration WHERE idRunConfig = ?",
+                             [run_config_id])
+        assert {row[0] for row in self._cursor.fetchall()} == {row[0] for row in result}, \
+            "[0003] Не добавлено ни одной конфигурации теста в конфигурации запуска!"
+
+        test_cases = []
+        tests = []
+        errors = []
+        for index, row in enumerate(result):
+            input_data: dict = json.loads(row[10])
+            test_name = "'" + row[14] + "' (" + row[12] + "." + row[11] + "): "
+            errors.extend([test_name + error for error in get_validator(row[13])(input_data)])
+            if row[4] == "asyncio" and row[5]:
+                errors.append(test_name + "профиль нагрузки не поддерживается для executor = asyncio")
+            if "ws_rate" in input_data and not _is_valid_rate(input_data['ws_rate']):
+                errors.append(test_name + "ws_rate должен быть положительным числом или словарем "
+                                          "{\"ws метод\": положительное число}")
+            tests.append(TestPlan(
+                module=row[12],
+                test=row[11],
+                input_data=input_data,
+                threads=row[2],
+                wait_time=row[3],
+                executor=row[4],
+                load_profile=compile_load_profile(json.loads(row[5])) if row[5] else ()
+            ))
+            # строки отсортированы по тест кейсам, поэтому тест кейс заканчивается на смене idTestCaseConfig
+            if index + 1 == len(result) or result[index + 1][0] != row[0]:
+                test_cases.append(TestCasePlan(
+                    test_case_run_config_id=row[0],
+                    test_case_id=row[9],
+                    wait_finish=bool(row[1]),
+                    tests=tuple(tests)
+                ))
+                tests = []
+        assert not errors, "[0014] Входные данные тестов не соответствуют схеме:\n" + "\n".join(errors)
+
+        run_plan = RunPlan(run_config_id, _compute_plan_key([row[:len(_PLAN_KEY_COLUMNS)] for row in result]),
+                           tuple(test_cases))
+        self._run_plans[run_config_id] = run_plan
+
+        return run_plan
+
+    def save_checkpoint(self, run_config_id: int, checkpoint: dict) -> None:
+        """Метод сохранения контрольной точки запуска конфигурации.
+        Для каждой конфигурации запуска хранится только последняя контрольная точка.
+
+        :param run_config_id: id (первичный ключ) конфигурации запуска;
+        :param checkpoint: контрольная точка (см. get_checkpoint).
+        """
+        sql_cmd = "INSERT OR REPLACE INTO Checkpoint (idRunConfig, planKey, iterations, deadline, iteration, " \
+                  "testCaseIndex, statistic, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+        self._cursor.execute(sql_cmd, [run_config_id, checkpoint['plan_key'], checkpoint['iterations'],
+                                       checkpoint['deadline'], checkpoint['iteration'], checkpoint['test_case_index'],
+                                       json.dumps(checkpoint['statistic']), time.time()])
+        self._connection.commit()
+
+    def get_checkpoint(self, run_config_id: int) -> dict:
+        """Метод получения последней контрольной точки запуска конфигурации.
+
+        :param run_config_id: id (первичный ключ) конфигурации запуска.
+
+        :return: контрольная точка вида:
+                {
+                    "plan_key": "...",
+                    "iterations": 10,
+                    "deadline": 0.0,
+                    "iteration": 3,
+                    "test_case_index": 2,
+                    "statistic": {...}
+                }
+                iterations - количество итераций (0 - запуск ограничен временем deadline);
+                deadline - время (unix time), до которого выполняется запуск (0 - запуск ограничен итерациями);
+                iteration - номер текущей итерации (с нуля);
+                test_case_index - количество тест кейсов итерации, завершенных подряд с ее начала;
+                statistic - накопленная статистика запуска (см. Runner).
+        """
+        sql_cmd = "SELECT planKey, iterations, deadline, iteration, testCaseIndex, statistic FROM Checkpoint " \
+                  "WHERE idRunConfig = ?"
+        self._cursor.execute(sql_cmd, [run_config_id])
+        result: tuple = self._cursor.fetchall()
+        assert result, "[0013] Для указанной конфигурации запуска нет контрольной точки!"
+
+        return {
+            "plan_key": result[0][0],
+            "iterations": result[0][1],
+            "deadline": result[0][2],
+            "iteration": result[0][3],
+            "test_case_index": result[0][4],
+            "statistic": json.loads(result[0][5])
+        }
+
+    def delete_checkpoint(self, run_config_id: int) -> None:
+        """Метод удаления контрольной точки после полного завершения запуска конфигурации.
+
+        :param run_config_id: id (первичный ключ) конфигурации запуска.
+        """
+        self._cursor.execute("DELETE FROM Checkpoint WHERE idRunConfig = ?", [run_config_id])
+        self._connection.commit()
+
+
+def _is_valid_rate(rate) -> bool:
+    """Проверка целевой интенсивности ws_rate (см. lib.client.arrival.get_arrival_scheduler).
+
+    :param rate: число или словарь вида {"ws метод": rps, "*": rps}.
+
+    :return: True, если все значения интенсивности - положительные числа.
+    """
+    rates = list(rate.values()) if isinstance(rate, dict) else [rate]
+
+    return bool(rates) and all(isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+                               for value in rates)
+
+
+def _compute_plan_key(rows: list) -> str:
+    """Вычисление ключа плана по строкам конфигурации запуска.
+
+    :param rows: строки со значениями столбцов _PLAN_KEY_COLUMNS.
+
+    :return: md5 в виде строки.
+    """
+    md5 = hashlib.md5()
+    for row in rows:
+        md5.update("|".join([str(value) for value in row]).encode("utf-8"))
+        md5.update(b"\n")
+
+    return md5.hexdigest()
@@ -0,0 +1,365 @@
+import os
+import json
+import time
+import queue
+import socket
+import threading
+from typing import Tuple, List
+
+import zmq
+
+from lib.log_and_statistic.log import Log
+from lib.log_and_statistic.statistic import Statistic
+from lib.log_and_statistic.aggregator import StatisticAggregator, create_summary, merge_summary, format_summary, \
+    write_summary
+
+from lib.runner.db import DataBase
+from lib.runner.pool import WorkerPool
+from lib.runner.runner import STATISTIC_FILE
+from lib.runner.scheduler import Scheduler, get_max_parallel
+from lib.runner.load_profile import LoadStage
+from lib.runner.plan import TestCasePlan, RunPlan, get_plan_modules, test_case_plan_to_dict, test_case_plan_from_dict
+
+
+def _share(value: int, parts: int, part: int) -> int:
+    """Доля целого значения value для части part при равномерном делении на parts частей.
+
+    """
+    return value // parts + (1 if part < value % parts else 0)
+
+
+def split_test_case_plan(test_case_plan: TestCasePlan, parts: int) -> Tuple[TestCasePlan, ...]:
+    """Деление тест кейса между агентами.
+    Потоки каждого теста (и потоки ступеней профиля нагрузки) делятся между агентами как можно равномернее,
+    целевая интенсивность ws_rate делится поровну между агентами, которым достались потоки теста.
+    Тесты, которым не досталось ни одного потока, у агента не запускаются; если агенту не досталось
+    ни одного теста, тест кейс все равно остается в его плане без тестов, чтобы барьеры waitFinish
+    (см. build_dependencies) у всех агентов совпадали с исходным планом.
+
+    :param test_case_plan: план тест кейса;
+    :param parts: количество агентов.
+
+    :return: планы тест кейса для каждого агента.
+    """
+    test_case_plans = []
+    for part in range(parts):
+        tests = []
+        for test in test_case_plan.tests:
+            load_profile = tuple(LoadStage(_share(stage.threads, parts, part), stage.duration)
+                                 for stage in test.load_profile)
+            threads = _share(test.threads, parts, part)
+            if (load_profile and not any(stage.threads for stage in load_profile)) or \
+                    (not load_profile and threads == 0):
+                continue
+            input_data = test.input_data
+            if input_data.get('ws_rate'):
+                # потоки достаются первым агентам (см. _share), остальные тест не запускают
+                rate_parts = min(parts, max([stage.threads for stage in test.load_profile], default=test.threads))
+                input_data = dict(input_data)
+                if isinstance(input_data['ws_rate'], dict):
+                    input_data['ws_rate'] = {method: rate / rate_parts
+                                             for method, rate in input_data['ws_rate'].items()}
+                else:
+                    input_data['ws_rate'] = input_data['ws_rate'] / rate_parts
+            tests.append(test._replace(threads=threads, load_profile=load_profile, input_data=input_data))
+        test_case_plans.append(test_case_plan._replace(tests=tuple(tests)))
+
+    return tuple(test_case_plans)
+
+
+def merge_test_case_results(results: List[dict]) -> dict:
+    """Объединение результатов одного тест кейса, полученных от разных агентов.
+    Результаты тестов объединяются по модулю и имени теста, ступени профиля нагрузки - по номеру ступени.
+
+    :param results: результаты тест кейса от агентов (см. lib.runner.pool._run_test_case).
+
+    :return: объединенный результат тест кейса.
+    """
+    tests: dict = {}
+    for result in results:
+        for test_result in result['tests']:
+            key = (test_result['module'], test_result['test'])
+            merged = tests.setdefault(key, {
+                "module": test_result['module'],
+                "test": test_result['test'],
+                "errors": 0,
+                "warns": 0,
+                "stages": {},
+                "connections": {"opened": 0, "reused": 0}
+            })
+            merged['errors'] += test_result['errors']
+            merged['warns'] += test_result['warns']
+            merged['connections']['opened'] += test_result['connections']['opened']
+            merged['connections']['reused'] += test_result['connections']['reused']
+            for stage in test_result['stages']:
+                merged_stage = merged['stages'].setdefault(stage['stage'], {
+                    "stage": stage['stage'],
+                    "threads": 0,
+                    "duration": 0.0,
+                    "count": 0,
+                    "errors": 0,
+                    "throughput": 0.0,
+                    "latency_avg": 0.0,
+                    "latency_max": 0.0
+                })
+                latency_sum = merged_stage['latency_avg'] * merged_stage['count'] + \
+                    stage['latency_avg'] * stage['count']
+                merged_stage['threads'] += stage['threads']
+                merged_stage['duration'] = max(merged_stage['duration'], stage['duration'])
+                merged_stage['count'] += stage['count']
+                merged_stage['errors'] += stage['errors']
+                merged_stage['throughput'] += stage['throughput']
+                merged_stage['latency_avg'] = latency_sum / merged_stage['count'] if merged_stage['count'] else 0.0
+                merged_stage['latency_max'] = max(merged_stage['latency_max'], stage['latency_max'])
+
+    for merged in tests.values():
+        merged['stages'] = tuple(merged['stages'][stage] for stage in sorted(merged['stages']))
+
+    return {
+        "test_case_run_config_id": results[0]['test_case_run_config_id'] if results else 0,
+        "agents": len(results),
+        "duration": max([result['duration'] for result in results], default=0.0),
+        "tests": tuple(tests.values())
+    }
+
+
+def _send(zmq_socket: zmq.Socket, message: dict, identity: bytes = None) -> None:
+    frames = [json.dumps(message).encode("utf-8")]
+    if identity is not None:
+        frames.insert(0, identity)
+    zmq_socket.send_multipart(frames)
+
+
+class Coordinator:
+    """Координатор распределенного запуска конфигурации.
+    Ожидает подключения указанного количества агентов (см. Agent) по ZeroMQ (сокет ROUTER), затем на каждой
+    итерации делит потоки тестов между агентами (см. split_test_case_plan), рассылает им планы с общим моментом
+    старта и объединяет поступающие от агентов результаты тест кейсов.
+    Каждый агент получает все тест кейсы итерации (в том числе без своих тестов), поэтому барьеры waitFinish
+    у всех агентов одинаковы и соблюдаются внутри каждого агента; итерация завершается, когда ее закончили
+    все агенты.
+
+    Настройки берутся из блока "runner" общих настроек:
+        "start_delay" - через сколько секунд после рассылки планов агенты начинают итерацию (по умолчанию 2);
+        "agent_timeout" - максимальное время ожидания сообщения от агентов в секундах
+                          (по умолчанию 0 - без ограничения).
+    """
+    def __init__(self, run_config_id: int, iterations: int, data_base: DataBase, log: Log, runner_settings: dict,
+                 address: str, agents_count: int):
+        self._run_config_id = run_config_id
+        self._iterations = iterations
+        self._data_base = data_base
+        self._log = log
+        self._runner_settings = runner_settings
+        self._address = address
+        self._agents_count = agents_count
+
+        self._start_delay: float = runner_settings.get('runner', {}).get('start_delay', 2)
+        self._agent_timeout: float = runner_settings.get('runner', {}).get('agent_timeout', 0)
+        self._statistic = Statistic("Координатор", 1, runner_settings, log)
+
+        self._context = zmq.Context()
+        self._socket = self._context.socket(zmq.ROUTER)
+        self._poller = zmq.Poller()
+        self._poller.register(self._socket, zmq.POLLIN)
+
+    def start(self) -> None:
+        """Метод запуска распределенной конфигурации.
+
+        """
+        self._socket.bind(self._address)
+        agents: List[bytes] = []
+        try:
+            while len(agents) < self._agents_count:
+                identity, message = self._receive()
+                if message['type'] == "ready" and identity not in agents:
+                    agents.append(identity)
+                    self._statistic.append_success("Подключен агент " + message['host'] + " (pid " +
+                                                   str(message['pid']) + "), " + str(len(agents)) + " из " +
+                                                   str(self._agents_count), "АГЕНТ")
+
+            for iteration in range(self._iterations):
+                run_plan: RunPlan = self._data_base.get_run_plan(self._run_config_id)
+                start_at = time.time() + self._start_delay
+                agent_plans = [[] for _ in agents]
+                for test_case in run_plan.test_cases:
+                    for agent_index, agent_test_case in enumerate(split_test_case_plan(test_case, len(agents))):
+                        agent_plans[agent_index].append(test_case_plan_to_dict(agent_test_case))
+                for agent_index, identity in enumerate(agents):
+                    _send(self._socket, {
+                        "type": "run",
+                        "iteration": iteration,
+                        "start_at": start_at,
+                        "test_cases": agent_plans[agent_index]
+                    }, identity)
+                self._collect_iteration(iteration, agents, start_at)
+
+            self._stop_agents(agents)
+            agents = []
+        finally:
+            for identity in agents:
+                _send(self._socket, {"type": "stop"}, identity)
+            self._socket.close(linger=1000)
+            self._context.term()
+
+    def _stop_agents(self, agents: List[bytes]) -> None:
+        """Остановка агентов с получением от каждого итоговой сводки статистики его рабочих процессов
+        (см. StatisticAggregator), вывод общей сводки запуска и запись ее в файл STATISTIC_FILE.
+
+        :param agents: идентификаторы агентов.
+        """
+        for identity in agents:
+            _send(self._socket, {"type": "stop"}, identity)
+
+        summary = create_summary()
+        stopped = set()
+        while len(stopped) < len(agents):
+            identity, message = self._receive()
+            if message['type'] == "stopped" and identity not in stopped:
+                stopped.add(identity)
+                merge_summary(summary, message['statistic'])
+        for line in format_summary(summary):
+            self._statistic.append_success(line, "СТАТИСТИКА")
+        write_summary(summary, self._log.get_directory() + "/" + STATISTIC_FILE)
+
+    def _receive(self) -> Tuple[bytes, dict]:
+        """Получение следующего сообщения от агентов.
+
+        :return: идентификатор агента и сообщение.
+        """
+        timeout = self._agent_timeout * 1000 if self._agent_timeout else None
+        if not self._poller.poll(timeout):
+            self._statistic.append_error("Нет сообщений от агентов более " + str(self._agent_timeout) + " с",
+                                         "АГЕНТ", True)
+        identity, payload = self._socket.recv_multipart()
+
+        return identity, json.loads(payload.decode("utf-8"))
+
+    def _collect_iteration(self, iteration: int, agents: List[bytes], start_at: float) -> None:
+        """Сбор и объединение результатов итерации от всех агентов.
+
+        :param iteration: номер итерации;
+        :param agents: идентификаторы агентов;
+        :param start_at: момент старта итерации.
+        """
+        finished: dict = {}
+        results: dict = {}
+        while len(finished) < len(agents):
+            identity, message = self._receive()
+            if message.get('iteration') != iteration:
+                continue
+            if message['type'] == "result":
+                if message['result'] is None:
+                    self._statistic.append_error("Тест кейс на агенте завершился аварийно!", "ТЕСТ_КЕЙС")
+                    continue
+                results.setdefault(message['result']['test_case_run_config_id'], []).append(message['result'])
+            elif message['type'] == "finish":
+                finished[identity] = message
+
+        self._statistic.append_success("Итерация #" + str(iteration + 1) + " завершена на " + str(len(agents)) +
+                                       " агентах. Время: " + str(round(time.time() - start_at, 3)) +
+                                       " с, критический путь: " +
+                                       str(round(max([info['critical_path'] for info in finished.values()]), 3)) +
+                                       " с", "ИТЕРАЦИЯ")
+        for test_case_run_config_id in results:
+            merged = merge_test_case_results(results[test_case_run_config_id])
+            for test_result in merged['tests']:
+                self._statistic.append_success("Тест " + test_result['module'] + "." + test_result['test'] +
+                                               ": ошибок " + str(test_result['errors']) + ", предупреждений " +
+                                               str(test_result['warns']) + ", http соединений открыто " +
+                                               str(test_result['connections']['opened']) + ", переиспользовано " +
+                                               str(test_result['connections']['reused']), "ИТОГ")
+                for stage in test_result['stages']:
+                    self._statistic.append_success(
+                        "Ступень #" + str(stage['stage']) + ": потоков " + str(stage['threads']) + ", выполнений " +
+                        str(stage['count']) + ", ошибок " + str(stage['errors']) + ", пропускная способность " +
+                        str(round(stage['throughput'], 3)) + "/с, время ср./макс. " +
+                        str(round(stage['latency_avg'] * 1000)) + "/" + str(round(stage['latency_max'] * 1000)) +
+                        " мс", "ПРОФИЛЬ_НАГРУЗКИ")
+
+
+class Agent:
+    """Агент распределенного запуска.
+    Подключается к координатору (сокет DEALER), получает от него планы тест кейсов, начинает итерацию
+    в указанный координатором момент времени и отправляет результаты тест кейсов по мере их завершения.
+    При остановке агент отправляет координатору сводку статистики своих рабочих процессов.
+    Часы агентов и координатора должны быть синхронизированы (NTP).
+    Тест кейс, выполняющийся дольше настройки "test_case_timeout" блока "runner", считается аварийно
+    завершенным (см. Runner).
+    Каждый агент пишет логи в свою папку (см. main.py, --log-dir), чтобы агенты, запущенные из одной
+    копии проекта, не ротировали папку логов друг друга.
+
+    """
+    def __init__(self, address: str, log: Log, runner_settings: dict):
+        self._address = address
+        self._log = log
+        self._runner_settings = runner_settings
+
+        self._context = zmq.Context()
+        self._socket = self._context.socket(zmq.DEALER)
+
+    def start(self) -> None:
+        """Метод запуска агента. Работает до получения от координатора команды stop.
+
+        """
+        self._socket.connect(self._address)
+        _send(self._socket, {"type": "ready", "host": socket.gethostname(), "pid": os.getpid()})
+        worker_pool = None
+        statistic_aggregator = StatisticAggregator()
+        statistic_aggregator.start()
+        try:
+            while True:
+                message: dict = json.loads(self._socket.recv().decode("utf-8"))
+                if message['type'] == "stop":
+                    if worker_pool is not None:
+                        worker_pool.close()
+                        worker_pool = None
+                    statistic_aggregator.stop()
+                    _send(self._socket, {"type": "stopped", "statistic": statistic_aggregator.get_summary()})
+                    break
+                if message['type'] != "run":
+                    continue
+
+                test_cases = tuple(test_case_plan_from_dict(test_case) for test_case in message['test_cases'])
+                if worker_pool is None:
+                    worker_pool = WorkerPool(self._runner_settings, self._log,
+                                             get_plan_modules(RunPlan(0, "", test_cases)),
+                                             statistic_aggregator.get_queue(), get_max_parallel(test_cases))
+                time.sleep(max(message['start_at'] - time.time(), 0))
+                self._run_iteration(message['iteration'], test_cases, worker_pool)
+        finally:
+            if worker_pool is not None:
+                worker_pool.close()
+            self._socket.close(linger=1000)
+            self._context.term()
+
+    def _run_iteration(self, iteration: int, test_cases: Tuple[TestCasePlan, ...], worker_pool: WorkerPool) -> None:
+        """Выполнение итерации с отправкой результатов тест кейсов координатору по мере их завершения.
+        Сокет используется только из основного потока агента, поэтому результаты передаются через очередь.
+
+        :param iteration: номер итерации;
+        :param test_cases: планы тест кейсов агента;
+        :param worker_pool: пул рабочих процессов агента.
+        """
+        results: queue.Queue = queue.Queue()
+        budget: int = self._runner_settings.get('runner', {}).get('max_parallel', 0) or worker_pool.get_size()
+        scheduler = Scheduler(worker_pool, budget, lambda index, result: results.put(result),
+                              self._runner_settings.get('runner', {}).get('test_case_timeout', 0))
+        iteration_info: dict = {}
+        iteration_thread = threading.Thread(target=lambda: iteration_info.update(scheduler.run_iteration(test_cases)),
+                                            daemon=True)
+        iteration_thread.start()
+
+        while iteration_thread.is_alive() or not results.empty():
+            try:
+                result = results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            _send(self._socket, {"type": "result", "iteration": iteration, "result": result})
+
+        _send(self._socket, {
+            "type": "finish",
+            "iteration": iteration,
+            "wall_time": iteration_info.get('wall_time', 0.0),
+            "critical_path": iteration_info.get('critical_path', 0.0)
+        })
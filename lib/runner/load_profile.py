@@ -0,0 +1,295 @@
+import math
+import time
+import threading
+from typing import Tuple, List, NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.log_and_statistic.log import Log
+from lib.log_and_statistic.statistic import Statistic
+
+# пауза виртуального пользователя после неудачного выполнения теста в секундах: удваивается с каждой
+# неудачей подряд до _MAX_FAILURE_PAUSE, чтобы упавший тест не нагружал сервис циклом мгновенных повторов
+_FAILURE_PAUSE = 0.1
+_MAX_FAILURE_PAUSE = 5.0
+
+
+class LoadStage(NamedTuple):
+    """Ступень профиля нагрузки: количество виртуальных пользователей и время ступени в секундах.
+
+    """
+    threads: int
+    duration: float
+
+
+def compile_load_profile(spec: dict) -> Tuple[LoadStage, ...]:
+    """Компиляция профиля нагрузки в последовательность ступеней.
+    Профиль хранится в атрибуте loadProfile таблицы TestRunConfiguration в виде json:
+        {
+            "stages": [
+                {"target": 5, "hold": 60},
+                {"target": 200, "step": 10, "interval": 30, "hold": 300},
+                {"target": 0, "step": 50, "interval": 10}
+            ]
+        }
+    target - количество виртуальных пользователей, к которому нужно прийти;
+    step - на сколько пользователей меняется нагрузка за один шаг (по умолчанию - сразу до target);
+    interval - время одного шага в секундах (по умолчанию 0);
+    hold - время удержания нагрузки target в секундах (по умолчанию 0).
+
+    :param spec: профиль нагрузки.
+
+    :return: кортеж ступеней (ступени нулевой длительности отбрасываются).
+    """
+    assert isinstance(spec, dict) and isinstance(spec.get('stages'), list) and spec['stages'], \
+        "[0010] Профиль нагрузки должен содержать непустой список 'stages'!"
+
+    stages: List[LoadStage] = []
+    current = 0
+    for stage in spec['stages']:
+        assert isinstance(stage.get('target'), int) and stage['target'] >= 0, \
+            "[0011] В ступени профиля нагрузки отсутствует корректный 'target'!"
+        target: int = stage['target']
+        step: int = stage.get('step', 0) or abs(target - current) or 1
+        interval: float = stage.get('interval', 0)
+        hold: float = stage.get('hold', 0)
+
+        for step_index in range(math.ceil(abs(target - current) / step)):
+            threads = current + (step_index + 1) * step if target > current else current - (step_index + 1) * step
+            threads = min(threads, target) if target > current else max(threads, target)
+            if interval > 0:
+                stages.append(LoadStage(threads, interval))
+        current = target
+        if hold > 0:
+            stages.append(LoadStage(target, hold))
+
+    assert stages, "[0012] Профиль нагрузки не содержит ни одной ступени ненулевой длительности!"
+
+    return tuple(stages)
+
+
+class StageStatistic:
+    """Статистика одной ступени профиля нагрузки: количество выполнений теста, ошибок и их длительности.
+    Выполнение относится к той ступени, на которой оно завершилось.
+
+    """
+    def __init__(self, index: int, stage: LoadStage):
+        self._index = index
+        self._stage = stage
+        self._lock = threading.Lock()
+        self._count = 0
+        self._errors = 0
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+        self._start_time = 0.0
+        self._end_time = 0.0
+
+    def start(self) -> None:
+        self._start_time = time.time()
+
+    def finish(self) -> None:
+        self._end_time = time.time()
+
+    def append(self, latency: float, success: bool) -> None:
+        """Добавление выполнения теста.
+
+        :param latency: длительность выполнения в секундах;
+        :param success: флаг успешного выполнения.
+        """
+        with self._lock:
+            self._count += 1
+            if not success:
+                self._errors += 1
+            self._latency_sum += latency
+            self._latency_max = max(self._latency_max, latency)
+
+    def get_summary(self) -> dict:
+        """Получение итогов ступени.
+
+        :return: словарь вида:
+                {
+                    "stage": 1,
+                    "threads": 5,
+                    "duration": 30.0,
+                    "count": 100,
+                    "errors": 0,
+                    "throughput": 3.3,
+                    "latency_avg": 0.5,
+                    "latency_max": 1.2
+                }
+                throughput - выполнений теста в секунду, latency_* - в секундах.
+        """
+        with self._lock:
+            duration = (self._end_time or time.time()) - self._start_time if self._start_time else 0.0
+            return {
+                "stage": self._index + 1,
+                "threads": self._stage.threads,
+                "duration": duration,
+                "count": self._count,
+                "errors": self._errors,
+                "throughput": self._count / duration if duration > 0 else 0.0,
+                "latency_avg": self._latency_sum / self._count if self._count else 0.0,
+                "latency_max": self._latency_max
+            }
+
+
+class VirtualUser:
+    """Виртуальный пользователь профиля нагрузки.
+    Повторяет тест, пока его не остановят; текущая итерация теста всегда доводится до конца.
+    Объект класса с тестами (и, как правило, авторизация в его конструкторе) создается в потоке пользователя,
+    поэтому запуск пользователей не задерживает ступени профиля.
+
+    """
+    def __init__(self, user_id: int, test_class: type, test: str, input_data: dict, config: dict, log: Log,
+                 profile_runner):
+        self._statistic = Statistic(test, user_id, config, log)
+
+        self._test_class_type = test_class
+        self._input_data = input_data
+        self._config = config
+        self._test_class = None
+        self._test = test
+        self._id = str(user_id)
+        self._profile_runner = profile_runner
+        self._stop_event = threading.Event()
+        self._start_time: float = 0.0
+
+    def get_statistic(self) -> Statistic:
+        return self._statistic
+
+    def get_start_time(self) -> float:
+        return self._start_time
+
+    def stop(self) -> None:
+        """Остановка пользователя после окончания текущего выполнения теста.
+
+        """
+        self._stop_event.set()
+
+    def run(self) -> None:
+        """Цикл выполнения теста виртуальным пользователем.
+        После неудачного выполнения (критической ошибки или исключения теста) пользователь делает паузу
+        (см. _FAILURE_PAUSE) и продолжает работу. Если статистика пользователя завершила его критической ошибкой
+        (например, превышен лимит ошибок), пользователь прекращает работу; teardown выполняется в любом случае.
+
+        """
+        full_test_name = self._test + "[Поток #" + self._id + "]"
+        try:
+            try:
+                self._test_class = self._test_class_type(self._input_data, self._config, self._statistic)
+                self._test_class.setup()
+            except SystemExit as e:
+                self._statistic.append_error("Тест " + full_test_name + " завершился с критической ошибкой в setup: " +
+                                             (str(e.args[0]) if e.args else repr(e)), "КРИТ")
+                return
+            except Exception as e:
+                self._statistic.append_error("Тест " + full_test_name + " завершился с исключением в setup: " +
+                                             repr(e), "КРИТ")
+                return
+            test_method = getattr(self._test_class, self._test)
+            self._start_time = time.time()
+
+            failures = 0
+            while not self._stop_event.is_set():
+                error_msg = ""
+                start_time = time.time()
+                try:
+                    test_method()
+                except SystemExit as e:
+                    error_msg = "критической ошибкой: " + (str(e.args[0]) if e.args else repr(e))
+                except Exception as e:
+                    error_msg = "исключением: " + repr(e)
+                self._profile_runner.get_current_stage_statistic().append(time.time() - start_time, not error_msg)
+                if not error_msg:
+                    failures = 0
+                    continue
+                failures += 1
+                self._statistic.append_error("Тест " + full_test_name + " завершился с " + error_msg, "КРИТ")
+                self._stop_event.wait(min(_FAILURE_PAUSE * 2 ** (failures - 1), _MAX_FAILURE_PAUSE))
+        except SystemExit:
+            # критическая ошибка статистики пользователя (ошибка уже выведена в статистику)
+            pass
+        finally:
+            if self._test_class is not None:
+                self._test_class.teardown()
+
+
+class LoadProfileRunner:
+    """Исполнитель профиля нагрузки.
+    На каждой ступени доводит количество активных виртуальных пользователей до нужного значения:
+    недостающие пользователи запускаются, лишние (последние запущенные) останавливаются.
+    Длительность ступени отсчитывается от ее начала, время запуска пользователей входит в ступень.
+
+    """
+    def __init__(self, stages: Tuple[LoadStage, ...], module_class: type, test: str, input_data: dict,
+                 config: dict, log: Log):
+        self._stages = stages
+        self._module_class = module_class
+        self._test = test
+        self._input_data = input_data
+        self._config = config
+        self._log = log
+
+        self._stage_statistics = [StageStatistic(index, stage) for index, stage in enumerate(stages)]
+        self._current_stage = 0
+
+    def get_current_stage_statistic(self) -> StageStatistic:
+        return self._stage_statistics[self._current_stage]
+
+    def run(self) -> Tuple[list, Tuple[dict, ...]]:
+        """Выполнение профиля нагрузки.
+        В конце каждой ступени проверяются завершившиеся пользователи: исключение пользователя записывается
+        в его статистику, а на следующей ступени вместо него запускается новый пользователь.
+
+        :return: список всех виртуальных пользователей и итоги ступеней (см. StageStatistic.get_summary).
+        """
+        max_threads = max([stage.threads for stage in self._stages])
+        executor = ThreadPoolExecutor(max_workers=max(max_threads, 1), thread_name_prefix="VirtualUser")
+        users: List[VirtualUser] = []
+        active_users: List[VirtualUser] = []
+        futures: dict = {}
+
+        for index, stage in enumerate(self._stages):
+            self._current_stage = index
+            self._stage_statistics[index].start()
+            stage_end_time = time.time() + stage.duration
+            while len(active_users) < stage.threads:
+                user = VirtualUser(len(users) + 1, self._module_class, self._test, self._input_data, self._config,
+                                   self._log, self)
+                users.append(user)
+                active_users.append(user)
+                futures[user] = executor.submit(user.run)
+            while len(active_users) > stage.threads:
+                active_users.pop().stop()
+            time.sleep(max(stage_end_time - time.time(), 0))
+            self._stage_statistics[index].finish()
+            for user in [user for user, future in futures.items() if future.done()]:
+                if self._check_user(user, futures.pop(user)) and user in active_users:
+                    active_users.remove(user)
+
+        for user in active_users:
+            user.stop()
+        executor.shutdown()
+        for user in list(futures):
+            self._check_user(user, futures.pop(user))
+
+        return users, tuple(stage_statistic.get_summary() for stage_statistic in self._stage_statistics)
+
+    @staticmethod
+    def _check_user(user: VirtualUser, future) -> bool:
+        """Запись исключения завершившегося виртуального пользователя в его статистику.
+
+        :param user: виртуальный пользователь;
+        :param future: завершившаяся задача пользователя в пуле потоков.
+
+        :return: True, если пользователь завершился с исключением.
+        """
+        if future.exception() is None:
+            return False
+        try:
+            user.get_statistic().append_error("Виртуальный пользователь теста завершился с исключением: " +
+                                              repr(future.exception()), "КРИТ")
+        except SystemExit:
+            # лимит ошибок статистики пользователя: пользователь уже завершен
+            pass
+
+        return True
@@ -0,0 +1,88 @@
+from typing import Tuple, NamedTuple
+
+from lib.runner.load_profile import LoadStage
+
+
+class TestPlan(NamedTuple):
+    """Скомпилированная конфигурация одного теста внутри тест кейса.
+    executor - режим запуска теста: "thread" - каждый виртуальный пользователь в отдельном потоке,
+    "asyncio" - тест-корутина, виртуальные пользователи - задачи одного event loop (threads - кол-во задач).
+    load_profile - ступени профиля нагрузки; если заданы, threads не используется (см. lib.runner.load_profile).
+
+    """
+    module: str
+    test: str
+    input_data: dict
+    threads: int
+    wait_time: int
+    executor: str = "thread"
+    load_profile: Tuple[LoadStage, ...] = ()
+
+
+class TestCasePlan(NamedTuple):
+    """Скомпилированная конфигурация тест кейса внутри конфигурации запуска.
+
+    """
+    test_case_run_config_id: int
+    test_case_id: int
+    wait_finish: bool
+    tests: Tuple[TestPlan, ...]
+
+
+class RunPlan(NamedTuple):
+    """Скомпилированный план конфигурации запуска.
+    Строится один раз и переиспользуется на каждой итерации, пока не изменится ключ key,
+    который вычисляется по атрибутам hash конфигураций тестов.
+
+    """
+    run_config_id: int
+    key: str
+    test_cases: Tuple[TestCasePlan, ...]
+
+
+def get_plan_modules(run_plan: RunPlan) -> Tuple[str, ...]:
+    """Получение списка модулей тестов, которые используются в плане запуска.
+
+    :param run_plan: план конфигурации запуска.
+
+    :return: упорядоченный список уникальных имен модулей.
+    """
+    modules = []
+    for test_case in run_plan.test_cases:
+        for test in test_case.tests:
+            if test.module not in modules:
+                modules.append(test.module)
+
+    return tuple(modules)
+
+
+def test_case_plan_to_dict(test_case_plan: TestCasePlan) -> dict:
+    """Преобразование плана тест кейса в словарь для передачи в формате json.
+
+    :param test_case_plan: план тест кейса.
+
+    :return: словарь с планом тест кейса.
+    """
+    test_case = test_case_plan._asdict()
+    test_case['tests'] = [test._asdict() for test in test_case_plan.tests]
+    for test in test_case['tests']:
+        test['load_profile'] = [list(stage) for stage in test['load_profile']]
+
+    return test_case
+
+
+def test_case_plan_from_dict(test_case: dict) -> TestCasePlan:
+    """Восстановление плана тест кейса из словаря (см. test_case_plan_to_dict).
+
+    :param test_case: словарь с планом тест кейса.
+
+    :return: план тест кейса.
+    """
+    tests = []
+    for test in test_case['tests']:
+        test = dict(test)
+        test['load_profile'] = tuple(LoadStage(*stage) for stage in test['load_profile'])
+        tests.append(TestPlan(**test))
+
+    return TestCasePlan(test_case['test_case_run_config_id'], test_case['test_case_id'], test_case['wait_finish'],
+                        tuple(tests))
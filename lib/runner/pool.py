@@ -0,0 +1,288 @@
+import os
+import time
+import queue
+import signal
+import itertools
+import threading
+import multiprocessing
+from typing import Tuple
+from multiprocessing.pool import Pool
+
+from lib.log_and_statistic.log import Log
+from lib.log_and_statistic.statistic import Statistic
+from lib.log_and_statistic import aggregator
+
+from lib.client import token_broker
+
+from lib.runner import test_case as runner_test_case
+from lib.runner.plan import TestCasePlan
+
+
+# интервал проверки рабочих процессов пула на аварийное завершение в секундах (см. WorkerPool._watch_workers)
+_WATCH_INTERVAL = 0.5
+
+# состояние рабочего процесса пула: общие настройки runner и объект Log.
+# Заполняется один раз при старте процесса и переиспользуется всеми тест кейсами,
+# которые выполняет данный процесс.
+_worker_state: dict = {}
+
+
+def _init_worker(runner_config: dict, log: Log, modules: Tuple[str, ...], event_queue, shared_tokens,
+                 started_queue) -> None:
+    """Функция инициализации рабочего процесса пула.
+    Вызывается один раз при старте процесса: сохраняет настройки и объект Log,
+    а также заранее импортирует только те модули тестов, которые используются в плане запуска.
+    Время импорта каждого модуля выводится в статистику процесса.
+    Если передана очередь событий, статистика всех тестов процесса отправляется в нее (см. StatisticAggregator).
+    Если переданы общие токены, процесс получает токены авторизации из них (см. token_broker.get_token).
+
+    :param runner_config: общие настройки runner;
+    :param log: объект класса Log;
+    :param modules: имена модулей тестов из плана запуска;
+    :param event_queue: очередь событий статистики или None;
+    :param shared_tokens: словарь и блокировка общих токенов или None;
+    :param started_queue: очередь сообщений о начале выполнения тест кейсов (см. WorkerPool._watch_workers).
+    """
+    _worker_state['runner_config'] = runner_config
+    _worker_state['log'] = log
+    _worker_state['started_queue'] = started_queue
+    if event_queue is not None:
+        aggregator.init_publisher(event_queue)
+    if shared_tokens is not None:
+        token_broker.init_shared(*shared_tokens)
+
+    worker_statistic = Statistic("Рабочий процесс", os.getpid(), runner_config, log)
+    for module, import_time in runner_test_case.preload_test_classes(modules).items():
+        worker_statistic.append_info("Модуль тестов " + module + " загружен за " +
+                                     str(round(import_time * 1000)) + " мс", "ИМПОРТ")
+
+
+def _run_test_case(task_id: int, test_case_plan: TestCasePlan) -> dict:
+    """Целевая функция выполнения тест кейса в рабочем процессе пула.
+    multiprocessing.Pool перехватывает только Exception: SystemExit (критическая ошибка или превышение лимита
+    ошибок Statistic вне потоков тестов) завершил бы рабочий процесс, и результат тест кейса никогда не пришел бы.
+    Поэтому любое исключение, не являющееся Exception, пробрасывается в родительский процесс как RuntimeError.
+
+    :param task_id: идентификатор задачи пула (см. WorkerPool.submit);
+    :param test_case_plan: скомпилированный план тест кейса.
+
+    :return: результат выполнения тест кейса вида:
+            {
+                "test_case_run_config_id": 0,
+                "pid": 0,
+                "duration": 0.0,
+                "tests": (
+                    {
+                        "module": "Common",
+                        "test": "directories_comparator",
+                        "errors": 0,
+                        "warns": 0,
+                        "stages": (),
+                        "connections": {"opened": 0, "reused": 0}
+                    },
+                    ...
+                )
+            }
+    """
+    _worker_state['started_queue'].put((task_id, os.getpid()))
+    # события статистики тест кейса помечаются задачей (см. StatisticAggregator.commit_task)
+    aggregator.set_task(task_id)
+    start_time = time.time()
+    try:
+        test_case = runner_test_case.TestCase(test_case_plan.tests, _worker_state['runner_config'],
+                                              _worker_state['log'], test_case_plan.test_case_run_config_id)
+        test_case.setup()
+        try:
+            test_case.run()
+        finally:
+            test_case.teardown()
+    except Exception:
+        raise
+    except BaseException as e:
+        raise RuntimeError("Тест кейс завершился аварийно: " + repr(e)) from None
+    finally:
+        aggregator.set_task(None)
+
+    return {
+        "test_case_run_config_id": test_case_plan.test_case_run_config_id,
+        "pid": os.getpid(),
+        "duration": time.time() - start_time,
+        "tests": test_case.get_results()
+    }
+
+
+class _TrackingPool(Pool):
+    """Пул процессов, сообщающий о каждом созданном рабочем процессе через очередь created_processes.
+    Процесс, убитый сразу после старта, пул заменяет раньше, чем его можно увидеть в списке процессов пула,
+    поэтому процессы запоминаются в момент создания (см. WorkerPool._watch_workers).
+
+    """
+    def __init__(self, *args, **kwargs):
+        self.created_processes = queue.SimpleQueue()
+        super().__init__(*args, **kwargs)
+
+    def Process(self, ctx, *args, **kwargs):
+        process = super().Process(ctx, *args, **kwargs)
+        self.created_processes.put(process)
+        return process
+
+
+class WorkerPool:
+    """Пул постоянных рабочих процессов для выполнения тест кейсов.
+    Процессы создаются один раз и получают планы тест кейсов через очередь пула,
+    поэтому импорты модулей тестов, логгеры и клиенты не пересоздаются на каждой итерации.
+    При старте процесс загружает только модули тестов из modules, остальные загружаются по требованию.
+    event_queue - очередь StatisticAggregator, в которую процессы отправляют события статистики.
+    Если рабочий процесс завершился аварийно во время выполнения тест кейса (например, был убит), для этого
+    тест кейса вызывается error_callback, чтобы ожидающий его планировщик не завис (см. _watch_workers).
+    Зависший тест кейс снимается через terminate_task: его процесс завершается, и пул создает новый.
+
+    Настройки берутся из блока "runner" общих настроек:
+        "pool_size" - количество рабочих процессов (по умолчанию default_size - как правило, максимальное
+                      количество одновременно выполняемых тест кейсов плана, см. scheduler.get_max_parallel,
+                      чтобы тест кейсы без waitFinish, как и раньше, выполнялись одновременно все);
+        "max_tasks_per_child" - количество тест кейсов, после которого процесс пересоздается
+                                (по умолчанию 0 - процесс не пересоздается);
+        "share_tokens" - общие для всех процессов токены авторизации (см. token_broker.get_token),
+                         хранятся в процессе multiprocessing.Manager (по умолчанию false).
+    """
+    def __init__(self, runner_config: dict, log: Log, modules: Tuple[str, ...] = (), event_queue=None,
+                 default_size: int = 0):
+        pool_settings: dict = runner_config.get('runner', {})
+        self._size: int = pool_settings.get('pool_size', 0) or default_size or os.cpu_count() or 1
+        max_tasks_per_child: int = pool_settings.get('max_tasks_per_child', 0) or None
+
+        self._manager = None
+        shared_tokens = None
+        if pool_settings.get('share_tokens', False):
+            self._manager = multiprocessing.Manager()
+            shared_tokens = (self._manager.dict(), self._manager.Lock())
+
+        # выполняемые задачи: идентификатор -> error_callback; тест кейсы процессов пула: pid -> идентификатор задачи
+        self._task_ids = itertools.count()
+        self._tasks: dict = {}
+        self._running: dict = {}
+        self._tasks_lock = threading.Lock()
+        # были ли задачи, результат которых пул не получит никогда (процесс убит): тогда close не ждет пул
+        self._abandoned = False
+        # SimpleQueue пишет сообщение сразу, без фонового потока, поэтому оно не теряется при гибели процесса
+        self._started_queue = multiprocessing.SimpleQueue()
+        self._pool = _TrackingPool(self._size, _init_worker,
+                                   (runner_config, log, modules, event_queue, shared_tokens, self._started_queue),
+                                   max_tasks_per_child)
+        self._closed = threading.Event()
+        self._watcher = threading.Thread(target=self._watch_workers, daemon=True)
+        self._watcher.start()
+
+    def get_size(self) -> int:
+        """Метод-геттер количества рабочих процессов.
+
+        :return: размер пула.
+        """
+        return self._size
+
+    def submit(self, test_case_plan: TestCasePlan, callback=None, error_callback=None) -> int:
+        """Отправка тест кейса на выполнение в пул.
+
+        :param test_case_plan: скомпилированный план тест кейса;
+        :param callback: функция, вызываемая с результатом тест кейса;
+        :param error_callback: функция, вызываемая с исключением, если тест кейс завершился аварийно.
+
+        :return: идентификатор задачи (см. terminate_task).
+        """
+        task_id = next(self._task_ids)
+        with self._tasks_lock:
+            self._tasks[task_id] = error_callback
+
+        def on_result(result) -> None:
+            with self._tasks_lock:
+                if self._tasks.pop(task_id, False) is False:
+                    return
+            if callback is not None:
+                callback(result)
+
+        def on_error(exception: BaseException) -> None:
+            with self._tasks_lock:
+                if self._tasks.pop(task_id, False) is False:
+                    return
+            if error_callback is not None:
+                error_callback(exception)
+
+        self._pool.apply_async(_run_test_case, (task_id, test_case_plan), callback=on_result, error_callback=on_error)
+
+        return task_id
+
+    def terminate_task(self, task_id: int) -> None:
+        """Снятие зависшего тест кейса: его рабочий процесс завершается (пул создает вместо него новый),
+        а функции обратного вызова задачи больше не вызываются.
+        Если тест кейс еще не начал выполняться, он просто не будет учтен.
+
+        :param task_id: идентификатор задачи (см. submit).
+        """
+        with self._tasks_lock:
+            if self._tasks.pop(task_id, False) is False:
+                return
+            self._abandoned = True
+            self._read_started()
+            pids = [pid for pid, running_task_id in self._running.items() if running_task_id == task_id]
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                # процесс уже завершился
+                pass
+
+    def close(self) -> None:
+        """Завершение работы пула с ожиданием окончания всех отправленных тест кейсов.
+        Если результат какой-либо задачи пул уже не получит (процесс тест кейса убит, см. terminate_task
+        и _watch_workers), пул завершается без ожидания: join ждал бы такую задачу бесконечно.
+
+        """
+        with self._tasks_lock:
+            abandoned = self._abandoned
+        if abandoned:
+            self._pool.terminate()
+        else:
+            self._pool.close()
+            self._pool.join()
+        self._closed.set()
+        self._watcher.join()
+        self._started_queue.close()
+        if self._manager is not None:
+            self._manager.shutdown()
+
+    def _watch_workers(self) -> None:
+        """Отслеживание аварийного завершения рабочих процессов.
+        Рабочий процесс сообщает о начале тест кейса через started_queue. Если процесс завершился с ненулевым
+        кодом, пока его тест кейс выполнялся, результат не придет никогда: вызывается error_callback тест кейса.
+        Процессы, завершенные с кодом 0 (max_tasks_per_child), не считаются аварийными.
+
+        """
+        processes = []
+        while not self._closed.wait(_WATCH_INTERVAL):
+            while not self._pool.created_processes.empty():
+                processes.append(self._pool.created_processes.get())
+            # сообщения о начале читаются до проверки процессов: сообщение погибшего процесса уже в очереди
+            with self._tasks_lock:
+                self._read_started()
+            for process in list(processes):
+                if process.exitcode is None:
+                    continue
+                processes.remove(process)
+                with self._tasks_lock:
+                    task_id = self._running.pop(process.pid, None)
+                    if process.exitcode == 0 or task_id is None:
+                        continue
+                    error_callback = self._tasks.pop(task_id, False)
+                    self._abandoned = True
+                if error_callback is not False and error_callback is not None:
+                    error_callback(RuntimeError("Рабочий процесс " + str(process.pid) + " завершился аварийно (код " +
+                                                str(process.exitcode) + ")"))
+
+    def _read_started(self) -> None:
+        """Чтение сообщений о начале выполнения тест кейсов в карту _running (вызывается под _tasks_lock).
+
+        """
+        while not self._started_queue.empty():
+            task_id, pid = self._started_queue.get()
+            self._running[pid] = task_id
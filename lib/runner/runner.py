@@ -1,72 +1,259 @@
-from multiprocessing import Process
+import time
+import queue
+import threading
 
 from lib.log_and_statistic.log import Log
+from lib.log_and_statistic.statistic import Statistic
+from lib.log_and_statistic.aggregator import StatisticAggregator, create_summary, format_summary, write_summary
 
 from lib.runner.db import DataBase
-from lib.runner.test_case import TestCase
-
-
-def run_test_case(tests_config: tuple, runner_config: dict, log: Log) -> None:
-    """Целевая функция при запуске дочернего процесса.
-    Тест кейс запускается в отдельном дочернем процессе.
-
-    :param tests_config: список настроек теста вида:
-    [
-        {
-            "module": "QML",
-            "test": "autoplacemnt",
-            "input_data": {},
-            "threads": 1,
-            "wait_time": 1
-        },
-        ...
-        ...
-    ]
-
-    :param runner_config: общие настройки runner;
-    :param log: объект класса Log.
+from lib.runner.plan import RunPlan, get_plan_modules
+from lib.runner.pool import WorkerPool
+from lib.runner.scheduler import Scheduler, get_max_parallel
+
+
+# файл сводки статистики запуска с процентилями времени ws методов в папке логов (см. write_summary)
+STATISTIC_FILE = "statistic.json"
+
+
+def _create_run_statistic() -> dict:
+    """Создание пустой накопленной статистики запуска, которая сохраняется в контрольной точке.
+
+    :return: словарь вида:
+            {
+                "iterations": 0,
+                "test_cases": 0,
+                "crashed": 0,
+                "wall_time": 0.0,
+                "tests": {
+                    "Common.directories_comparator": {"runs": 0, "errors": 0, "warns": 0, "opened": 0, "reused": 0},
+                    ...
+                },
+                "summary": {...}
+            }
+            opened/reused - открытые и переиспользованные http соединения;
+            summary - сводка статистики рабочих процессов тест кейсов до контрольной точки
+            (см. StatisticAggregator.get_committed_summary), поэтому при продолжении запуска события
+            тест кейсов, выполнявшихся после контрольной точки, не учитываются повторно.
     """
-    test_case = TestCase(tests_config, runner_config, log)
-    test_case.setup()
-    test_case.run()
-    test_case.teardown()
+    return {
+        "iterations": 0,
+        "test_cases": 0,
+        "crashed": 0,
+        "wall_time": 0.0,
+        "tests": {},
+        "summary": create_summary()
+    }
+
+
+def _append_test_case_result(run_statistic: dict, result: dict) -> None:
+    """Добавление результата тест кейса в накопленную статистику запуска.
+
+    :param run_statistic: накопленная статистика запуска (см. _create_run_statistic);
+    :param result: результат тест кейса (см. lib.runner.pool._run_test_case) или None для аварийно завершенного.
+    """
+    run_statistic['test_cases'] += 1
+    if result is None:
+        run_statistic['crashed'] += 1
+        return
+    for test_result in result['tests']:
+        test_statistic = run_statistic['tests'].setdefault(test_result['module'] + "." + test_result['test'],
+                                                           {"runs": 0, "errors": 0, "warns": 0, "opened": 0,
+                                                            "reused": 0})
+        test_statistic['runs'] += 1
+        test_statistic['errors'] += test_result['errors']
+        test_statistic['warns'] += test_result['warns']
+        test_statistic['opened'] += test_result['connections']['opened']
+        test_statistic['reused'] += test_result['connections']['reused']
 
 
 class Runner:
     """Механизм запуска конфигурации.
+    Запуск ограничивается количеством итераций или длительностью (duration, в секундах). В процессе запуска
+    в БД периодически сохраняется контрольная точка (см. DataBase.save_checkpoint), по которой прерванный запуск
+    можно продолжить (resume) с первого незавершенного тест кейса с сохранением накопленной статистики,
+    включая сводку статистики рабочих процессов.
 
+    Настройки берутся из блока "runner" общих настроек:
+        "checkpoint_interval" - минимальный интервал между сохранениями контрольной точки
+                                внутри итерации в секундах (по умолчанию 60);
+        "test_case_timeout" - максимальное время выполнения тест кейса в секундах, после которого он считается
+                              аварийно завершенным (по умолчанию 0 - без ограничения, см. Scheduler).
     """
-    def __init__(self, run_config_id: int, iterations: int, data_base: DataBase, log: Log, runner_settings: dict):
+    def __init__(self, run_config_id: int, iterations: int, data_base: DataBase, log: Log, runner_settings: dict,
+                 duration: float = 0, resume: bool = False):
         self._run_config_id = run_config_id
         self._iterations = iterations
+        self._duration = duration
+        self._resume = resume
         self._data_base = data_base
         self._log = log
         self._runner_settings = runner_settings
+        self._checkpoint_interval: float = runner_settings.get('runner', {}).get('checkpoint_interval', 60)
+        # результаты тест кейсов, передаваемые планировщиком в основной поток: (индекс, результат)
+        self._results: queue.Queue = queue.Queue()
 
-        self._test_cases: tuple = data_base.get_run_config_test_cases(run_config_id)
+        self._run_plan: RunPlan = data_base.get_run_plan(run_config_id)
 
     def start(self) -> None:
         """Метод запуска конфигурации.
+        План конфигурации запуска строится один раз и перестраивается только при изменении
+        его ключа (изменении конфигурации запуска или входных данных тестов в БД).
+        Тест кейсы выполняются в пуле постоянных рабочих процессов (см. WorkerPool) планировщиком
+        (см. Scheduler) с учетом waitFinish. Количество одновременно выполняемых тест кейсов ограничено
+        настройкой "max_parallel" блока "runner" (по умолчанию - размер пула, который по умолчанию равен
+        максимальному количеству одновременно выполняемых тест кейсов плана).
+        При запуске по длительности после истечения времени запуска не начинаются ни новые итерации,
+        ни новые тест кейсы текущей итерации (уже запущенные тест кейсы доводятся до конца).
+        Статистика тестов всех рабочих процессов собирается в общую сводку (см. StatisticAggregator),
+        которая выводится по окончании запуска и записывается в файл STATISTIC_FILE.
+
+        """
+        runner_statistic = Statistic("Runner", 1, self._runner_settings, self._log)
+        checkpoint = self._get_start_checkpoint(runner_statistic)
+        statistic_aggregator = StatisticAggregator()
+        # сводка продолженного запуска начинается со сводки прерванного
+        statistic_aggregator.merge(checkpoint['statistic'].get('summary', create_summary()))
+        statistic_aggregator.start()
+        self._save_checkpoint(checkpoint, statistic_aggregator)
+        worker_pool = WorkerPool(self._runner_settings, self._log, get_plan_modules(self._run_plan),
+                                 statistic_aggregator.get_queue(), get_max_parallel(self._run_plan.test_cases))
+        budget: int = self._runner_settings.get('runner', {}).get('max_parallel', 0) or worker_pool.get_size()
+        scheduler = Scheduler(worker_pool, budget, lambda index, result: self._results.put((index, result)),
+                              self._runner_settings.get('runner', {}).get('test_case_timeout', 0))
+        try:
+            while (checkpoint['iterations'] and checkpoint['iteration'] < checkpoint['iterations']) or \
+                    (checkpoint['deadline'] and time.time() < checkpoint['deadline']):
+                self._run_plan = self._data_base.get_run_plan(self._run_config_id)
+                checkpoint['plan_key'] = self._run_plan.key
+                iteration_info: dict = self._run_iteration(scheduler, checkpoint, statistic_aggregator)
+                runner_statistic.append_success("Итерация #" + str(checkpoint['iteration'] + 1) +
+                                                (" прервана по истечении времени запуска (не запущено тест кейсов: " +
+                                                 str(iteration_info['skipped']) + "). "
+                                                 if iteration_info['skipped'] else " завершена. ") +
+                                                "Время: " + str(round(iteration_info['wall_time'], 3)) +
+                                                " с, критический путь: " +
+                                                str(round(iteration_info['critical_path'], 3)) + " с",
+                                                "ИТЕРАЦИЯ")
+                for index, result in enumerate(iteration_info['results']):
+                    if result is None:
+                        runner_statistic.append_error("Тест кейс #" + str(iteration_info['offset'] + index + 1) +
+                                                      " завершился аварийно!", "ТЕСТ_КЕЙС")
+
+                if not iteration_info['skipped']:
+                    checkpoint['statistic']['iterations'] += 1
+                checkpoint['statistic']['wall_time'] += iteration_info['wall_time']
+                checkpoint['iteration'] += 1
+                checkpoint['test_case_index'] = 0
+                self._save_checkpoint(checkpoint, statistic_aggregator)
+        finally:
+            worker_pool.close()
+            statistic_aggregator.stop()
+
+        self._show_run_statistic(runner_statistic, checkpoint['statistic'])
+        summary = statistic_aggregator.get_summary()
+        for line in format_summary(summary):
+            runner_statistic.append_success(line, "СТАТИСТИКА")
+        write_summary(summary, self._log.get_directory() + "/" + STATISTIC_FILE)
+        self._data_base.delete_checkpoint(self._run_config_id)
+
+    def _get_start_checkpoint(self, runner_statistic: Statistic) -> dict:
+        """Получение контрольной точки, с которой начинается запуск.
+        При продолжении запуска (resume) контрольная точка загружается из БД; если конфигурация запуска
+        с тех пор изменилась, прерванная итерация начинается сначала.
+
+        :param runner_statistic: статистика Runner.
+
+        :return: контрольная точка (см. DataBase.get_checkpoint).
+        """
+        if not self._resume:
+            return {
+                "plan_key": self._run_plan.key,
+                "iterations": 0 if self._duration else self._iterations,
+                "deadline": time.time() + self._duration if self._duration else 0.0,
+                "iteration": 0,
+                "test_case_index": 0,
+                "statistic": _create_run_statistic()
+            }
+
+        checkpoint: dict = self._data_base.get_checkpoint(self._run_config_id)
+        if checkpoint['plan_key'] != self._run_plan.key and checkpoint['test_case_index']:
+            runner_statistic.append_warn("Конфигурация запуска изменилась после сохранения контрольной точки, "
+                                         "итерация #" + str(checkpoint['iteration'] + 1) + " начинается сначала",
+                                         "КОНТРОЛЬНАЯ_ТОЧКА")
+            checkpoint['test_case_index'] = 0
+        runner_statistic.append_success("Продолжение запуска с итерации #" + str(checkpoint['iteration'] + 1) +
+                                        ", тест кейса #" + str(checkpoint['test_case_index'] + 1), "КОНТРОЛЬНАЯ_ТОЧКА")
+
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: dict, statistic_aggregator: StatisticAggregator) -> None:
+        """Сохранение контрольной точки вместе со сводкой статистики рабочих процессов тест кейсов до нее.
+
+        :param checkpoint: контрольная точка;
+        :param statistic_aggregator: сборщик статистики рабочих процессов.
+        """
+        checkpoint['statistic']['summary'] = statistic_aggregator.get_committed_summary()
+        self._data_base.save_checkpoint(self._run_config_id, checkpoint)
+
+    def _run_iteration(self, scheduler: Scheduler, checkpoint: dict, statistic_aggregator: StatisticAggregator) -> dict:
+        """Выполнение итерации начиная с тест кейса checkpoint['test_case_index'].
+        Итерация выполняется планировщиком в отдельном потоке, а основной поток по мере завершения тест кейсов
+        продвигает контрольную точку до первого незавершенного тест кейса и не чаще checkpoint_interval сохраняет ее
+        в БД (соединение с БД используется только из основного потока).
+        В накопленную статистику и сводку контрольной точки (см. StatisticAggregator.commit_task) попадают только
+        тест кейсы до контрольной точки, поэтому при продолжении запуска ни один тест кейс не учитывается дважды.
+        При запуске по длительности тест кейсы не запускаются после checkpoint['deadline'].
+
+        :param scheduler: планировщик тест кейсов;
+        :param checkpoint: контрольная точка, изменяется по ходу итерации;
+        :param statistic_aggregator: сборщик статистики рабочих процессов.
+
+        :return: информация об итерации (см. Scheduler.run_iteration), дополненная полем "offset" -
+                 индексом первого выполненного в итерации тест кейса.
+        """
+        offset: int = checkpoint['test_case_index']
+        test_cases = self._run_plan.test_cases[offset:]
+        iteration_info: dict = {}
+        iteration_thread = threading.Thread(target=lambda: iteration_info.update(
+            scheduler.run_iteration(test_cases, checkpoint['deadline'])), daemon=True)
+        iteration_thread.start()
+
+        finished: dict = {}
+        last_save_time = time.time()
+        while iteration_thread.is_alive() or not self._results.empty():
+            try:
+                index, result = self._results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            finished[offset + index] = (scheduler.get_task_id(index), result)
+            while checkpoint['test_case_index'] in finished:
+                task_id, result = finished.pop(checkpoint['test_case_index'])
+                _append_test_case_result(checkpoint['statistic'], result)
+                statistic_aggregator.commit_task(task_id)
+                checkpoint['test_case_index'] += 1
+            if time.time() - last_save_time >= self._checkpoint_interval:
+                self._save_checkpoint(checkpoint, statistic_aggregator)
+                last_save_time = time.time()
+
+        iteration_info['offset'] = offset
+
+        return iteration_info
+
+    @staticmethod
+    def _show_run_statistic(runner_statistic: Statistic, run_statistic: dict) -> None:
+        """Вывод накопленной статистики запуска (с учетом продолженных запусков).
 
+        :param runner_statistic: статистика Runner;
+        :param run_statistic: накопленная статистика запуска (см. _create_run_statistic).
         """
-        for iteration in range(self._iterations):
-            for test_case in self._test_cases:
-                tests_config = []
-                tests_id = self._data_base.get_test_case_tests(test_case['test_case_id'])
-                tests_configs_info = self._data_base.get_tests_configs_info(test_case['test_case_run_config_id'])
-                for index, test_id in enumerate(tests_id):
-                    test_name: str = self._data_base.get_test_name(test_id)
-                    module_name: str = self._data_base.get_module_name(self._data_base.get_module_id(test_id))
-                    input_data: dict = self._data_base.get_test_config(test_id, tests_configs_info[index]['id'])
-                    tests_config.append({
-                        "module": module_name,
-                        "test": test_name,
-                        "input_data": input_data,
-                        "threads": tests_configs_info[index]['threads_count'],
-                        "wait_time": tests_configs_info[index]['wait_time']
-                    })
-                tuple(tests_config)
-                test_case_process = Process(target=run_test_case, args=(tests_config, self._runner_settings, self._log))
-                test_case_process.start()
-                if test_case['wait_finish']:
-                    test_case_process.join()
+        runner_statistic.append_success("Выполнено итераций: " + str(run_statistic['iterations']) +
+                                        ", тест кейсов: " + str(run_statistic['test_cases']) +
+                                        ", аварийно завершено: " + str(run_statistic['crashed']) +
+                                        ". Время: " + str(round(run_statistic['wall_time'], 3)) + " с", "ИТОГ")
+        for test_name, test_statistic in run_statistic['tests'].items():
+            runner_statistic.append_success("Тест " + test_name + ": запусков " + str(test_statistic['runs']) +
+                                            ", ошибок " + str(test_statistic['errors']) +
+                                            ", предупреждений " + str(test_statistic['warns']) +
+                                            ", http соединений открыто " + str(test_statistic['opened']) +
+                                            ", переиспользовано " + str(test_statistic['reused']), "ИТОГ")
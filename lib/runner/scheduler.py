@@ -0,0 +1,173 @@
+import time
+import threading
+from typing import Tuple, List
+
+from lib.runner.plan import TestCasePlan
+from lib.runner.pool import WorkerPool
+
+
+def build_dependencies(test_cases: Tuple[TestCasePlan, ...]) -> Tuple[Tuple[int, ...], ...]:
+    """Построение графа зависимостей (DAG) тест кейсов.
+    Тест кейс с waitFinish является барьером: все следующие за ним тест кейсы
+    запускаются только после его завершения. Тест кейсы между барьерами независимы
+    и могут выполняться параллельно.
+
+    :param test_cases: упорядоченный список тест кейсов.
+
+    :return: для каждого тест кейса - кортеж индексов тест кейсов, от которых он зависит.
+    """
+    dependencies = []
+    last_barrier = -1
+    for index, test_case in enumerate(test_cases):
+        dependencies.append((last_barrier,) if last_barrier != -1 else ())
+        if test_case.wait_finish:
+            last_barrier = index
+
+    return tuple(dependencies)
+
+
+def get_max_parallel(test_cases: Tuple[TestCasePlan, ...]) -> int:
+    """Получение максимального количества тест кейсов, которые могут выполняться одновременно.
+    Тест кейсы после очередного барьера waitFinish (включая следующий барьер) зависят только от него,
+    поэтому выполняются одновременно. Это же количество одновременно выполнялось, когда каждый тест кейс
+    запускался в отдельном процессе.
+
+    :param test_cases: упорядоченный список тест кейсов.
+
+    :return: ширина самой широкой группы тест кейсов между барьерами (0 - если тест кейсов нет).
+    """
+    groups: dict = {}
+    for dependencies in build_dependencies(test_cases):
+        groups[dependencies] = groups.get(dependencies, 0) + 1
+
+    return max(groups.values(), default=0)
+
+
+class Scheduler:
+    """Планировщик тест кейсов одной итерации.
+    Запускает тест кейсы в пуле рабочих процессов с учетом зависимостей (см. build_dependencies),
+    ограничивая количество одновременно выполняемых тест кейсов бюджетом budget.
+    Итерация завершается только после окончания всех тест кейсов.
+    Если задан on_result, он вызывается с индексом и результатом каждого тест кейса сразу по его завершении
+    (из служебного потока пула).
+    Если задан timeout, тест кейс, не завершившийся за timeout секунд, считается аварийно завершенным
+    (результат None): его рабочий процесс завершается (см. WorkerPool.terminate_task), и итерация
+    продолжается без него.
+
+    """
+    def __init__(self, worker_pool: WorkerPool, budget: int, on_result=None, timeout: float = 0):
+        self._worker_pool = worker_pool
+        self._budget = budget
+        self._on_result = on_result
+        self._timeout = timeout
+
+        self._condition = threading.Condition()
+        self._finished: dict = {}
+        self._results: dict = {}
+        # идентификаторы задач пула запущенных тест кейсов: индекс тест кейса -> идентификатор задачи
+        self._task_ids: dict = {}
+
+    def run_iteration(self, test_cases: Tuple[TestCasePlan, ...], deadline: float = 0.0) -> dict:
+        """Выполнение одной итерации.
+        Если задан deadline, после него новые тест кейсы не запускаются: итерация дожидается уже запущенных
+        тест кейсов и завершается.
+
+        :param test_cases: упорядоченный список тест кейсов;
+        :param deadline: время (unix time), после которого тест кейсы не запускаются (0 - без ограничения).
+
+        :return: информация об итерации вида:
+                {
+                    "wall_time": 0.0,
+                    "critical_path": 0.0,
+                    "results": (...),
+                    "skipped": 0
+                }
+                wall_time - реальное время выполнения итерации (сек.);
+                critical_path - длина критического пути графа по фактическим длительностям тест кейсов (сек.);
+                results - результаты запущенных тест кейсов в порядке их следования (None для аварийно завершенных);
+                skipped - количество тест кейсов в конце итерации, не запущенных из-за deadline.
+        """
+        dependencies = build_dependencies(test_cases)
+        self._finished = {}
+        self._results = {}
+        self._task_ids = {}
+        start_times: List[float] = [0.0] * len(test_cases)
+        running = 0
+        start_iteration_time = time.time()
+
+        for index, test_case in enumerate(test_cases):
+            self._wait(lambda: all(dep in self._finished for dep in dependencies[index]) and
+                       running - len(self._finished) < self._budget, start_times[:running])
+            if deadline and time.time() >= deadline:
+                break
+            start_times[index] = time.time()
+            running += 1
+            # идентификатор задачи регистрируется до вызова обратного вызова результата (см. get_task_id)
+            with self._condition:
+                self._task_ids[index] = self._worker_pool.submit(test_case, self._get_callback(index),
+                                                                 self._get_callback(index))
+
+        self._wait(lambda: len(self._finished) == running, start_times[:running])
+
+        critical_path = [0.0] * running
+        for index in range(running):
+            duration = self._finished[index] - start_times[index]
+            critical_path[index] = duration + max([critical_path[dep] for dep in dependencies[index]], default=0.0)
+
+        return {
+            "wall_time": time.time() - start_iteration_time,
+            "critical_path": max(critical_path, default=0.0),
+            "results": tuple(self._results.get(index) for index in range(running)),
+            "skipped": len(test_cases) - running
+        }
+
+    def get_task_id(self, index: int) -> int:
+        """Получение идентификатора задачи пула тест кейса текущей (последней) итерации.
+        Для тест кейса, результат которого уже передан в on_result, идентификатор всегда известен.
+
+        :param index: индекс тест кейса в итерации.
+
+        :return: идентификатор задачи пула (см. WorkerPool.submit).
+        """
+        with self._condition:
+            return self._task_ids[index]
+
+    def _wait(self, predicate, start_times: List[float]) -> None:
+        """Ожидание условия с завершением по таймауту тест кейсов, выполняющихся дольше timeout.
+
+        :param predicate: условие (проверяется под блокировкой);
+        :param start_times: моменты запуска отправленных в пул тест кейсов.
+        """
+        with self._condition:
+            while not self._condition.wait_for(predicate, 1.0 if self._timeout else None):
+                for index, start_time in enumerate(start_times):
+                    if index not in self._finished and time.time() - start_time > self._timeout:
+                        self._worker_pool.terminate_task(self._task_ids[index])
+                        self._finish(index, None)
+
+    def _finish(self, index: int, result) -> None:
+        """Регистрация завершения тест кейса (вызывается под блокировкой).
+
+        :param index: индекс тест кейса в итерации;
+        :param result: результат тест кейса или None для аварийно завершенного.
+        """
+        self._finished[index] = time.time()
+        self._results[index] = result
+        if self._on_result is not None:
+            self._on_result(index, result)
+        self._condition.notify_all()
+
+    def _get_callback(self, index: int):
+        """Получение функции обратного вызова завершения тест кейса.
+
+        :param index: индекс тест кейса в итерации.
+
+        :return: функция обратного вызова.
+        """
+        def callback(result) -> None:
+            with self._condition:
+                # результат уже мог быть зарегистрирован как аварийный по таймауту
+                if index not in self._finished:
+                    self._finish(index, result if isinstance(result, dict) else None)
+
+        return callback
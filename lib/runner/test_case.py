@@ -1,44 +1,90 @@
 import time
+import asyncio
+import inspect
+import importlib
 import threading
+from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
 
 from lib.log_and_statistic.log import Log
 from lib.log_and_statistic.statistic import Statistic
 
+from lib.client import arrival
+from lib.client import transport
 
-from tests.test_DB import TestDB
-from tests.test_Web import TestWeb
-from tests.test_QML import TestQML
-from tests.test_PTZ import TestPTZ
-from tests.test_Media import TestMedia
-from tests.test_Users import TestUsers
-from tests.test_Server import TestServer
-from tests.test_Ewriter import TestEwriter
-from tests.test_Analytics import TestAnalytics
-from tests.test_Common import TestCommon
-
+from lib.runner.plan import TestPlan
+from lib.runner.load_profile import LoadProfileRunner
 
+# модуль тестов -> (py-модуль, имя класса с тестами).
+# Классы импортируются лениво, только для модулей, которые реально используются в плане запуска.
 test_classes = {
-    "Server": TestServer,
-    "Analytics": TestAnalytics,
-    "QML": TestQML,
-    "PTZ": TestPTZ,
-    "DB": TestDB,
-    "Users": TestUsers,
-    "Ewriter": TestEwriter,
-    "Web": TestWeb,
-    "Media": TestMedia,
-    "Common": TestCommon
+    "Server": ("tests.test_Server", "TestServer"),
+    "Analytics": ("tests.test_Analytics", "TestAnalytics"),
+    "QML": ("tests.test_QML", "TestQML"),
+    "PTZ": ("tests.test_PTZ", "TestPTZ"),
+    "DB": ("tests.test_DB", "TestDB"),
+    "Users": ("tests.test_Users", "TestUsers"),
+    "Ewriter": ("tests.test_Ewriter", "TestEwriter"),
+    "Web": ("tests.test_Web", "TestWeb"),
+    "Media": ("tests.test_Media", "TestMedia"),
+    "Common": ("tests.test_Common", "TestCommon")
 }
 
+# кэш загруженных в текущем процессе классов тестов и время их импорта (сек.)
+_loaded_test_classes: dict = {}
+_import_times: dict = {}
+
+
+def get_test_class(module: str) -> type:
+    """Получение класса с тестами по имени модуля тестов.
+    При первом обращении py-модуль импортируется через importlib, класс кэшируется в рамках процесса.
+
+    :param module: имя модуля тестов (Server, Common, ...).
+
+    :return: класс с тестами.
+    """
+    test_class = _loaded_test_classes.get(module)
+    if test_class is not None:
+        return test_class
+
+    assert module in test_classes, "Модуль тестов " + module + " не зарегистрирован!"
+    py_module_name, class_name = test_classes[module]
+    start_time = time.time()
+    py_module = importlib.import_module(py_module_name)
+    _import_times[module] = time.time() - start_time
+
+    test_class = getattr(py_module, class_name)
+    _loaded_test_classes[module] = test_class
+
+    return test_class
+
+
+def preload_test_classes(modules: Tuple[str, ...]) -> dict:
+    """Предварительная загрузка классов тестов для указанных модулей.
+
+    :param modules: список имен модулей тестов.
+
+    :return: словарь вида {имя модуля: время импорта в сек.}.
+    """
+    for module in modules:
+        get_test_class(module)
+
+    return {module: _import_times.get(module, 0.0) for module in modules}
+
 
 class TestCase:
     """Класс тест-кейса для запуска тестов внутри него
+    test_case_run_config_id - id тест кейса в конфигурации запуска, разделяет расписания ws.rate
+    одинаковых тестов разных тест кейсов (см. lib.client.arrival.get_arrival_scheduler).
 
     """
-    def __init__(self, tests_config: tuple, runner_config: dict, log: Log):
-        self._tests_config: tuple = tests_config
+    def __init__(self, tests_config: Tuple[TestPlan, ...], runner_config: dict, log: Log,
+                 test_case_run_config_id: int = 0):
+        self._tests_config: Tuple[TestPlan, ...] = tests_config
+        self._test_case_run_config_id = test_case_run_config_id
         self._runner_config = runner_config
         self._log = log
+        self._results: list = []
 
     def setup(self):
         """Функция будет вызываться перед запуском каждого тест кейса
@@ -54,48 +100,186 @@ class TestCase:
         """
         return True
 
+    def get_results(self) -> tuple:
+        """Метод-геттер результатов выполненных тестов.
+
+        :return: кортеж результатов вида:
+                (
+                    {
+                        "module": "Common",
+                        "test": "directories_comparator",
+                        "errors": 0,
+                        "warns": 0,
+                        "stages": (),
+                        "connections": {"opened": 0, "reused": 0}
+                    },
+                    ...
+                )
+                stages - итоги ступеней профиля нагрузки (см. lib.runner.load_profile.StageStatistic.get_summary);
+                connections - http соединения теста: открытые и переиспользованные
+                              (см. transport.get_connection_statistic).
+        """
+        return tuple(self._results)
+
     def run(self):
         """Запуск тест кейса.
+        Потоки тестов берутся из пула потоков, общего для всех тестов тест кейса.
+        Все потоки теста после setup ожидают на стартовом барьере и начинают выполнение теста одновременно,
+        фактический разброс моментов старта выводится в статистику тест кейса.
+        Тесты с executor = "asyncio" выполняются как задачи одного event loop (см. _run_async_test),
+        тесты с профилем нагрузки - по ступеням профиля (см. LoadProfileRunner).
 
         :return:
         """
 
         test_case_statistic = Statistic("Тест-кейс", 1, self._runner_config, self._log)
-        test_threads: list = []
+        max_threads = max([test.threads for test in self._tests_config
+                           if test.executor != "asyncio" and not test.load_profile], default=1)
+        executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="TestRunner")
 
         for test in self._tests_config:
-            test_case_statistic.append_success("----------------------------------ТЕСТ " + test['module'] + "." +
-                                               test['test'] + "------------------------------------", "ЗАПУСК")
-            for thread in range(test['threads']):
-                test_threads.append(self.TestRunner(thread + 1, test['module'], test['test'], test['input_data'],
-                                                    self._runner_config, self._log))
-            for thread in test_threads:
-                thread.start()
-            for thread in test_threads:
-                thread.join()
-            test_case_statistic.append_success("----------------------------------ТЕСТ " + test['module'] + "." +
-                                               test['test'] + "------------------------------------", "ЗАВЕРШЕНИЕ")
+            test_case_statistic.append_success("----------------------------------ТЕСТ " + test.module + "." +
+                                               test.test + "------------------------------------", "ЗАПУСК")
+            stages_summary = ()
+            connections_before = transport.get_connection_statistic()
+            if test.load_profile:
+                test_threads, stages_summary = LoadProfileRunner(test.load_profile, get_test_class(test.module),
+                                                                 test.test, test.input_data,
+                                                                 self._get_test_config(test), self._log).run()
+                for stage_summary in stages_summary:
+                    test_case_statistic.append_success(
+                        "Ступень #" + str(stage_summary['stage']) + ": потоков " + str(stage_summary['threads']) +
+                        ", выполнений " + str(stage_summary['count']) + ", ошибок " + str(stage_summary['errors']) +
+                        ", пропускная способность " + str(round(stage_summary['throughput'], 3)) + "/с" +
+                        ", время ср./макс. " + str(round(stage_summary['latency_avg'] * 1000)) + "/" +
+                        str(round(stage_summary['latency_max'] * 1000)) + " мс", "ПРОФИЛЬ_НАГРУЗКИ")
+            elif test.executor == "asyncio":
+                test_threads = asyncio.run(self._run_async_test(test))
+            else:
+                test_threads = self._run_thread_test(test, executor, test_case_statistic)
+            test_case_statistic.append_success("----------------------------------ТЕСТ " + test.module + "." +
+                                               test.test + "------------------------------------", "ЗАВЕРШЕНИЕ")
+            for method, arrival_summary in arrival.pop_arrival_summaries(self._test_case_run_config_id, test.test):
+                test_case_statistic.append_success(
+                    "Интенсивность " + method + ": цель " + str(arrival_summary['target_rate']) + "/с, достигнуто " +
+                    str(round(arrival_summary['achieved_rate'], 3)) + "/с, запросов " + str(arrival_summary['issued']) +
+                    ", с опозданием " + str(arrival_summary['late']) + " (макс. " +
+                    str(round(arrival_summary['max_lag'] * 1000)) + " мс), backlog " +
+                    str(arrival_summary['backlog']) + " (макс. " + str(arrival_summary['max_backlog']) + ")",
+                    "ИНТЕНСИВНОСТЬ")
+            connections_after = transport.get_connection_statistic()
+            connections = {
+                "opened": connections_after['opened'] - connections_before['opened'],
+                "reused": connections_after['reused'] - connections_before['reused']
+            }
+            if connections['opened'] or connections['reused']:
+                test_case_statistic.append_success("HTTP соединений открыто: " + str(connections['opened']) +
+                                                   ", запросов по открытым соединениям: " + str(connections['reused']),
+                                                   "HTTP_СОЕДИНЕНИЯ")
+            start_times = [thread.get_start_time() for thread in test_threads if thread.get_start_time()]
+            if start_times:
+                test_case_statistic.append_info("Разброс старта " + str(len(start_times)) + " потоков: " +
+                                                str(round((max(start_times) - min(start_times)) * 1000, 3)) + " мс",
+                                                "СТАРТ_ПОТОКОВ")
+            test_result = {
+                "module": test.module,
+                "test": test.test,
+                "errors": 0,
+                "warns": 0,
+                "stages": stages_summary,
+                "connections": connections
+            }
             for thread in test_threads:
                 statistic = thread.get_statistic()
                 statistic.show_errors_statistic()
                 statistic.show_warns_statistic()
                 if self._runner_config['settings']['create_report']:
                     statistic.create_report()
-            test_threads.clear()
-            time.sleep(test['wait_time'])
+                test_result['errors'] += statistic.get_errors_count()
+                test_result['warns'] += statistic.get_warns_count()
+            self._results.append(test_result)
+            time.sleep(test.wait_time)
+        executor.shutdown()
         return True
 
-    class TestRunner(threading.Thread):
-        """Класс для запуска тесте из тест кейса в отдельном потоке.
+    def _get_test_config(self, test: TestPlan) -> dict:
+        """Получение настроек для запуска теста.
+        Количество потоков теста переносится в настройку ws.threads - по ней SoapClient выбирает размер
+        общего пула http соединений. Если во входных данных теста есть ключ ws_rate (целевая интенсивность
+        запросов: число или словарь {"ws метод": rps, "*": rps}), он переносится в настройку ws.rate
+        и включает open-loop режим SoapClient; расписание общее для теста в рамках тест кейса (ws.rate_test_case).
+
+        :param test: план теста.
+
+        :return: настройки runner для теста.
+        """
+        test_config = dict(self._runner_config)
+        test_config['ws'] = dict(self._runner_config['ws'],
+                                 threads=max([stage.threads for stage in test.load_profile], default=test.threads))
+        if "ws_rate" in test.input_data:
+            test_config['ws']['rate'] = test.input_data['ws_rate']
+            test_config['ws']['rate_test_case'] = self._test_case_run_config_id
+        return test_config
+
+    def _run_thread_test(self, test: TestPlan, executor: ThreadPoolExecutor, test_case_statistic: Statistic) -> list:
+        """Запуск теста в потоках пула потоков тест кейса.
+
+        :param test: план теста;
+        :param executor: пул потоков тест кейса;
+        :param test_case_statistic: статистика тест кейса.
 
+        :return: список отработавших объектов TestRunner.
         """
-        def __init__(self, thread_id: int, module: str, test: str, input_data: dict, config: dict, log: Log):
-            threading.Thread.__init__(self)
+        start_barrier = threading.Barrier(test.threads)
+        test_config = self._get_test_config(test)
+        test_threads = []
+        for thread in range(test.threads):
+            test_threads.append(self.TestRunner(thread + 1, test.module, test.test, test.input_data,
+                                                test_config, self._log, start_barrier))
+        futures = [executor.submit(thread.run) for thread in test_threads]
+        for future in futures:
+            if future.exception() is not None:
+                test_case_statistic.append_error("Поток теста " + test.test + " завершился с исключением: " +
+                                                 repr(future.exception()), "КРИТ")
+        return test_threads
+
+    async def _run_async_test(self, test: TestPlan) -> list:
+        """Запуск теста-корутины в виде test.threads конкурентных задач одного event loop.
+        Все задачи стартуют одновременно после setup всех виртуальных пользователей.
+
+        :param test: план теста.
+
+        :return: список отработавших объектов AsyncTestRunner.
+        """
+        # клиент импортируется только для asyncio тестов, чтобы не тянуть httpx в остальные процессы
+        from lib.client import asyncSoapClient
+
+        start_event = asyncio.Event()
+        test_config = self._get_test_config(test)
+        test_tasks = []
+        for task in range(test.threads):
+            test_tasks.append(self.AsyncTestRunner(task + 1, test.module, test.test, test.input_data,
+                                                   test_config, self._log, start_event))
+        try:
+            await asyncio.gather(*[test_task.run() for test_task in test_tasks])
+        finally:
+            await asyncSoapClient.close_shared_clients()
+
+        return test_tasks
+
+    class TestRunner:
+        """Класс для запуска теста из тест кейса в потоке пула потоков тест кейса.
+
+        """
+        def __init__(self, thread_id: int, module: str, test: str, input_data: dict, config: dict, log: Log,
+                     start_barrier: threading.Barrier):
             self._statistic = Statistic(test, thread_id, config, log)
 
-            self._test_class = test_classes[module](input_data, config, self._statistic)
+            self._test_class = get_test_class(module)(input_data, config, self._statistic)
             self._test = test
             self._id = str(thread_id)
+            self._start_barrier = start_barrier
+            self._start_time: float = 0.0
 
         def get_statistic(self):
             """Метод-геттер получения объекта статистики.
@@ -104,8 +288,18 @@ class TestCase:
             """
             return self._statistic
 
+        def get_start_time(self) -> float:
+            """Метод-геттер момента фактического старта теста (после прохождения стартового барьера).
+
+            :return: время в секундах (0.0, если тест не стартовал).
+            """
+            return self._start_time
+
         def run(self):
-            """Переопределенный метод запуска потока.
+            """Метод запуска теста в потоке.
+            После setup поток ожидает остальные потоки теста на стартовом барьере.
+            Если поток завершился с любым исключением до старта, барьер нарушается, чтобы остальные потоки
+            (и ожидающий их результатов _run_thread_test) не зависли.
 
             """
             full_test_name = self._test + "[Поток #" + self._id + "]"
@@ -113,10 +307,80 @@ class TestCase:
             error_msg = ""
             try:
                 self._test_class.setup()
+                self._start_barrier.wait()
+                self._start_time = time.time()
                 test_method()
             except SystemExit as e:
-                error_msg = e.args[0]
-            self._test_class.teardown()
+                error_msg = str(e.args[0]) if e.args else repr(e)
+            except threading.BrokenBarrierError:
+                error_msg = "стартовый барьер нарушен аварийным завершением другого потока"
+            finally:
+                # остальные потоки не должны бесконечно ожидать на барьере поток, упавший до старта,
+                # с любым исключением; teardown выполняется в том числе для исключений, не являющихся SystemExit
+                if not self._start_time:
+                    self._start_barrier.abort()
+                self._test_class.teardown()
+
+            if error_msg:
+                self._statistic.append_error("Тест " + full_test_name + " завершился с критической ошибкой: "
+                                             + error_msg, "КРИТ")
+            else:
+                self._statistic.append_success("Тест " + full_test_name + " завершился без критических ошибок!",
+                                               "УСПЕХ")
+
+    class AsyncTestRunner:
+        """Класс для запуска теста-корутины из тест кейса в виде задачи event loop.
+
+        """
+        def __init__(self, task_id: int, module: str, test: str, input_data: dict, config: dict, log: Log,
+                     start_event: asyncio.Event):
+            self._statistic = Statistic(test, task_id, config, log)
+
+            self._test_class = get_test_class(module)(input_data, config, self._statistic)
+            self._test = test
+            self._id = str(task_id)
+            self._start_event = start_event
+            self._start_time: float = 0.0
+
+        def get_statistic(self):
+            """Метод-геттер получения объекта статистики.
+
+            :return:
+            """
+            return self._statistic
+
+        def get_start_time(self) -> float:
+            """Метод-геттер момента фактического старта теста.
+
+            :return: время в секундах (0.0, если тест не стартовал).
+            """
+            return self._start_time
+
+        async def run(self):
+            """Метод запуска теста-корутины.
+            После setup задача уступает управление, чтобы остальные задачи тоже выполнили setup,
+            и стартует по общему событию.
+
+            """
+            full_test_name = self._test + "[Задача #" + self._id + "]"
+            test_method = getattr(self._test_class, self._test)
+            error_msg = ""
+            try:
+                if not inspect.iscoroutinefunction(test_method):
+                    self._statistic.append_error("Тест " + self._test + " не является корутиной!", "EXECUTOR", True)
+                self._test_class.setup()
+                # задачи запускаются gather по порядку, поэтому после setup последней задачи стартуют все
+                if self._id == "1":
+                    asyncio.get_running_loop().call_soon(self._start_event.set)
+                await self._start_event.wait()
+                self._start_time = time.time()
+                await test_method()
+            except SystemExit as e:
+                error_msg = str(e.args[0]) if e.args else repr(e)
+            finally:
+                # остальные задачи не должны бесконечно ожидать события старта
+                self._start_event.set()
+                self._test_class.teardown()
 
             if error_msg:
                 self._statistic.append_error("Тест " + full_test_name + " завершился с критической ошибкой: "
@@ -0,0 +1,234 @@
+import re
+import json
+import hashlib
+from typing import Callable, List
+
+
+# скомпилированные валидаторы по md5 схемы: md5 -> функция проверки
+_validators: dict = {}
+
+_TYPES = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None
+}
+
+
+def get_validator(schema: str) -> Callable[[object], List[str]]:
+    """Получение скомпилированного валидатора входных данных по json схеме теста (атрибут Test.inputDataSchema).
+    Схема компилируется один раз, валидаторы кэшируются по md5 схемы.
+
+    :param schema: json схема в виде строки.
+
+    :return: функция проверки, возвращающая список ошибок (пустой, если данные корректны).
+    """
+    schema_hash = hashlib.md5(schema.encode("utf-8")).hexdigest()
+    validator = _validators.get(schema_hash)
+    if validator is None:
+        compiled = compile_schema(json.loads(schema) if schema else {})
+
+        def validator(value) -> List[str]:
+            errors: List[str] = []
+            compiled(value, "input_data", errors)
+            return errors
+
+        _validators[schema_hash] = validator
+
+    return validator
+
+
+def compile_schema(schema: dict) -> Callable[[object, str, list], None]:
+    """Компиляция json схемы (подмножество draft-04) в функцию проверки.
+    Поддерживаются ключевые слова: type, enum, properties, required, additionalProperties, items (схема или
+    список схем по позициям элементов), additionalItems, minItems, maxItems, minLength, maxLength, pattern,
+    minimum, maximum, exclusiveMinimum, exclusiveMaximum. Остальные ключевые слова игнорируются.
+    Все проверки схемы выбираются один раз при компиляции, при проверке выполняются только они.
+
+    :param schema: json схема.
+
+    :return: функция проверки вида check(value, path, errors), добавляющая ошибки в список errors.
+    """
+    checks: List[Callable[[object, str, list], None]] = []
+
+    if "type" in schema:
+        types = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+        type_checks = [_TYPES[type_] for type_ in types if type_ in _TYPES]
+        type_names = " или ".join(types)
+
+        def check_type(value, path: str, errors: list) -> None:
+            if not any(type_check(value) for type_check in type_checks):
+                errors.append(path + ": требуется тип " + type_names + ", получено '" + str(value)[:100] + "'")
+        checks.append(check_type)
+
+    if "enum" in schema:
+        enum = schema['enum']
+
+        def check_enum(value, path: str, errors: list) -> None:
+            if value not in enum:
+                errors.append(path + ": значение '" + str(value)[:100] + "' не входит в " + str(enum))
+        checks.append(check_enum)
+
+    checks.extend(_compile_object(schema))
+    checks.extend(_compile_array(schema))
+    checks.extend(_compile_string(schema))
+    checks.extend(_compile_number(schema))
+
+    def check(value, path: str, errors: list) -> None:
+        for check_ in checks:
+            check_(value, path, errors)
+
+    return check
+
+
+def _compile_object(schema: dict) -> List[Callable[[object, str, list], None]]:
+    """Компиляция проверок объектов: required, properties, additionalProperties.
+    Проверки пропускают значения других типов (за тип отвечает ключевое слово type).
+
+    :param schema: json схема.
+
+    :return: список функций проверки.
+    """
+    checks = []
+    required: list = schema.get('required', [])
+    properties = {name: compile_schema(property_schema)
+                  for name, property_schema in schema.get('properties', {}).items()}
+    additional = schema.get('additionalProperties', True)
+    additional_check = compile_schema(additional) if isinstance(additional, dict) else None
+
+    if required:
+        def check_required(value, path: str, errors: list) -> None:
+            if isinstance(value, dict):
+                for name in required:
+                    if name not in value:
+                        errors.append(path + ": отсутствует обязательный ключ '" + name + "'")
+        checks.append(check_required)
+
+    if properties or additional is not True:
+        def check_properties(value, path: str, errors: list) -> None:
+            if not isinstance(value, dict):
+                return
+            for name, item in value.items():
+                property_check = properties.get(name)
+                if property_check is not None:
+                    property_check(item, path + "." + name, errors)
+                elif additional_check is not None:
+                    additional_check(item, path + "." + name, errors)
+                elif additional is False:
+                    errors.append(path + ": недопустимый ключ '" + name + "'")
+        checks.append(check_properties)
+
+    return checks
+
+
+def _compile_array(schema: dict) -> List[Callable[[object, str, list], None]]:
+    """Компиляция проверок массивов: minItems, maxItems, items, additionalItems.
+    Проверки пропускают значения других типов (за тип отвечает ключевое слово type).
+
+    :param schema: json схема.
+
+    :return: список функций проверки.
+    """
+    checks = []
+    min_items = schema.get('minItems')
+    max_items = schema.get('maxItems')
+    items = schema.get('items')
+
+    if min_items is not None or max_items is not None:
+        def check_size(value, path: str, errors: list) -> None:
+            if not isinstance(value, list):
+                return
+            if min_items is not None and len(value) < min_items:
+                errors.append(path + ": требуется не менее " + str(min_items) + " элементов")
+            if max_items is not None and len(value) > max_items:
+                errors.append(path + ": требуется не более " + str(max_items) + " элементов")
+        checks.append(check_size)
+
+    if isinstance(items, dict):
+        item_check = compile_schema(items)
+
+        def check_items(value, path: str, errors: list) -> None:
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    item_check(item, path + "[" + str(index) + "]", errors)
+        checks.append(check_items)
+    elif isinstance(items, list):
+        # список схем проверяет элементы по позициям, остальные элементы - по additionalItems
+        item_checks = [compile_schema(item_schema) for item_schema in items]
+        additional = schema.get('additionalItems', True)
+        additional_check = compile_schema(additional) if isinstance(additional, dict) else None
+
+        def check_items(value, path: str, errors: list) -> None:
+            if not isinstance(value, list):
+                return
+            for index, item in enumerate(value):
+                if index < len(item_checks):
+                    item_checks[index](item, path + "[" + str(index) + "]", errors)
+                elif additional_check is not None:
+                    additional_check(item, path + "[" + str(index) + "]", errors)
+                elif additional is False:
+                    errors.append(path + ": требуется не более " + str(len(item_checks)) + " элементов")
+                    return
+        checks.append(check_items)
+
+    return checks
+
+
+def _compile_string(schema: dict) -> List[Callable[[object, str, list], None]]:
+    """Компиляция проверок строк: minLength, maxLength, pattern.
+    Проверки пропускают значения других типов (за тип отвечает ключевое слово type).
+
+    :param schema: json схема.
+
+    :return: список функций проверки.
+    """
+    checks = []
+    min_length = schema.get('minLength')
+    max_length = schema.get('maxLength')
+    pattern = re.compile(schema['pattern']) if 'pattern' in schema else None
+
+    if min_length is not None or max_length is not None or pattern is not None:
+        def check_string(value, path: str, errors: list) -> None:
+            if not isinstance(value, str):
+                return
+            if min_length is not None and len(value) < min_length:
+                errors.append(path + ": требуется строка длиной не менее " + str(min_length))
+            if max_length is not None and len(value) > max_length:
+                errors.append(path + ": требуется строка длиной не более " + str(max_length))
+            if pattern is not None and not pattern.search(value):
+                errors.append(path + ": строка '" + value[:100] + "' не соответствует шаблону " + pattern.pattern)
+        checks.append(check_string)
+
+    return checks
+
+
+def _compile_number(schema: dict) -> List[Callable[[object, str, list], None]]:
+    """Компиляция проверок чисел: minimum, maximum, exclusiveMinimum, exclusiveMaximum.
+    Проверки пропускают значения других типов (за тип отвечает ключевое слово type).
+
+    :param schema: json схема.
+
+    :return: список функций проверки.
+    """
+    checks = []
+    minimum = schema.get('minimum')
+    maximum = schema.get('maximum')
+    exclusive_minimum = schema.get('exclusiveMinimum', False)
+    exclusive_maximum = schema.get('exclusiveMaximum', False)
+
+    if minimum is not None or maximum is not None:
+        def check_number(value, path: str, errors: list) -> None:
+            if not _TYPES['number'](value):
+                return
+            if minimum is not None and (value < minimum or (exclusive_minimum and value == minimum)):
+                errors.append(path + ": значение " + str(value) + " требуется " +
+                              (">" if exclusive_minimum else ">=") + " " + str(minimum))
+            if maximum is not None and (value > maximum or (exclusive_maximum and value == maximum)):
+                errors.append(path + ": значение " + str(value) + " требуется " +
+                              ("<" if exclusive_maximum else "<=") + " " + str(maximum))
+        checks.append(check_number)
+
+    return checks
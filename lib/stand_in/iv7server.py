@@ -0,0 +1,330 @@
+import json
+import time
+import random
+import base64
+import argparse
+import datetime
+import threading
+from typing import Callable
+from xml.sax.saxutils import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from lxml import etree
+
+
+# путь сервиса, как у настоящего сервера (см. SoapClient._url)
+SERVICE_PATH = "/axis2/services/Iv7Server/"
+
+_NAMESPACE = "http://iv7server.stand-in"
+
+_WSDL = """<?xml version="1.0" encoding="UTF-8"?>
+<definitions xmlns="http://schemas.xmlsoap.org/wsdl/" xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+             xmlns:tns="{namespace}" xmlns:xs="http://www.w3.org/2001/XMLSchema" targetNamespace="{namespace}">
+    <types>
+        <xs:schema targetNamespace="{namespace}" elementFormDefault="qualified">
+            <xs:element name="CallMethod2">
+                <xs:complexType>
+                    <xs:sequence>
+                        <xs:element name="method" type="xs:string"/>
+                        <xs:element name="params" type="xs:string"/>
+                        <xs:element name="sysparams" type="xs:string"/>
+                    </xs:sequence>
+                </xs:complexType>
+            </xs:element>
+            <xs:element name="CallMethod2Response">
+                <xs:complexType>
+                    <xs:sequence>
+                        <xs:element name="return" type="xs:string"/>
+                    </xs:sequence>
+                </xs:complexType>
+            </xs:element>
+        </xs:schema>
+    </types>
+    <message name="CallMethod2Request"><part name="parameters" element="tns:CallMethod2"/></message>
+    <message name="CallMethod2Response"><part name="parameters" element="tns:CallMethod2Response"/></message>
+    <portType name="Iv7ServerPortType">
+        <operation name="CallMethod2">
+            <input message="tns:CallMethod2Request"/>
+            <output message="tns:CallMethod2Response"/>
+        </operation>
+    </portType>
+    <binding name="Iv7ServerSoap11Binding" type="tns:Iv7ServerPortType">
+        <soap:binding transport="http://schemas.xmlsoap.org/soap/http" style="document"/>
+        <operation name="CallMethod2">
+            <soap:operation soapAction="urn:CallMethod2"/>
+            <input><soap:body use="literal"/></input>
+            <output><soap:body use="literal"/></output>
+        </operation>
+    </binding>
+    <service name="Iv7Server">
+        <port name="Iv7ServerHttpSoap11Endpoint" binding="tns:Iv7ServerSoap11Binding">
+            <soap:address location="{address}"/>
+        </port>
+    </service>
+</definitions>
+"""
+
+_RESPONSE = ('<?xml version="1.0" encoding="UTF-8"?>'
+             '<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"><soapenv:Body>'
+             '<ns:CallMethod2Response xmlns:ns="' + _NAMESPACE + '"><ns:return>{result}</ns:return>'
+             '</ns:CallMethod2Response></soapenv:Body></soapenv:Envelope>')
+
+# маленькая картинка для ответов с изображениями (1x1 gif)
+_IMAGE = base64.b64encode(b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00,"
+                          b"\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;").decode()
+
+
+def _server_string(ip: str) -> dict:
+    return {
+        "is_central_server": True,
+        "server_name": "stand-in " + ip,
+        "iv54server_port": 8080,
+        "rtmpPort": 1935,
+        "rtspPort": 554,
+        "wsPort": 8080,
+        "direct_access": 1,
+        "cams": [{"key2": "CAM_" + str(index), "key3": str(index), "ptzStat": index % 2 == 0, "Status": True}
+                 for index in range(1, 5)],
+        "archive": [[{"key1": ip, "key2": "CAM_" + str(index), "key3": str(index), "is_video": True,
+                      "is_audio": False, "is_video_linked": True, "is_audio_linked": False} for index in range(1, 5)]],
+        "down_servers": []
+    }
+
+
+def _get_local_servers(params: dict, rnd: random.Random) -> list:
+    return [{"data": {"string": _server_string("127.0.0.1")}, "hash": "stand-in"}]
+
+
+def _get_down_servers(params: dict, rnd: random.Random) -> list:
+    string = _server_string("127.0.0.1")
+    string['down_servers'] = [{"127.0.0.2": _server_string("127.0.0.2")}]
+    return [{"data": {"string": string}, "hash": "stand-in"}]
+
+
+def _time(params: dict, rnd: random.Random) -> list:
+    return [{"iso": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"}]
+
+
+def _plugin_info(params: dict, rnd: random.Random) -> list:
+    return [{"version": "1.0.0", "user": "stand-in", "build": "2020.01.01"}]
+
+
+def _ptz_list_profiles(params: dict, rnd: random.Random) -> list:
+    return [{"key2": "CAM_" + str(index), "key3": str(index)} for index in range(2, 5, 2)]
+
+
+def _faceva_events(params: dict, rnd: random.Random, with_image: bool) -> list:
+    from_ = params.get('from', 0) if isinstance(params.get('from', 0), int) else 0
+    events = []
+    for index in range(rnd.randint(0, 3)):
+        event = {
+            "event": from_ + index + 1,
+            "camera": 1955154395,
+            "person": str(26617065381036041 + index),
+            "score": round(rnd.uniform(0.5, 1.0), 6),
+            "time": int(time.time() * 1000000),
+            "rect": {"x": 308, "y": 364, "w": 98, "h": 98}
+        }
+        if with_image:
+            event['img'] = _IMAGE
+        events.append(event)
+
+    return events or [{}]
+
+
+def _faceva_get_data_base(params: dict, rnd: random.Random) -> list:
+    return [{"persons": [{"id": 26617065381036041 + index, "name": "Персона " + str(index)} for index in range(3)]}]
+
+
+def _faceva_image(params: dict, rnd: random.Random) -> list:
+    return [{"img": _IMAGE}]
+
+
+def _ewriter_exec(params: dict, rnd: random.Random) -> list:
+    return [{}]
+
+
+def _server_login(params: dict, rnd: random.Random) -> list:
+    # каждый вход получает новый токен: так видно, сколько авторизаций выполнил клиент (см. token_broker)
+    return [{"token": "stand-in-" + "%032x" % rnd.getrandbits(128)}]
+
+
+# генераторы ответов известных ws методов: имя метода -> функция(params, random) -> result
+_GENERATORS: dict = {
+    "time": _time,
+    "listener_pinger:get_local_servers": _get_local_servers,
+    "listener_pinger:get_down_servers": _get_down_servers,
+    "plugin_info:GetInfo": _plugin_info,
+    "ptzserver:list_profiles": _ptz_list_profiles,
+    "ptzserver:command": lambda params, rnd: [{}],
+    "ptzclient:command": lambda params, rnd: [{}],
+    "FaceVA:GetEvent": lambda params, rnd: _faceva_events(params, rnd, False),
+    "FaceVA:GetFaces": lambda params, rnd: _faceva_events(params, rnd, True),
+    "FaceVA:GetDataBase": _faceva_get_data_base,
+    "FaceVA:GetEventImage": _faceva_image,
+    "FaceVA:GetFrame": _faceva_image,
+    "ewriter:exec": _ewriter_exec,
+    "users:server_login": _server_login
+}
+
+
+def _create_latency(settings: dict) -> Callable[[random.Random], float]:
+    """Создание генератора задержек ответа.
+
+    :param settings: настройки распределения:
+                     {"distribution": "constant", "value": 0.01} - постоянная задержка;
+                     {"distribution": "uniform", "min": 0.005, "max": 0.02} - равномерное распределение;
+                     {"distribution": "exponential", "mean": 0.01} - экспоненциальное распределение;
+                     {"distribution": "lognormal", "median": 0.01, "sigma": 0.5} - логнормальное распределение.
+                     Время - в секундах.
+
+    :return: функция, возвращающая задержку в секундах.
+    """
+    distribution: str = settings.get('distribution', "constant")
+    if distribution == "uniform":
+        return lambda rnd: rnd.uniform(settings['min'], settings['max'])
+    if distribution == "exponential":
+        return lambda rnd: rnd.expovariate(1 / settings['mean']) if settings['mean'] else 0.0
+    if distribution == "lognormal":
+        return lambda rnd: settings['median'] * rnd.lognormvariate(0, settings.get('sigma', 0.5))
+    assert distribution == "constant", "[0016] Неизвестное распределение задержки '" + distribution + "'!"
+
+    return lambda rnd: settings.get('value', 0.0)
+
+
+class StandInSettings:
+    """Настройки подменного сервера.
+
+    Настройки (json):
+        "latency" - распределение задержки ответа (см. _create_latency), по умолчанию без задержки;
+        "http_error_rate" - доля ответов с http статусом 503 (по умолчанию 0);
+        "user_error_rate" - доля ответов с user_code = 1 (по умолчанию 0);
+        "seed" - начальное значение генератора случайных чисел для повторяемости (по умолчанию 0);
+        "methods" - настройки отдельных ws методов, переопределяющие общие:
+            {
+                "listener_pinger:get_local_servers": {
+                    "latency": {"distribution": "exponential", "mean": 0.02},
+                    "http_error_rate": 0.01,
+                    "user_error_rate": 0.0,
+                    "result": [...]  // готовый result ответа вместо сгенерированного
+                }
+            }
+        Методы без генератора и без готового ответа отвечают result = [{}].
+    """
+    def __init__(self, settings: dict):
+        self._default = self._compile(settings)
+        self._methods = {method: self._compile(dict(settings, **method_settings))
+                         for method, method_settings in settings.get('methods', {}).items()}
+        self._random = random.Random(settings.get('seed', 0))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _compile(settings: dict) -> dict:
+        return {
+            "latency": _create_latency(settings.get('latency', {})),
+            "http_error_rate": settings.get('http_error_rate', 0.0),
+            "user_error_rate": settings.get('user_error_rate', 0.0),
+            "result": settings.get('result')
+        }
+
+    def answer(self, method: str, params: dict) -> tuple:
+        """Формирование ответа ws метода.
+
+        :param method: имя ws метода;
+        :param params: параметры метода.
+
+        :return: задержка ответа в секундах, http статус и json строка ответа (для статуса 200).
+        """
+        method_settings: dict = self._methods.get(method, self._default)
+        with self._lock:
+            delay = method_settings['latency'](self._random)
+            roll = self._random.random()
+            rnd = random.Random(self._random.random())
+        if roll < method_settings['http_error_rate']:
+            return delay, 503, ""
+        if roll < method_settings['http_error_rate'] + method_settings['user_error_rate']:
+            return delay, 200, json.dumps({"user_code": 1, "user_msg": "stand-in error", "result": [{}]})
+
+        result = method_settings['result']
+        if result is None:
+            generator = _GENERATORS.get(method)
+            result = generator(params, rnd) if generator is not None else [{}]
+
+        return delay, 200, json.dumps({"user_code": 0, "result": result}, ensure_ascii=False)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # заголовки и тело ответа пишутся отдельно: без TCP_NODELAY каждый ответ keep-alive ждет задержанного ACK
+    disable_nagle_algorithm = True
+    settings: StandInSettings = None
+
+    def log_message(self, format_: str, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if not self.path.startswith(SERVICE_PATH):
+            self._send(404, "text/plain", b"")
+            return
+        address = "http://" + self.headers.get('Host', "127.0.0.1") + SERVICE_PATH
+        self._send(200, "text/xml; charset=utf-8", _WSDL.format(namespace=_NAMESPACE, address=address).encode())
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            request = etree.fromstring(body)
+            method = request.findtext(".//{*}method")
+            params = json.loads(request.findtext(".//{*}params") or "{}")
+        except (etree.XMLSyntaxError, ValueError):
+            self._send(400, "text/plain", b"bad request")
+            return
+
+        delay, status, result = self.settings.answer(method, params)
+        if delay > 0:
+            time.sleep(delay)
+        if status != 200:
+            self._send(status, "text/plain", b"stand-in error")
+            return
+        self._send(200, "text/xml; charset=utf-8", _RESPONSE.format(result=escape(result)).encode("utf-8"))
+
+    def _send(self, status: int, content_type: str, content: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def create_server(host: str, port: int, settings: dict) -> ThreadingHTTPServer:
+    """Создание подменного сервера Iv7Server.
+    Сервер отдает WSDL с операцией CallMethod2 и отвечает на CallMethod2 сгенерированными или готовыми
+    ответами с заданными задержками и долями ошибок (см. StandInSettings). Каждое соединение обслуживается
+    своим потоком, keep-alive поддерживается.
+
+    :param host: адрес для прослушивания;
+    :param port: порт;
+    :param settings: настройки сервера.
+
+    :return: объект сервера (запуск - serve_forever, остановка - shutdown).
+    """
+    handler = type("Handler", (_Handler, ), {"settings": StandInSettings(settings)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Iv7Server SOAP stand-in for harness benchmarks")
+    parser.add_argument("--host", help="address to listen", type=str, default="127.0.0.1")
+    parser.add_argument("--port", help="port to listen", type=int, default=8080)
+    parser.add_argument("--settings", help="json file with latency/error settings", type=str, default="")
+    args = parser.parse_args()
+
+    stand_in_settings = {}
+    if args.settings:
+        with open(args.settings, "r", encoding="utf-8") as settings_file:
+            stand_in_settings = json.load(settings_file)
+
+    print("Iv7Server stand-in: http://" + args.host + ":" + str(args.port) + SERVICE_PATH + "?wsdl")
+    create_server(args.host, args.port, stand_in_settings).serve_forever()
@@ -1,3 +1,4 @@
+import os
 import argparse
 
 from scripts.common import tools
@@ -8,10 +9,34 @@ from lib.log_and_statistic.log import Log
 from lib.runner import initializer
 from lib.runner.db import DataBase
 from lib.runner.runner import Runner
+from lib.runner.distributed import Coordinator, Agent
 
 
-def main(run_config_name: str, iterations: int):
+def parse_duration(value: str) -> float:
+    """Разбор длительности запуска вида "3600", "90s", "30m", "72h" или "3d".
+
+    :param value: строка длительности.
+
+    :return: длительность в секундах.
+    """
+    multipliers = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    try:
+        if value and value[-1] in multipliers:
+            return float(value[:-1]) * multipliers[value[-1]]
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid duration: " + value)
+
+
+def main(run_config_name: str, iterations: int, coordinator_address: str = "", agents_count: int = 0,
+         agent_address: str = "", duration: float = 0, resume: bool = False, log_dir: str = "./log"):
     """Функция запуска различной инициализации настроек и тест кейсов.
+    Запуск ограничивается количеством итераций iterations или, если задана, длительностью duration (в секундах).
+    При resume прерванный запуск конфигурации продолжается с последней контрольной точки.
+    В режиме агента (agent_address) конфигурация не указывается: агент получает планы тест кейсов от координатора.
+    В режиме координатора (coordinator_address) потоки тестов делятся между agents_count агентами.
+    Распределенный запуск ограничивается только количеством итераций (duration и resume не поддерживаются).
+    Логи пишутся в папку log_dir.
 
     """
     initializer.init_settings()
@@ -20,13 +45,23 @@ def main(run_config_name: str, iterations: int):
     data_base.connect()
 
     runner_settings = data_base.get_runner_settings()
-    log = Log(runner_settings)
+    log = Log(runner_settings, resume, log_dir)
+
+    if agent_address:
+        Agent(agent_address, log, runner_settings).start()
+        data_base.disconnect()
+        return
 
     run_config_id: int = data_base.get_run_config_id(run_config_name)
     if run_config_id == -1:
         return
-    runner = Runner(run_config_id, iterations, data_base, log, runner_settings)
-    runner.start()
+    if coordinator_address:
+        coordinator = Coordinator(run_config_id, iterations, data_base, log, runner_settings, coordinator_address,
+                                  agents_count)
+        coordinator.start()
+    else:
+        runner = Runner(run_config_id, iterations, data_base, log, runner_settings, duration, resume)
+        runner.start()
     data_base.disconnect()
 
 
@@ -36,9 +71,27 @@ if __name__ == "__main__":
     freeze_support()
 
     parser = argparse.ArgumentParser()
-    parser.add_argument("configuration", help="run configuration's name", type=str)
-    parser.add_argument("iterations", help="running configuration's count iterations", type=int)
+    parser.add_argument("configuration", help="run configuration's name", type=str, nargs="?", default="")
+    parser.add_argument("iterations", help="running configuration's count iterations", type=int, nargs="?",
+                        default=1)
+    parser.add_argument("--coordinator", help="address to bind for agents, e.g. tcp://*:5600", type=str, default="")
+    parser.add_argument("--agents", help="count of agents to wait for in coordinator mode", type=int, default=1)
+    parser.add_argument("--agent", help="coordinator's address to connect, e.g. tcp://10.0.0.1:5600", type=str,
+                        default="")
+    parser.add_argument("--duration", help="run configuration until the time is up, e.g. 3600, 30m, 72h",
+                        type=parse_duration, default=0)
+    parser.add_argument("--resume", help="continue interrupted run from the last checkpoint", action="store_true")
+    parser.add_argument("--log-dir", help="logs directory (default ./log, ./log_agent_<pid> in agent mode)",
+                        type=str, default="")
     args = parser.parse_args()
 
-    main(args.configuration, args.iterations)
+    if not args.agent and not args.configuration:
+        parser.error("the following arguments are required: configuration")
+    if (args.coordinator or args.agent) and (args.duration or args.resume):
+        parser.error("--duration and --resume are not supported in --coordinator/--agent mode")
+    # агенты, запущенные из одной копии проекта, не должны ротировать папку логов друг друга
+    log_dir = args.log_dir or ("./log_agent_" + str(os.getpid()) if args.agent else "./log")
+
+    main(args.configuration, args.iterations, args.coordinator, args.agents, args.agent, args.duration, args.resume,
+         log_dir)
 
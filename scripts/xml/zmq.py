@@ -9,49 +9,6 @@ from lib.client.zmqClient import ZmqClient
 from lib.log_and_statistic.statistic import Statistic
 
 
-def _get_response(zmqclient: ZmqClient, timeout: float):
-    """Функкия ожидания ответа.
-
-    :param zmqclient: объект класса ZmqClient;
-    :param timeout: максимальное ожидание ответа.
-
-    :return список с ответами от сервера.
-    """
-    signal_event = zmqclient.get_signal_event()
-    signal_event.wait(timeout)
-    if signal_event.is_set() is False:
-        return -1
-
-    list_xml_responses = zmqclient.get_list_response()
-    if len(list_xml_responses) > 0:
-        return list_xml_responses
-
-
-def search_response_index_by_message_id(xml_responses: list, message_id: str, statistic: Statistic) -> int:
-    """Поиск в списке xml у которого значение тега messageId совпадает с message_id.
-
-    :param xml_responses: список xml;
-    :param message_id: значение тега messageId;
-    :param statistic: объект класса Statistic.
-
-    :return: 1) индекс в списке; 2) -1 в случае отсутствия совпадения.
-    """
-    logger = statistic.get_log().get_logger("scripts/xml/zmq")
-    logger.info("was called (list_xml_responses, message_id)")
-    logger.debug("(" + str(xml_responses) + ", " + str(message_id) + ")")
-
-    for index, response in enumerate(xml_responses):
-        tag_nessage_id = response.find(".//messageId")
-        if tag_nessage_id is None:
-            statistic.append_error("Отсутствует тег 'messageId'", "ZMQ_ОТВЕТ", True)
-        logger.debug("response messageId is " + tag_nessage_id.text)
-        if message_id == tag_nessage_id.text:
-            logger.info("message_Id is equal!")
-            return index
-        logger.info("message_Id isn't equal!")
-    return -1
-
-
 def _send_request(zmqclient: ZmqClient, xml_tree_full: Tree, message_id: str, timeout: float,
                   statistic: Statistic) -> Tree:
     """Функция отправки сообщения и с возможностью переотправки.
@@ -64,14 +21,15 @@ def _send_request(zmqclient: ZmqClient, xml_tree_full: Tree, message_id: str, ti
 
     :return: ответ в виде дерева XML.
     """
-    zmqclient.send_request(xml_tree_full)
+    future = zmqclient.request(xml_tree_full, message_id)
     statistic.append_info("Отправка запроса с id: " + str(message_id), "ИНФО")
     send_count = 0
 
     while True:
-        list_xml_responses = _get_response(zmqclient, timeout)
-        if list_xml_responses == -1:
+        xml_response = zmqclient.wait_response(message_id, future, timeout)
+        if xml_response is None:
             if send_count == 3:
+                zmqclient.cancel_response(message_id)
                 statistic.append_error("Повторная отправка сообщения '" + str(message_id) + "' завершилась с ошибкой!",
                                        "ZMQ_ОТВЕТ", True)
                 break
@@ -79,11 +37,8 @@ def _send_request(zmqclient: ZmqClient, xml_tree_full: Tree, message_id: str, ti
             send_count += 1
             statistic.append_warn("Попытка повторной отправки сообщеия '" + str(message_id), "ZMQ_ОТВЕТ")
             continue
-        response_index = search_response_index_by_message_id(list_xml_responses, message_id, statistic)
-        if response_index > -1:
-            statistic.append_info("Получен ответ на запрос с id '" + str(message_id) + "'", "ИНФО")
-            zmqclient.remove_response(message_id)
-            return list_xml_responses[response_index]
+        statistic.append_info("Получен ответ на запрос с id '" + str(message_id) + "'", "ИНФО")
+        return xml_response
 
     return -1
 
@@ -4,6 +4,7 @@ from typing import Tuple
 
 from lib.client.zmqClient import ZmqClient
 from lib.client.soapClient import SoapClient
+from lib.client import token_broker
 from lib.log_and_statistic.statistic import Statistic
 
 from scripts.xml import zmq
@@ -56,7 +57,8 @@ class TestAnalytics:
 
         """
         ws_client = SoapClient(self._server_ip, self._server_port, self._config, self._statistic)
-        token: str = ws_users.server_login(ws_client, self._login, self._password, self._statistic)
+        token: str = token_broker.get_token(ws_users.server_login, self._server_ip, self._server_port,
+                                            self._login, self._password, self._config, self._statistic)
         current_time = ws_common.get_current_server_time(ws_client, token, self._statistic)
 
         events_count = 0
@@ -86,6 +88,9 @@ class TestAnalytics:
                         events_count -= 1
                         continue
 
+                    # события лиц и база персон запрашиваются одновременно
+                    persons_future = ws_client.submit(ws_analytics.faceva_get_data_base, ws_client, token,
+                                                      self._statistic)
                     faceva_events: Tuple[dict] = ws_analytics.faceva_get_event(ws_client, token, 0, self._statistic)
                     index_faceva_event = tools.get_dict_by_keys_values(faceva_events, ('event', ), (event['evtid'], ))
 
@@ -93,7 +98,7 @@ class TestAnalytics:
                         self._statistic.append_error("Нет события: " + str(event['evtid']) + "!", "КРИТ", True)
 
                     person_id = faceva_events[index_faceva_event]['person']
-                    persons = ws_analytics.faceva_get_data_base(ws_client, token, self._statistic)
+                    persons = persons_future.result()
                     index_person = tools.get_dict_by_keys_values(persons, ('id', ), (person_id, ))
 
                     if index_person < 0:
@@ -119,6 +124,10 @@ class TestAnalytics:
                     camera = event['camera']
                     from_event = event_id
 
+                # Кадр и картинка по событию запрашиваются одновременно.
+                image_future = ws_client.submit(ws_analytics.faceva_get_event_image, ws_client, token, event_id, time_,
+                                                self._statistic)
+
                 # Проверка получения кадра по событию.
                 # Выполнение ws метода FaceVA:GetFrame
                 ws_result = ws_analytics.faceva_get_frame(ws_client, token, camera, time_, self._statistic)
@@ -131,7 +140,7 @@ class TestAnalytics:
 
                 # Проверка получения картинки по событию.
                 # Выполнение ws метода FaceVA:GetEventImage
-                ws_result = ws_analytics.faceva_get_event_image(ws_client, token, event_id, time_, self._statistic)
+                ws_result = image_future.result()
                 if tools.check_keys_exist(ws_result, ['img'], 'result[0]', False, self._statistic) is False:
                     self._statistic.append_error("По событию " + str(event_id) + "!", "ОТСУТСТВУЕТ КАРТИНКА", True)
                 elif not ws_result['img']:
@@ -155,7 +164,8 @@ class TestAnalytics:
 
         """
         ws_client = SoapClient(self._server_ip, self._server_port, self._config, self._statistic)
-        token: str = ws_users.server_login(ws_client, self._login, self._password, self._statistic)
+        token: str = token_broker.get_token(ws_users.server_login, self._server_ip, self._server_port,
+                                            self._login, self._password, self._config, self._statistic)
         current_time = ws_common.get_current_server_time(ws_client, token, self._statistic)
 
         events_count = 0
@@ -235,7 +245,8 @@ class TestAnalytics:
             вызывается метода FaceVA:GetDataBase с целью фактической проверки добавления человека.
         """
         ws_client = SoapClient(self._server_ip, self._server_port, self._config, self._statistic)
-        token = ws_users.server_login(ws_client, self._login, self._password, self._statistic)
+        token = token_broker.get_token(ws_users.server_login, self._server_ip, self._server_port,
+                                       self._login, self._password, self._config, self._statistic)
 
         # получение текущего списка людей в БД
         old_persons_db = ws_analytics.faceva_get_data_base(ws_client, self._login, self._statistic)
@@ -296,7 +307,8 @@ class TestAnalytics:
         cam_json = graph.create_json_from_profiles(self._input_data['server'], analytic_block,
                                                    self._input_data['video_source'], True, self._statistic)
         ws_client = SoapClient(self._server_ip, self._server_port, self._config, self._statistic)
-        token: str = ws_users.server_login(ws_client, self._login, self._password, self._statistic)
+        token: str = token_broker.get_token(ws_users.server_login, self._server_ip, self._server_port,
+                                            self._login, self._password, self._config, self._statistic)
         cam_name: str = graph.insert_graphs_to_db(ws_client, token, self._server_db_path, cam_json,
                                                   self._input_data['server'], self._input_data['profile'], 1,
                                                   self._statistic)[0]
@@ -9,6 +9,7 @@ from scripts.common import tools
 from scripts.ws import users as ws_users
 from scripts.ws import common as ws_common
 
+from lib.client import token_broker
 from lib.client.soapClient import SoapClient
 
 from lib.log_and_statistic import log
@@ -84,18 +85,22 @@ class TestCommon:
         # ----------------------------------------
 
         if self._input_data["mode"] == "server":
-            ws_client = SoapClient(self._server_ip, self._server_port, self._config, self._statistic)
+            ip, port = self._server_ip, self._server_port
         elif self._input_data["mode"] == "client":
-            ws_client = SoapClient(self._client_ip, self._client_port, self._config, self._statistic)
+            ip, port = self._client_ip, self._client_port
         else:
             self._statistic.append_error("Недопустимое значение ключа 'mode'. Доступны: client, server",
                                          "ОШИБКА КЛЮЧА JSON", True)
+        ws_client = SoapClient(ip, port, self._config, self._statistic)
 
-        token = ws_users.server_login(ws_client, self._login, self._password, self._statistic)
+        token = token_broker.get_token(ws_users.server_login, ip, port, self._login, self._password, self._config,
+                                       self._statistic)
 
-        for plugin in self._input_data["plugins"]:
-            result: dict = ws_common.get_plugin_info(ws_client, token, plugin['rel_path'], plugin['module_name'],
-                                                     self._statistic)
+        # информация о плагинах запрашивается одновременно, результаты проверяются в порядке входных данных
+        futures = [ws_client.submit(ws_common.get_plugin_info, ws_client, token, plugin['rel_path'],
+                                    plugin['module_name'], self._statistic) for plugin in self._input_data["plugins"]]
+        for plugin, future in zip(self._input_data["plugins"], futures):
+            result: dict = future.result()
             if result['version'] == "not found module version !":
                 self._statistic.append_error(plugin['module_name'], "ОШИБКА ВЕРСИИ МОДУЛЯ")
             if plugin['rel_path'] == "bad rel_path !":
@@ -1,6 +1,7 @@
 import time
 
 from lib.client.soapClient import SoapClient
+from lib.client import token_broker
 
 from lib.log_and_statistic.statistic import Statistic
 
@@ -11,6 +12,8 @@ from scripts.ws import ptz as ws_ptz
 from scripts.ws import users as ws_users
 from scripts.ws import listener_pinger as ws_lp
 
+from requests_patterns.ws import listener_pinger as pattern_lp
+
 
 class TestServer:
     """Класс-обертка с тестами для сервера
@@ -49,7 +52,8 @@ class TestServer:
         """
 
         ws_client = SoapClient(self._ip, self._port, self._config, self._statistic)
-        token = ws_users.server_login(ws_client, self._login, self._password, self._statistic)
+        token = token_broker.get_token(ws_users.server_login, self._ip, self._port, self._login, self._password,
+                                       self._config, self._statistic)
 
         if self._input_data["template_path"]:
             template_down_servers: dict = tools.open_json_file(self._input_data["template_path"], self._statistic)
@@ -92,7 +96,8 @@ class TestServer:
         # ----------------------------------------
 
         ws_client = SoapClient(self._ip, self._port, self._config, self._statistic)
-        token = ws_users.server_login(ws_client, self._login, self._password, self._statistic)
+        token = token_broker.get_token(ws_users.server_login, self._ip, self._port, self._login, self._password,
+                                       self._config, self._statistic)
 
         if self._input_data["template_path"]:
             template_ptz_list_profiles: dict = tools.open_json_file(self._input_data["template_path"], self._statistic)
@@ -125,3 +130,63 @@ class TestServer:
                                              "КРИТ", True)
 
             time.sleep(self._input_data["period"])
+
+    def call_method2_fast_path_benchmark(self):
+        """Сравнение клиентских затрат на вызов CallMethod2 через zeep и быстрым путем (настройка ws.fast_path).
+
+        Тест поочередно для обоих путей выполняет iterations вызовов ws метода listener_pinger:get_down_servers
+        без пауз и выводит среднее время ответа и процессорное время процесса на один вызов.
+        Процессорное время считается по всему процессу, поэтому тест нужно запускать в одном потоке.
+        """
+        iterations: int = self._input_data["iterations"]
+
+        for fast_path in (False, True):
+            config = dict(self._config)
+            config['ws'] = dict(self._config['ws'], fast_path=fast_path, pause=0, rate=None)
+            ws_client = SoapClient(self._ip, self._port, config, self._statistic)
+            token = token_broker.get_token(ws_users.server_login, self._ip, self._port, self._login, self._password,
+                                           self._config, self._statistic)
+            params, sysparams, method = pattern_lp.listener_pinger_get_down_servers(token, 1)
+
+            start_time = time.time()
+            start_cpu_time = time.process_time()
+            for iteration in range(iterations):
+                ws_client.call_method2(method, params, dict(sysparams), [0])
+            cpu_time = time.process_time() - start_cpu_time
+            duration = time.time() - start_time
+
+            self._statistic.append_success("CallMethod2 (" + ("быстрый путь" if fast_path else "zeep") + "): " +
+                                           "вызовов " + str(iterations) + ", время ответа ср. " +
+                                           str(round(duration / iterations * 1000, 3)) + " мс, процессорное время " +
+                                           str(round(cpu_time / iterations * 1000000)) + " мкс/вызов", "ТЕСТ")
+
+    def stand_in_benchmark(self):
+        """Замер пропускной способности клиента: SoapClient и проверки scripts/ws без затрат настоящего сервера.
+
+        Тест запускается против подменного сервера (python -m lib.stand_in.iv7server, адрес - в настройках server)
+        и в течение duration секунд без пауз вызывает ws метод listener_pinger:get_local_servers с проверками
+        ответа. Выводится количество запросов в секунду и запросов на секунду процессорного времени потока
+        (запросов/с на одно ядро). Количество запросов всех потоков и процессов попадает в счетчик сводки.
+        """
+        duration: float = self._input_data["duration"]
+
+        config = dict(self._config)
+        config['ws'] = dict(self._config['ws'], pause=0, rate=None)
+        ws_client = SoapClient(self._ip, self._port, config, self._statistic)
+        token = token_broker.get_token(ws_users.server_login, self._ip, self._port, self._login, self._password,
+                                       self._config, self._statistic)
+
+        requests = 0
+        start_time = time.time()
+        start_cpu_time = time.thread_time()
+        while time.time() - start_time < duration:
+            ws_lp.get_local_servers(ws_client, token, 1, self._statistic)
+            requests += 1
+        cpu_time = time.thread_time() - start_cpu_time
+        elapsed = time.time() - start_time
+
+        self._statistic.append_counter("Стенд: запросы", requests)
+        self._statistic.append_success("Стенд: запросов " + str(requests) + ", " +
+                                       str(round(requests / elapsed, 1)) + " запр/с, " +
+                                       str(round(requests / cpu_time, 1) if cpu_time else 0) +
+                                       " запр/с на ядро", "ТЕСТ")